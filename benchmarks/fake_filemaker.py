@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Serveur FileMaker Data API factice pour les benchmarks hors ligne
+Reproduit les appels de FileMakerExtractor : sessions, productInfo, _find (requêtes OR,
+critères *mot*, mot, =mot, ==valeur, =, layout de réponse "layout.response"), lecture
+paginée, création, mise à jour et suppression d'enregistrements, métadonnées des layouts (un champ
+absent du layout donne l'erreur 102 comme sur un serveur pas encore migré, --chunk-fields
+fixe les champs de Chunks), téléchargement des PDF du champ
+conteneur "fichier". Les documents viennent du corpus
+de fixtures (PDF générés à la demande) ou d'un dossier de PDF ; les chunks sont créés
+par l'ingestion ou rechargés depuis un instantané JSON. --failure-rate fait échouer une
+part des appels Data API comme un serveur surchargé (HTTP 503, code 812).
+
+Usage: python -m benchmarks.fake_filemaker [port=9201] [--corpus=corpus.json | --pdf-dir=dossier]
+       [--chunks=instantané.json] [--latency-ms=0] [--failure-rate=0]
+       [--chunk-fields=idDocument,Text,ChunkIndex,EmbeddingJson]
+"""
+
+import os
+import re
+import sys
+import json
+import html
+import time
+import uuid
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+DEFAULT_CORPUS = os.path.join(FIXTURES_PATH, 'corpus.json')
+
+# Champ lié du layout Documents (DOCUMENTS_CHUNKS_FIELD) : idDocument du premier chunk, vide sinon
+RELATED_CHUNKS_FIELD = 'Chunks::idDocument'
+
+# Layouts de réponse (CHUNKS_SEARCH_LAYOUT, DOCUMENTS_LIST_LAYOUT) : champs renvoyés par _find
+# avec "layout.response"
+RESPONSE_LAYOUTS = {
+    'ChunksSearch': ('idDocument', 'ChunkIndex', 'Text'),
+    'DocumentsList': ('Nom_fichier', 'fichier', RELATED_CHUNKS_FIELD)
+}
+
+# Champs des layouts (métadonnées ; tout autre champ donne l'erreur 102)
+LAYOUT_FIELDS = {
+    'Documents': ('Nom_fichier', 'fichier', 'text', RELATED_CHUNKS_FIELD),
+    'Chunks': ('idDocument', 'Text', 'ChunkIndex', 'EmbeddingJson', 'EmbeddingModel', 'Keywords')
+}
+
+API_PREFIX = '/fmi/data/v1'
+ROUTES = [
+    ('GET', re.compile(rf'^{API_PREFIX}/productInfo$'), 'product_info'),
+    ('POST', re.compile(rf'^{API_PREFIX}/databases/[^/]+/sessions$'), 'login'),
+    ('DELETE', re.compile(rf'^{API_PREFIX}/databases/[^/]+/sessions/(?P<token>[^/]+)$'), 'logout'),
+    ('GET', re.compile(rf'^{API_PREFIX}/databases/[^/]+/layouts/(?P<layout>[^/]+)$'), 'metadata'),
+    ('POST', re.compile(rf'^{API_PREFIX}/databases/[^/]+/layouts/(?P<layout>[^/]+)/_find$'), 'find'),
+    ('GET', re.compile(rf'^{API_PREFIX}/databases/[^/]+/layouts/(?P<layout>[^/]+)/records$'), 'records'),
+    ('POST', re.compile(rf'^{API_PREFIX}/databases/[^/]+/layouts/(?P<layout>[^/]+)/records$'), 'create'),
+    ('GET', re.compile(rf'^{API_PREFIX}/databases/[^/]+/layouts/(?P<layout>[^/]+)/records/(?P<record_id>\d+)$'), 'record'),
+    ('PATCH', re.compile(rf'^{API_PREFIX}/databases/[^/]+/layouts/(?P<layout>[^/]+)/records/(?P<record_id>\d+)$'), 'update'),
+    ('DELETE', re.compile(rf'^{API_PREFIX}/databases/[^/]+/layouts/(?P<layout>[^/]+)/records/(?P<record_id>\d+)$'), 'delete'),
+    ('GET', re.compile(r'^/Streaming_SSL/MainDB/(?P<record_id>\d+)\.pdf$'), 'container')
+]
+
+WORD = re.compile(r'\w+')
+
+
+def build_pdf(pages):
+    """PDF d'une page par texte (insert_htmlbox : accents, € et ponctuation française)"""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        body = ''.join(f'<p>{html.escape(paragraph).replace(chr(10), "<br/>")}</p>'
+                       for paragraph in text.split('\n\n'))
+        page.insert_htmlbox(fitz.Rect(50, 50, page.rect.width - 50, page.rect.height - 50), body)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def match_criterion(value, criterion):
+    """
+    Critère de recherche FileMaker appliqué à une valeur de champ
+
+    "=" : champ vide ; "*" seul : champ non vide ; "==texte" : contenu entier ;
+    "=mot" : mot entier ; "*" : caractères quelconques ; nombre seul : égalité ; sinon chaque mot du
+    critère doit commencer un mot du champ.
+    """
+    value = '' if value is None else str(value)
+    criterion = str(criterion).strip()
+
+    if criterion == '=':
+        return value == ''
+    if criterion == '*':
+        return value != ''
+    if criterion.startswith('=='):
+        return value.lower() == criterion[2:].lower()
+    if criterion.startswith('='):
+        words = set(WORD.findall(value.lower()))
+        return all(word in words for word in WORD.findall(criterion[1:].lower()))
+    if '*' in criterion:
+        pattern = '.*'.join(re.escape(part) for part in criterion.lower().split('*'))
+        return re.search(pattern, value.lower()) is not None
+    if criterion.isdigit():
+        return value == criterion
+
+    words = WORD.findall(value.lower())
+    return all(any(word.startswith(term) for word in words) for term in WORD.findall(criterion.lower()))
+
+
+class FakeDataAPI:
+    """Base en mémoire : layouts Documents et Chunks, jetons de session"""
+
+    def __init__(self, documents, base_url, latency=0.0, failure_rate=0.0, chunk_fields=None):
+        self.base_url = base_url.rstrip('/')
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fields = dict(LAYOUT_FIELDS)
+        if chunk_fields:
+            self.fields['Chunks'] = tuple(chunk_fields)
+        self.tokens = set()
+        self.layouts = {'Documents': [], 'Chunks': []}
+        self.sources = {}
+        self._pdf_cache = {}
+        self._documents_with_chunks = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+        for document in documents:
+            record_id = str(document['id'])
+            self.sources[record_id] = document.get('path') or document['pages']
+            self.layouts['Documents'].append(self._record(record_id, {
+                'Nom_fichier': document['filename'],
+                'fichier': f"{self.base_url}/Streaming_SSL/MainDB/{record_id}.pdf",
+                'text': ''
+            }))
+            self._next_id = max(self._next_id, int(record_id) + 1)
+
+    @staticmethod
+    def _record(record_id, field_data):
+        return {'recordId': str(record_id), 'modId': '0', 'fieldData': field_data, 'portalData': {}}
+
+    def _view(self, layout, record):
+        """Enregistrement tel que renvoyé par l'API (champ lié calculé pour Documents)"""
+        if layout != 'Documents':
+            return record
+        field_data = dict(record['fieldData'])
+        field_data[RELATED_CHUNKS_FIELD] = self._documents_with_chunks.get(record['recordId'], '')
+        return dict(record, fieldData=field_data)
+
+    def load_chunks(self, records):
+        for record in records:
+            self.create('Chunks', record['fieldData'])
+
+    def create(self, layout, field_data):
+        with self._lock:
+            record_id = str(self._next_id)
+            self._next_id += 1
+            self.layouts[layout].append(self._record(record_id, dict(field_data)))
+            if layout == 'Chunks' and field_data.get('idDocument'):
+                self._documents_with_chunks.setdefault(str(field_data['idDocument']), str(field_data['idDocument']))
+        return record_id
+
+    def update(self, layout, record_id, field_data):
+        with self._lock:
+            for record in self.layouts[layout]:
+                if record['recordId'] == record_id:
+                    record['fieldData'].update(field_data)
+                    record['modId'] = str(int(record['modId']) + 1)
+                    return record['modId']
+        return None
+
+    def delete(self, layout, record_id):
+        with self._lock:
+            records = self.layouts[layout]
+            for position, record in enumerate(records):
+                if record['recordId'] == record_id:
+                    del records[position]
+                    break
+            else:
+                return False
+            document_id = str(record['fieldData'].get('idDocument', ''))
+            if layout == 'Chunks' and not any(str(chunk['fieldData'].get('idDocument')) == document_id
+                                              for chunk in records):
+                self._documents_with_chunks.pop(document_id, None)
+        return True
+
+    def find(self, layout, query):
+        """Requêtes combinées en OU, critères d'une requête en ET, requêtes "omit" retranchées"""
+        def matches(record, request):
+            fields = self._view(layout, record)['fieldData']
+            return all(match_criterion(fields.get(field), criterion)
+                       for field, criterion in request.items() if field != 'omit')
+
+        finds = [request for request in query if str(request.get('omit', 'false')).lower() != 'true']
+        omits = [request for request in query if str(request.get('omit', 'false')).lower() == 'true']
+        return [
+            record for record in list(self.layouts[layout])
+            if any(matches(record, request) for request in finds)
+            and not any(matches(record, request) for request in omits)
+        ]
+
+    def page(self, layout, records, offset, limit, response_layout=None):
+        data = [self._view(layout, record) for record in records[offset - 1:offset - 1 + limit]]
+        if response_layout:
+            fields = RESPONSE_LAYOUTS[response_layout]
+            data = [dict(record, fieldData={field: record['fieldData'].get(field, '') for field in fields})
+                    for record in data]
+        return data
+
+    def pdf(self, record_id):
+        source = self.sources[record_id]
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                return f.read()
+
+        data = self._pdf_cache.get(record_id)
+        if data is None:
+            data = self._pdf_cache.setdefault(record_id, build_pdf(source))
+        return data
+
+
+class DataAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    api = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type='application/json'):
+        if not isinstance(body, (bytes, bytearray)):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reply(self, response=None, status=200, code='0', message='OK'):
+        self._send(status, {'response': response or {}, 'messages': [{'code': code, 'message': message}]})
+
+    def _json_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+    def _authorized(self):
+        authorization = self.headers.get('Authorization', '')
+        return authorization.startswith('Bearer ') and authorization[7:] in self.api.tokens
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        for route_method, pattern, name in ROUTES:
+            match = pattern.match(url.path) if route_method == method else None
+            if match:
+                if self.api.latency:
+                    time.sleep(self.api.latency)
+                if name != 'product_info' and random.random() < self.api.failure_rate:
+                    return self._reply(status=503, code='812', message="Exceeded host's capacity")
+                return getattr(self, f'handle_{name}')(parse_qs(url.query), **match.groupdict())
+        self._reply(status=404, code='3', message='Unsupported command')
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def handle_product_info(self, params):
+        self._reply({'productInfo': {'name': 'FileMaker Data API (benchmark)', 'version': '0'}})
+
+    def handle_login(self, params):
+        self._json_body()
+        if not self.headers.get('Authorization', '').startswith('Basic '):
+            return self._reply(status=401, code='212', message='Invalid user account and/or password')
+        token = uuid.uuid4().hex
+        self.api.tokens.add(token)
+        self._reply({'token': token})
+
+    def handle_logout(self, params, token):
+        self.api.tokens.discard(token)
+        self._reply()
+
+    def _check(self, layout):
+        if not self._authorized():
+            self._reply(status=401, code='952', message='Invalid FileMaker Data API token (*)')
+            return False
+        if layout not in self.api.layouts:
+            self._reply(status=500, code='105', message='Layout is missing')
+            return False
+        return True
+
+    def _check_fields(self, layout, fields):
+        unknown = [field for field in fields if field != 'omit' and field not in self.api.fields[layout]]
+        if unknown:
+            self._reply(status=500, code='102', message=f'Field is missing: {unknown[0]}')
+            return False
+        return True
+
+    def handle_metadata(self, params, layout):
+        if not self._check(layout):
+            return
+        self._reply({'fieldMetaData': [{'name': field, 'type': 'normal'} for field in self.api.fields[layout]]})
+
+    def _found(self, layout, records, offset, limit, response_layout=None):
+        data = self.api.page(layout, records, offset, limit, response_layout)
+        self._reply({
+            'dataInfo': {
+                'layout': response_layout or layout,
+                'totalRecordCount': len(self.api.layouts[layout]),
+                'foundCount': len(records),
+                'returnedCount': len(data)
+            },
+            'data': data
+        })
+
+    def handle_find(self, params, layout):
+        body = self._json_body()
+        if not self._check(layout):
+            return
+        response_layout = body.get('layout.response')
+        if response_layout and response_layout not in RESPONSE_LAYOUTS:
+            return self._reply(status=500, code='105', message='Layout is missing')
+        if not self._check_fields(layout, {field for request in body.get('query', []) for field in request}):
+            return
+        records = self.api.find(layout, body.get('query', []))
+        if not records:
+            return self._reply(status=500, code='401', message='No records match the request')
+        self._found(layout, records, int(body.get('offset', 1)), int(body.get('limit', 100)), response_layout)
+
+    def handle_records(self, params, layout):
+        if not self._check(layout):
+            return
+        offset = int(params.get('_offset', ['1'])[0])
+        limit = int(params.get('_limit', ['100'])[0])
+        self._found(layout, self.api.layouts[layout], offset, limit)
+
+    def handle_record(self, params, layout, record_id):
+        if not self._check(layout):
+            return
+        records = [record for record in self.api.layouts[layout] if record['recordId'] == record_id]
+        if not records:
+            return self._reply(status=500, code='101', message='Record is missing')
+        self._found(layout, records, 1, 1)
+
+    def handle_create(self, params, layout):
+        body = self._json_body()
+        if not self._check(layout) or not self._check_fields(layout, body.get('fieldData', {})):
+            return
+        record_id = self.api.create(layout, body.get('fieldData', {}))
+        self._reply({'recordId': record_id, 'modId': '0'})
+
+    def handle_update(self, params, layout, record_id):
+        body = self._json_body()
+        if not self._check(layout) or not self._check_fields(layout, body.get('fieldData', {})):
+            return
+        mod_id = self.api.update(layout, record_id, body.get('fieldData', {}))
+        if mod_id is None:
+            return self._reply(status=500, code='101', message='Record is missing')
+        self._reply({'modId': mod_id})
+
+    def handle_delete(self, params, layout, record_id):
+        if not self._check(layout):
+            return
+        if not self.api.delete(layout, record_id):
+            return self._reply(status=500, code='101', message='Record is missing')
+        self._reply()
+
+    def handle_container(self, params, record_id):
+        if record_id not in self.api.sources:
+            return self._send(404, b'', 'application/pdf')
+        self._send(200, self.api.pdf(record_id), 'application/pdf')
+
+
+def pdf_documents(pdf_dir):
+    """Documents du layout Documents pour les PDF d'un dossier (ordre alphabétique)"""
+    names = sorted(name for name in os.listdir(pdf_dir) if name.lower().endswith('.pdf'))
+    return [{'id': str(i), 'filename': name, 'path': os.path.join(pdf_dir, name)}
+            for i, name in enumerate(names, 1)]
+
+
+def serve(port=9201, corpus_path=DEFAULT_CORPUS, chunks_path=None, latency_ms=0.0, host='127.0.0.1', pdf_dir=None,
+          failure_rate=0.0, chunk_fields=None):
+    """Démarre le serveur (bloquant) sur http://host:port"""
+    if pdf_dir:
+        documents = pdf_documents(pdf_dir)
+    else:
+        with open(corpus_path, encoding='utf-8') as f:
+            documents = json.load(f)['documents']
+
+    api = FakeDataAPI(documents, f"http://{host}:{port}", latency_ms / 1000, failure_rate, chunk_fields)
+    if chunks_path and os.path.exists(chunks_path):
+        with open(chunks_path, encoding='utf-8') as f:
+            api.load_chunks(json.load(f)['chunks'])
+
+    handler = type('Handler', (DataAPIHandler,), {'api': api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"🗄️ FileMaker factice sur http://{host}:{port}: {len(documents)} documents, "
+          f"{len(api.layouts['Chunks'])} chunks", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    serve(
+        int(args[0]) if args else 9201,
+        options.get('corpus', DEFAULT_CORPUS),
+        options.get('chunks'),
+        float(options.get('latency-ms', 0)),
+        pdf_dir=options.get('pdf-dir'),
+        failure_rate=float(options.get('failure-rate', 0)),
+        chunk_fields=options['chunk-fields'].split(',') if options.get('chunk-fields') else None
+    )
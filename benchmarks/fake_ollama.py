@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Serveur Ollama factice pour les benchmarks hors ligne
+/api/generate répond après un délai fixe (temps de génération simulé) avec les champs de
+durée et de tokens qu'Ollama renvoie ; /api/tags annonce le modèle attendu par /health.
+
+Usage: python -m benchmarks.fake_ollama [port=11435] [--delay-ms=0] [--model=mistral:7b-instruct]
+"""
+
+import os
+import sys
+import json
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class OllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0.0
+    model = 'mistral:7b-instruct'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            return self._send(200, {'models': [{'name': self.model}]})
+        self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if self.path != '/api/generate':
+            return self._send(404, {'error': 'not found'})
+
+        start = time.perf_counter()
+        if self.delay:
+            time.sleep(self.delay)
+        elapsed_ns = int((time.perf_counter() - start) * 1e9)
+
+        prompt = request.get('prompt', '')
+        self._send(200, {
+            'model': request.get('model', self.model),
+            'response': "Réponse simulée par le serveur Ollama de benchmark.",
+            'done': True,
+            'total_duration': elapsed_ns,
+            'load_duration': 0,
+            'prompt_eval_count': len(prompt) // 4,
+            'prompt_eval_duration': 0,
+            'eval_count': 12,
+            'eval_duration': elapsed_ns
+        })
+
+
+def serve(port=11435, delay_ms=0.0, model=None, host='127.0.0.1'):
+    """Démarre le serveur (bloquant) sur http://host:port"""
+    handler = type('Handler', (OllamaHandler,), {
+        'delay': delay_ms / 1000,
+        'model': model or os.getenv('OLLAMA_GENERATE_MODEL', OllamaHandler.model)
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"🤖 Ollama factice sur http://{host}:{port} (génération {delay_ms:.0f} ms)", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    serve(
+        int(args[0]) if args else 11435,
+        float(options.get('delay-ms', 0)),
+        options.get('model')
+    )
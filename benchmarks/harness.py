@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Outils communs aux benchmarks hors ligne : serveurs factices, environnement des scripts
+"""
+
+import os
+import sys
+import time
+import socket
+import subprocess
+from dotenv import load_dotenv
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_PATH = os.path.join(PROJECT_ROOT, 'scripts')
+FIXTURES_PATH = os.path.join(PROJECT_ROOT, 'benchmarks', 'fixtures')
+
+
+def load_config():
+    """Même configuration que les scripts (les variables déjà définies restent prioritaires)"""
+    load_dotenv(os.path.join(PROJECT_ROOT, 'config', 'config.env'))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_fake(module, port, *options):
+    """Lance un serveur factice dans son propre processus et attend qu'il accepte les connexions"""
+    process = subprocess.Popen(
+        [sys.executable, '-m', f'benchmarks.{module}', str(port), *options],
+        cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{module} arrêté (code {process.returncode})")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"{module} injoignable sur le port {port}")
+
+
+def run_script(script, log_path, *args):
+    """Exécute un script de scripts/ (imports à plat) avec l'environnement du benchmark"""
+    start = time.perf_counter()
+    with open(log_path, 'w') as log:
+        result = subprocess.run([sys.executable, script, *args], cwd=SCRIPTS_PATH, stdout=log, stderr=log)
+    if result.returncode:
+        raise RuntimeError(f"{script} a échoué (code {result.returncode}), voir {log_path}")
+    return time.perf_counter() - start
+
+
+def configure_environment(workdir, fm_port, ollama_port=None, index_storage=None):
+    """Variables lues par les scripts (prioritaires sur config.env, load_dotenv ne les écrase pas)"""
+    extraction_path = os.path.join(workdir, 'ingestion')
+    index_path = os.path.join(workdir, f"index-{index_storage}" if index_storage else 'no-index')
+    os.environ.update({
+        'FILEMAKER_SERVER': f"http://127.0.0.1:{fm_port}",
+        'FILEMAKER_DATABASE': 'Benchmark',
+        'FILEMAKER_USERNAME': 'bench',
+        'FILEMAKER_PASSWORD': 'bench',
+        'PDF_EXTRACTION_PATH': extraction_path,
+        'TEMP_PATH': os.path.join(workdir, 'temp'),
+        'EXTRACTION_CACHE_PATH': os.path.join(extraction_path, 'extraction_cache.sqlite'),
+        'INGESTION_JOURNAL_PATH': os.path.join(extraction_path, 'ingestion_journal.sqlite'),
+        'CORPUS_INDEX_PATH': os.path.join(extraction_path, 'corpus_index.sqlite'),
+        'BOILERPLATE_TABLE_PATH': os.path.join(extraction_path, 'boilerplate.npz'),
+        'VECTOR_INDEX_PATH': index_path,
+        'LOG_LEVEL': 'WARNING',
+        'HEALTH_PROBE_INTERVAL': '60'
+    })
+    if ollama_port:
+        os.environ['OLLAMA_SERVER'] = f"http://127.0.0.1:{ollama_port}"
+    return extraction_path, index_path
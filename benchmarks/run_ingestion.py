@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Benchmark d'ingestion : débit et coût de chaque étape de PDFProcessor
+Le vrai pdf_processor.main() traite un dossier de PDF servis par le FileMaker factice
+(téléchargement HTTP local, création des chunks en mémoire). Chaque étape est
+chronométrée en temps mur et en temps CPU exclusifs (une étape imbriquée est
+retranchée de son parent) :
+  download, extract (PyMuPDF/pdfplumber), boilerplate, chunk (chunk_spans_intelligent),
+  dedup_sort (deduplicate_and_sort_chunks), corpus_dedup, encode, write (create_chunk)
+Le temps CPU inclut les threads d'inférence et les processus d'extraction ; un CPU
+supérieur au temps mur indique une étape parallélisée. Les étapes exécutées en
+arrière-plan (∥, lecture anticipée des pages de documents) recouvrent les autres et
+sont exclues du total.
+
+Sans dossier, les PDF du corpus de fixtures sont générés dans le dossier de travail.
+Caches et journal repartent de zéro à chaque exécution (mesure à froid).
+
+Usage: python -m benchmarks.run_ingestion [dossier_pdf] [--output=résultats.json] [--compare=précédent.json]
+       [--fm-latency-ms=0] [--workdir=/tmp/rag_bench_ingestion]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import resource
+import threading
+import functools
+from contextlib import contextmanager
+
+from benchmarks.harness import (FIXTURES_PATH, SCRIPTS_PATH, configure_environment, free_port, load_config,
+                                start_fake)
+from benchmarks.fake_filemaker import build_pdf
+
+
+def cpu_time():
+    """Temps CPU du processus (tous threads) et de ses processus enfants terminés"""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def peak_rss_mb():
+    """RSS maximal (Linux : ru_maxrss en Ko) du processus et du plus gros enfant terminé"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(own / 1024, 1), round(children / 1024, 1)
+
+
+class StageProfiler:
+    """Temps mur et CPU exclusifs par étape, nombre d'appels et d'éléments traités"""
+
+    def __init__(self):
+        self.stages = {}
+        self._stack = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, stage):
+        if threading.current_thread() is not threading.main_thread():
+            # Étape en arrière-plan (lecture anticipée des pages) : recouvre les autres,
+            # temps CPU du seul thread, hors total
+            start_wall, start_cpu = time.perf_counter(), time.thread_time()
+            try:
+                yield
+            finally:
+                with self._lock:
+                    entry = self.stages.setdefault(stage, {'calls': 0, 'items': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                           'background': True})
+                    entry['calls'] += 1
+                    entry['wall_s'] += time.perf_counter() - start_wall
+                    entry['cpu_s'] += time.thread_time() - start_cpu
+            return
+
+        # [début mur, début CPU, mur des étapes imbriquées, CPU des étapes imbriquées]
+        frame = [time.perf_counter(), cpu_time(), 0.0, 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - frame[0]
+            cpu = cpu_time() - frame[1]
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][2] += wall
+                self._stack[-1][3] += cpu
+
+            entry = self.stages.setdefault(stage, {'calls': 0, 'items': 0, 'wall_s': 0.0, 'cpu_s': 0.0})
+            entry['calls'] += 1
+            entry['wall_s'] += wall - frame[2]
+            entry['cpu_s'] += cpu - frame[3]
+
+    def wrap(self, owner, name, stage, count=None):
+        """
+        Remplace owner.name par une version chronométrée
+
+        Args:
+            count (callable, optional): count(args, résultat) -> éléments traités par l'appel
+        """
+        original = getattr(owner, name)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            with self.measure(stage):
+                result = original(*args, **kwargs)
+            if count:
+                with self._lock:
+                    self.stages[stage]['items'] += count(args, result)
+            return result
+
+        setattr(owner, name, timed)
+
+
+def instrument(profiler, pdf_processor):
+    """Étapes de PDFProcessor et de FileMakerExtractor (méthodes de classe : main() inchangé)"""
+    processor, extractor = pdf_processor.PDFProcessor, pdf_processor.FileMakerExtractor
+    profiler.wrap(pdf_processor, 'load_encoder', 'model_load')
+    profiler.wrap(extractor, 'fetch_page', 'list_documents', count=lambda args, result: len(result[0]))
+    profiler.wrap(extractor, 'get_chunks_for_document', 'check_existing')
+    profiler.wrap(extractor, 'download_pdf_buffer', 'download',
+                  count=lambda args, result: 1 if result is not None else 0)
+    profiler.wrap(processor, 'extract_text_from_pdf', 'extract',
+                  count=lambda args, result: result.count('--- Page '))
+    profiler.wrap(pdf_processor.BoilerplateFilter, 'filter_text', 'boilerplate')
+    profiler.wrap(processor, 'chunk_spans_intelligent', 'chunk')
+    profiler.wrap(processor, 'deduplicate_and_sort_chunks', 'dedup_sort')
+    profiler.wrap(processor, 'filter_corpus_duplicates', 'corpus_dedup')
+    profiler.wrap(processor, 'generate_embeddings', 'encode', count=lambda args, result: len(args[1]))
+    profiler.wrap(extractor, 'create_chunk', 'write', count=lambda args, result: 1 if result else 0)
+
+
+def fixture_pdfs(pdf_dir):
+    """PDF du corpus de fixtures, générés une fois"""
+    with open(os.path.join(FIXTURES_PATH, 'corpus.json'), encoding='utf-8') as f:
+        documents = json.load(f)['documents']
+    os.makedirs(pdf_dir, exist_ok=True)
+    for document in documents:
+        path = os.path.join(pdf_dir, document['filename'])
+        if not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(build_pdf(document['pages']))
+    return pdf_dir
+
+
+def print_comparison(report, previous_path):
+    with open(previous_path, encoding='utf-8') as f:
+        previous = json.load(f)
+
+    def delta(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "-"
+
+    print(f"\n📊 Comparaison avec {previous_path}")
+    for key in ('pages_per_s', 'chunks_per_s', 'embeddings_per_s', 'processing_s'):
+        print(f"   {key:<17} {previous.get(key, 0):>9.2f} → {report[key]:>9.2f} ({delta(report[key], previous.get(key, 0))})")
+    for stage, entry in report['stages'].items():
+        old = previous.get('stages', {}).get(stage, {}).get('wall_s', 0)
+        print(f"   {stage:<17} {old:>8.3f}s → {entry['wall_s']:>8.3f}s ({delta(entry['wall_s'], old)})")
+
+
+def main(pdf_dir=None, output=None, compare=None, fm_latency_ms=0.0, workdir='/tmp/rag_bench_ingestion'):
+    load_config()
+    os.makedirs(workdir, exist_ok=True)
+    pdf_dir = pdf_dir or fixture_pdfs(os.path.join(workdir, 'fixture_pdfs'))
+
+    fm_port = free_port()
+    extraction_path, _ = configure_environment(workdir, fm_port)
+    shutil.rmtree(extraction_path, ignore_errors=True)
+
+    fake = start_fake('fake_filemaker', fm_port, f'--pdf-dir={os.path.abspath(pdf_dir)}',
+                      f'--latency-ms={fm_latency_ms}')
+    try:
+        # pdf_processor utilise des imports à plat (exécuté depuis scripts/)
+        sys.path.insert(0, SCRIPTS_PATH)
+        import pdf_processor
+        logging.getLogger().setLevel(logging.WARNING)
+
+        profiler = StageProfiler()
+        instrument(profiler, pdf_processor)
+        document_count = len([name for name in os.listdir(pdf_dir) if name.lower().endswith('.pdf')])
+
+        print(f"📥 Ingestion de {document_count} PDF ({pdf_dir})...")
+        with profiler.measure('other'):
+            pdf_processor.main(batch_size=document_count)
+        # Avant l'arrêt du serveur factice : seuls les processus d'extraction comptent comme enfants
+        rss_self, rss_children = peak_rss_mb()
+    finally:
+        fake.terminate()
+        fake.wait(timeout=10)
+
+    stages = profiler.stages
+    foreground = [entry for entry in stages.values() if not entry.get('background')]
+    total_wall = sum(entry['wall_s'] for entry in foreground)
+    total_cpu = sum(entry['cpu_s'] for entry in foreground)
+    processing = total_wall - stages.get('model_load', {}).get('wall_s', 0.0)
+    pages = stages.get('extract', {}).get('items', 0)
+    chunks = stages.get('write', {}).get('items', 0)
+    embeddings = stages.get('encode', {}).get('items', 0)
+
+    report = {
+        'pdf_dir': os.path.abspath(pdf_dir),
+        'model': os.getenv('EMBEDDING_MODEL'),
+        'backend': os.getenv('EMBEDDING_BACKEND', 'torch'),
+        'extraction_workers': os.getenv('PDF_EXTRACTION_WORKERS', '0'),
+        'fm_latency_ms': fm_latency_ms,
+        'documents': document_count,
+        'downloaded': stages.get('download', {}).get('items', 0),
+        'pages': pages,
+        'chunks': chunks,
+        'embeddings': embeddings,
+        'wall_s': total_wall,
+        'cpu_s': total_cpu,
+        'processing_s': processing,
+        'pages_per_s': pages / processing if processing else 0.0,
+        'chunks_per_s': chunks / processing if processing else 0.0,
+        'embeddings_per_s': embeddings / processing if processing else 0.0,
+        'peak_rss_mb': rss_self,
+        'peak_rss_children_mb': rss_children,
+        'stages': {
+            stage: dict(entry, share=entry['wall_s'] / total_wall if total_wall else 0.0)
+            for stage, entry in sorted(stages.items(), key=lambda item: -item[1]['wall_s'])
+        },
+        'timestamp': time.time()
+    }
+
+    print(f"\n{'étape':<15} {'appels':>7} {'éléments':>9} {'mur':>9} {'CPU':>9} {'part':>6}")
+    for stage, entry in report['stages'].items():
+        label = f"{stage} ∥" if entry.get('background') else stage
+        print(f"{label:<15} {entry['calls']:>7} {entry['items'] or '':>9} {entry['wall_s']:>8.3f}s "
+              f"{entry['cpu_s']:>8.3f}s {entry['share'] * 100:>5.1f}%")
+    print(f"\n⏱️ {total_wall:.1f}s au total (CPU {total_cpu:.1f}s), {processing:.1f}s hors chargement du modèle")
+    print(f"📄 {report['pages_per_s']:.1f} pages/s, 🧩 {report['chunks_per_s']:.1f} chunks/s, "
+          f"🧮 {report['embeddings_per_s']:.1f} embeddings/s")
+    print(f"💾 RSS max: {rss_self:.0f} Mo (processus enfants: {rss_children:.0f} Mo)")
+
+    if compare:
+        print_comparison(report, compare)
+
+    output = output or os.path.join(workdir, f"ingestion-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Résultats: {output}")
+    return report
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    main(
+        args[0] if args else None,
+        options.get('output'),
+        options.get('compare'),
+        float(options.get('fm-latency-ms', 0)),
+        options.get('workdir', '/tmp/rag_bench_ingestion')
+    )
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Benchmark hors ligne du service de recherche : qualité de récupération, latence et débit
+FileMaker et Ollama sont remplacés par des serveurs factices locaux. Le corpus de
+fixtures est ingéré par le vrai pdf_processor (PDF générés, chunking, embeddings,
+création des chunks), puis :
+  1. recall@k et MRR au niveau document sur les questions annotées (recherche textuelle +
+     similarités, sans génération) ;
+  2. latence et débit de POST /search (gunicorn, config/gunicorn.conf.py) pour
+     plusieurs nombres de clients concurrents.
+
+Les chunks ingérés sont gardés dans un instantané par modèle (dossier de travail) :
+les exécutions suivantes ne ré-encodent pas le corpus. Modèle et backend d'embedding
+(EMBEDDING_MODEL, EMBEDDING_BACKEND) viennent de l'environnement ou de config.env.
+
+Usage: python -m benchmarks.run_search [--clients=1,4,8 (vide: sans charge)] [--duration=20] [--workers=1]
+       [--index=float32|float16|int8] [--llm-delay-ms=0] [--fm-latency-ms=0] [--fm-failure-rate=0]
+       [--workdir=/tmp/rag_bench] [--output=résultats.json] [--reseed]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import numpy as np
+
+from benchmarks.harness import (FIXTURES_PATH, configure_environment, free_port, load_config,
+                                run_script, start_fake)
+
+RECALL_AT = (1, 3, 5, 10)
+TOP_K = 20
+
+
+def export_chunks(path):
+    """Instantané des chunks créés dans le FileMaker factice"""
+    from scripts.filemaker_extractor import FileMakerExtractor
+
+    with FileMakerExtractor() as extractor:
+        chunks = [{'fieldData': record['fieldData']} for record in extractor.iter_chunk_records()]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'chunks': chunks}, f)
+    return len(chunks)
+
+
+def snapshot_current(path):
+    """Instantané créé avec le champ de mots-clés (CHUNKS_KEYWORDS_FIELD) cherché par search_chunks_smart"""
+    field = os.getenv('CHUNKS_KEYWORDS_FIELD')
+    if not field:
+        return True
+    with open(path, encoding='utf-8') as f:
+        chunks = json.load(f)['chunks']
+    return not chunks or field in chunks[0]['fieldData']
+
+
+def rank_metrics(ranking, relevant):
+    """
+    Réussite à k et rang réciproque du premier document pertinent
+
+    Plusieurs documents annotés répondent chacun à la question (bulletins de deux
+    trimestres) : la question est retrouvée à k dès que l'un d'eux est dans les k premiers.
+    """
+    first = next((rank for rank, doc_id in enumerate(ranking, 1) if doc_id in relevant), None)
+    recalls = {k: float(first is not None and first <= k) for k in RECALL_AT}
+    return recalls, (1.0 / first if first else 0.0)
+
+
+def evaluate_retrieval(questions, top_k=TOP_K):
+    """
+    Recherche textuelle + similarités pour chaque question annotée, sans génération
+
+    Le classement est celui des documents dans l'ordre de leur meilleur chunk.
+    """
+    from scripts.search_service import RAGSearcher
+
+    searcher = RAGSearcher()
+    index = searcher.load_index()
+    model, model_name = searcher.load_model(index)
+    searcher.active = (index, model, model_name)
+    searcher.warmup()
+
+    extractor = searcher.connect_filemaker()
+    if extractor is None:
+        raise RuntimeError("Connexion au FileMaker factice impossible")
+
+    per_question, latencies = [], []
+    try:
+        for item in questions:
+            start = time.perf_counter()
+            raw_chunks = searcher.enhanced_search(extractor, item['question'])
+            top_chunks = searcher.calculate_similarities(item['question'], raw_chunks, top_k=top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            ranking = list(dict.fromkeys(str(chunk['document_id']) for chunk in top_chunks))
+            recalls, reciprocal_rank = rank_metrics(ranking, set(item['relevant']))
+            per_question.append({
+                'question': item['question'],
+                'relevant': item['relevant'],
+                'ranking': ranking[:10],
+                'candidates': len(raw_chunks),
+                'recall': recalls,
+                'reciprocal_rank': reciprocal_rank
+            })
+    finally:
+        extractor.logout()
+
+    return {
+        'model': model_name,
+        'index': index.version if index else None,
+        'questions': len(questions),
+        'recall': {k: float(np.mean([q['recall'][k] for q in per_question])) for k in RECALL_AT},
+        'mrr': float(np.mean([q['reciprocal_rank'] for q in per_question])),
+        'latency_ms': {'p50': float(np.percentile(latencies, 50)), 'p95': float(np.percentile(latencies, 95))},
+        'per_question': per_question
+    }
+
+
+def measure_service(questions, workers, clients_counts, duration):
+    """Latence et débit de POST /search sous gunicorn pour chaque nombre de clients"""
+    from scripts.bench_workers import start_server, stop_server, run_load
+
+    port = free_port()
+    process, ready_time = start_server(workers, port, int(os.getenv('SEARCH_THREADS', '2')))
+    results = []
+    try:
+        for clients in clients_counts:
+            latencies, errors, elapsed = run_load(port, clients, duration, questions)
+            results.append({
+                'clients': clients,
+                'requests': len(latencies),
+                'errors': errors,
+                'qps': len(latencies) / elapsed,
+                'p50_ms': float(np.percentile(latencies, 50)) if latencies else None,
+                'p95_ms': float(np.percentile(latencies, 95)) if latencies else None,
+                'p99_ms': float(np.percentile(latencies, 99)) if latencies else None
+            })
+    finally:
+        stop_server(process)
+    return {'workers': workers, 'startup_s': ready_time, 'loads': results}
+
+
+def main(clients_counts=(1, 4, 8), duration=20, workers=1, index_storage=None, llm_delay_ms=0.0,
+         fm_latency_ms=0.0, workdir='/tmp/rag_bench', output=None, reseed=False, fm_failure_rate=0.0):
+    logging.basicConfig(level=logging.WARNING)
+    load_config()
+    with open(os.path.join(FIXTURES_PATH, 'questions.json'), encoding='utf-8') as f:
+        questions = json.load(f)['questions']
+
+    os.makedirs(workdir, exist_ok=True)
+    fm_port, ollama_port = free_port(), free_port()
+    extraction_path, index_path = configure_environment(workdir, fm_port, ollama_port, index_storage)
+    model_name = os.getenv('EMBEDDING_MODEL', 'dangvantuan/sentence-camembert-large')
+    snapshot = os.path.join(workdir, f"chunks-{model_name.replace('/', '__')}.json")
+    if os.path.exists(snapshot) and not reseed and not snapshot_current(snapshot):
+        print("♻️ Instantané sans champ de mots-clés: ré-ingestion du corpus")
+        reseed = True
+    if reseed and os.path.exists(snapshot):
+        os.remove(snapshot)
+
+    report = {
+        'model': model_name,
+        'backend': os.getenv('EMBEDDING_BACKEND', 'torch'),
+        'index_storage': index_storage,
+        'llm_delay_ms': llm_delay_ms,
+        'fm_latency_ms': fm_latency_ms,
+        'fm_failure_rate': fm_failure_rate
+    }
+    fakes = [start_fake('fake_ollama', ollama_port, f'--delay-ms={llm_delay_ms}')]
+    try:
+        fm_options = [f'--latency-ms={fm_latency_ms}']
+        if os.path.exists(snapshot):
+            fm_options.append(f'--chunks={snapshot}')
+        if fm_failure_rate and os.path.exists(snapshot):
+            fm_options.append(f'--failure-rate={fm_failure_rate}')
+        fakes.append(start_fake('fake_filemaker', fm_port, *fm_options))
+
+        if not os.path.exists(snapshot):
+            print(f"📥 Ingestion du corpus de fixtures ({model_name})...")
+            shutil.rmtree(extraction_path, ignore_errors=True)
+            report['ingestion_s'] = run_script('pdf_processor.py', os.path.join(workdir, 'ingestion.log'))
+            print(f"   {export_chunks(snapshot)} chunks en {report['ingestion_s']:.1f}s")
+
+        if index_storage:
+            print(f"🗂️ Construction de l'index local ({index_storage})...")
+            shutil.rmtree(index_path, ignore_errors=True)
+            run_script('reindex.py', os.path.join(workdir, 'reindex.log'), model_name, f'--storage={index_storage}')
+
+        print(f"🎯 Évaluation de la récupération ({len(questions)} questions)...")
+        retrieval = evaluate_retrieval(questions)
+        report['retrieval'] = retrieval
+        recalls = ' '.join(f"R@{k}={retrieval['recall'][k]:.3f}" for k in RECALL_AT)
+        print(f"   {recalls} MRR={retrieval['mrr']:.3f} "
+              f"(p50 {retrieval['latency_ms']['p50']:.0f}ms, p95 {retrieval['latency_ms']['p95']:.0f}ms)")
+
+        if clients_counts:
+            print(f"\n🏁 POST /search: {workers} worker(s), {duration}s par palier")
+            service = measure_service([item['question'] for item in questions], workers, clients_counts, duration)
+            report['service'] = service
+            print(f"{'clients':>7} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'erreurs':>7}")
+            for load in service['loads']:
+                if load['requests']:
+                    print(f"{load['clients']:>7} {load['qps']:>7.1f} {load['p50_ms']:>6.0f}ms "
+                          f"{load['p95_ms']:>6.0f}ms {load['p99_ms']:>6.0f}ms {load['errors']:>7}")
+                else:
+                    print(f"{load['clients']:>7} {'-':>7} {'-':>8} {'-':>8} {'-':>8} {load['errors']:>7}")
+    finally:
+        for process in fakes:
+            process.terminate()
+            process.wait(timeout=10)
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Résultats: {output}")
+    return report
+
+
+if __name__ == "__main__":
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    main(
+        tuple(int(n) for n in options['clients'].split(',') if n) if 'clients' in options else (1, 4, 8),
+        float(options.get('duration', 20)),
+        int(options.get('workers', 1)),
+        options.get('index') or None,
+        float(options.get('llm-delay-ms', 0)),
+        float(options.get('fm-latency-ms', 0)),
+        options.get('workdir', '/tmp/rag_bench'),
+        options.get('output'),
+        reseed='--reseed' in sys.argv,
+        fm_failure_rate=float(options.get('fm-failure-rate', 0))
+    )
@@ -0,0 +1,62 @@
+"""
+Configuration gunicorn du service de recherche (mode production)
+Le modèle et l'index sont chargés une fois dans le processus maître (preload_app) puis
+partagés en copie sur écriture par les workers forkés. Les métriques de chaque worker sont
+cumulées dans METRICS_MULTIPROC_DIR : /metrics rend la somme des workers.
+
+Lancement depuis la racine du projet :
+    gunicorn -c config/gunicorn.conf.py scripts.wsgi:app
+"""
+
+import gc
+import os
+import tempfile
+import multiprocessing
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.env'))
+
+# Un thread de calcul par worker : les pools OpenMP / ONNX Runtime créés dans le maître
+# ne survivent pas au fork, et workers x threads doivent rester proches du nombre de cœurs
+compute_threads = os.getenv('SEARCH_WORKER_COMPUTE_THREADS', '1')
+os.environ['ONNX_THREADS'] = compute_threads
+os.environ['TORCH_THREADS'] = compute_threads
+
+# Un fichier de métriques par processus, sommés par /metrics (lu à l'import de l'application)
+metrics_dir = os.getenv('METRICS_MULTIPROC_DIR') or os.path.join(tempfile.gettempdir(), 'rag_search_metrics')
+os.environ['METRICS_MULTIPROC_DIR'] = metrics_dir
+
+bind = os.getenv('SEARCH_BIND', '0.0.0.0:9000')
+workers = int(os.getenv('SEARCH_WORKERS', '0')) or multiprocessing.cpu_count()
+threads = int(os.getenv('SEARCH_THREADS', '2'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Génération Ollama jusqu'à 180s
+timeout = int(os.getenv('SEARCH_TIMEOUT', '300'))
+graceful_timeout = 30
+keepalive = 5
+
+preload_app = True
+max_requests = int(os.getenv('SEARCH_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    """Avant le chargement de l'application : métriques de l'exécution précédente supprimées"""
+    os.makedirs(metrics_dir, exist_ok=True)
+    for name in os.listdir(metrics_dir):
+        if name.startswith('metrics_'):
+            os.remove(os.path.join(metrics_dir, name))
+
+
+def when_ready(server):
+    """Après le chargement dans le maître : objets gelés hors du GC pour ne pas toucher leurs pages"""
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"🧊 {gc.get_freeze_count()} objets gelés avant le fork de {workers} workers x {threads} threads")
+
+
+def worker_exit(server, worker):
+    """Dernières valeurs du worker publiées (arrêt, max_requests) : elles restent dans la somme"""
+    from scripts import metrics
+    metrics.flush()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Remplissage du champ de mots-clés des chunks existants
+search_chunks_smart cherche les termes normalisés de la question dans le champ
+CHUNKS_KEYWORDS_FIELD, rempli à la création des chunks : les chunks créés avant ce
+champ ne seraient plus trouvés. Le layout Chunks est parcouru page par page et les
+chunks au champ vide sont mis à jour (PATCH) avec au plus --concurrency requêtes en vol
+(client asyncio). --force recalcule aussi les champs déjà remplis (changement de la
+normalisation dans text_pipeline).
+
+Usage: python backfill_keywords.py [--concurrency=16] [--page-size=1000] [--force]
+"""
+
+import sys
+import time
+import asyncio
+import logging
+
+from filemaker_async import AsyncFileMakerExtractor
+from text_pipeline import keyword_field
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def backfill(extractor, concurrency=16, page_size=1000, force=False):
+    """
+    Met à jour le champ de mots-clés des chunks qui ne l'ont pas encore
+
+    Args:
+        extractor (AsyncFileMakerExtractor): Session FileMaker ouverte
+        concurrency (int): Mises à jour en vol au plus
+        force (bool): Recalculer aussi les champs déjà remplis
+
+    Returns:
+        dict: Chunks lus, mis à jour, en échec
+    """
+    field = extractor.keywords_field
+    stats = {'read': 0, 'updated': 0, 'failed': 0}
+    pending = set()
+    start = last_log = time.time()
+
+    async def update(record_id, keywords):
+        ok = await extractor.update_chunk(record_id, {field: keywords})
+        stats['updated' if ok else 'failed'] += 1
+
+    async for record in extractor.iter_chunk_records(page_size):
+        stats['read'] += 1
+        field_data = record.get('fieldData', {})
+        if field_data.get(field) and not force:
+            continue
+        keywords = keyword_field(field_data.get('Text', ''))
+        if not keywords or keywords == field_data.get(field):
+            continue
+
+        pending.add(asyncio.ensure_future(update(record['recordId'], keywords)))
+        if len(pending) >= concurrency:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+        if time.time() - last_log >= 10:
+            last_log = time.time()
+            logger.info(f"🔤 {stats['read']} chunks lus, {stats['updated']} mis à jour "
+                        f"({stats['updated'] / (last_log - start):.0f}/s)")
+
+    if pending:
+        await asyncio.wait(pending)
+    return stats
+
+
+async def run(concurrency=16, page_size=1000, force=False):
+    async with AsyncFileMakerExtractor() as extractor:
+        if not extractor.keywords_field:
+            logger.error("❌ CHUNKS_KEYWORDS_FIELD non défini dans config.env")
+            return None
+        await extractor.load_chunk_fields()
+        if extractor.keywords_field in extractor.missing_chunk_fields:
+            logger.error(f"❌ Champ {extractor.keywords_field} absent du layout Chunks : migration à faire")
+            return None
+
+        start = time.time()
+        stats = await backfill(extractor, concurrency, page_size, force)
+        logger.info(f"✅ Champ {extractor.keywords_field}: {stats['updated']} chunks mis à jour sur "
+                    f"{stats['read']} lus en {time.time() - start:.1f}s")
+        if stats['failed']:
+            logger.warning(f"⚠️ {stats['failed']} mises à jour en échec : relancer le script")
+        elif not extractor.keywords_backfilled:
+            logger.info("💡 Tous les chunks sont remplis : CHUNKS_KEYWORDS_BACKFILLED=true dans config.env "
+                        "(plus de recherche dans Text pour les questions sans résultat)")
+        return stats
+
+
+def main(concurrency=16, page_size=1000, force=False):
+    try:
+        return asyncio.run(run(concurrency, page_size, force))
+    except ConnectionError as e:
+        logger.error(f"❌ Remplissage interrompu: {str(e)}")
+        return None
+
+
+if __name__ == "__main__":
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    main(
+        int(options.get('concurrency', 16)),
+        int(options.get('page-size', 1000)),
+        force='--force' in sys.argv
+    )
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Comparaison des backends d'embedding sur CPU : temps de chargement, latence d'encodage
+d'une question, débit d'encodage de chunks (ingestion) et écart avec PyTorch
+
+Usage: python bench_encoders.py [modèle] [nb_chunks]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+from encoders import BACKENDS, VERIFY_SENTENCES, load_encoder, _cosines
+
+QUESTIONS = [
+    "Quel est le prix de souscription actuel ?",
+    "Quelle SCPI a le meilleur taux de distribution en 2023 ?",
+    "Combien d'immeubles ont été acquis au dernier trimestre ?",
+    "Quel est le délai de jouissance ?"
+]
+
+
+def sample_chunks(count, size=800):
+    """Chunks de la taille produite par le chunker à partir des phrases de contrôle"""
+    text = ' '.join(VERIFY_SENTENCES)
+    rng = np.random.default_rng(0)
+    chunks = []
+    for _ in range(count):
+        start = int(rng.integers(0, len(text)))
+        chunks.append((text[start:] + ' ' + text)[:size])
+    return chunks
+
+
+def main(model_name=None, chunk_count=256):
+    model_name = model_name or os.getenv('EMBEDDING_MODEL', 'dangvantuan/sentence-camembert-large')
+    chunks = sample_chunks(chunk_count)
+    reference = None
+
+    print(f"🤖 Modèle {model_name}, {chunk_count} chunks de 800 caractères\n")
+    print(f"{'backend':<10} {'chargement':>10} {'question p50':>12} {'p95':>8} {'chunks/s':>9} {'cos min':>8}")
+    for backend in BACKENDS:
+        start = time.perf_counter()
+        encoder = load_encoder(model_name, backend)
+        load_time = time.perf_counter() - start
+        if backend != 'torch' and type(encoder).__name__ != 'OnnxEncoder':
+            print(f"{backend:<10} indisponible (retour à PyTorch)")
+            continue
+
+        encoder.encode(QUESTIONS[:1])
+        latencies = []
+        for _ in range(10):
+            for question in QUESTIONS:
+                start = time.perf_counter()
+                encoder.encode([question], show_progress_bar=False)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        embeddings = encoder.encode(chunks, batch_size=32, show_progress_bar=False, convert_to_numpy=True)
+        throughput = len(chunks) / (time.perf_counter() - start)
+
+        if reference is None:
+            reference = embeddings
+        cosine = _cosines(reference, embeddings).min()
+        print(f"{backend:<10} {load_time:>9.2f}s {np.percentile(latencies, 50):>10.1f}ms "
+              f"{np.percentile(latencies, 95):>6.1f}ms {throughput:>9.1f} {cosine:>8.5f}")
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else None,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    )
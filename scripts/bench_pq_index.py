@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Mesure recall / latence / mémoire de l'index compressé IVF-PQ face à la recherche
+exhaustive float32 et int8, pour plusieurs valeurs de nprobe
+
+Même corpus et mêmes questions que bench_quantization : synthétique par défaut,
+ou vecteurs d'une version d'index existante.
+
+Usage: python bench_pq_index.py [dossier_version | nb_vecteurs] [dimension] [nb_questions]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+
+from vector_index import VectorIndex, IndexBuilder, normalize
+from bench_quantization import synthetic_corpus, measure, TOP_K
+
+NPROBES = (1, 4, 16, 64)
+
+
+def build_version(root, vectors, name, **finalize_options):
+    builder = IndexBuilder(root, 'bench', vectors.shape[1], version=name)
+    for start in range(0, len(vectors), 8192):
+        block = vectors[start:start + 8192]
+        builder.add(block, [{'recordId': str(start + i), 'Text': ''} for i in range(len(block))])
+
+    start = time.perf_counter()
+    builder.finalize(**finalize_options)
+    return VectorIndex(builder.path), time.perf_counter() - start
+
+
+def main(source=None, dim=1024, query_count=200):
+    if source and os.path.isdir(source):
+        reference = VectorIndex(source)
+        vectors = np.asarray(reference.vectors)
+        print(f"📂 Version {reference.version}: {reference.count} vecteurs de dimension {reference.dim}")
+    else:
+        count = int(source) if source else 100000
+        vectors = synthetic_corpus(count, dim)
+        print(f"🧪 Corpus synthétique: {count} vecteurs de dimension {dim}")
+
+    rng = np.random.default_rng(1)
+    rows = rng.integers(0, len(vectors), query_count)
+    queries = normalize(vectors[rows] + 0.05 * rng.standard_normal(vectors[rows].shape).astype(np.float32))
+
+    root = tempfile.mkdtemp(prefix='bench_pq_index_')
+    try:
+        exact, _ = build_version(root, vectors, 'float32')
+        truth = [{row for row, _ in exact.search(query, TOP_K)} for query in queries]
+        int8, _ = build_version(root, vectors, 'int8', storage='int8')
+        ivfpq, build_time = build_version(root, vectors, 'ivfpq', codec='ivfpq')
+        print(f"🗜️ IVF-PQ construit en {build_time:.1f}s: {ivfpq.codec.nlist} listes, "
+              f"{ivfpq.codec.pq.m} octets/vecteur")
+
+        print(f"\n{'index':<10} {'nprobe':>6} {'rescore':>7} {'mémoire':>10} "
+              f"{f'recall@{TOP_K}':>10} {'min':>6} {'ms/req':>8}")
+
+        def report(name, index, nprobe, rescore):
+            index.nprobe = nprobe or index.nprobe
+            recall, worst, latency = measure(index, queries, truth, rescore)
+            print(f"{name:<10} {nprobe or '-':>6} {rescore:>7} {index.memory_bytes() / 1e6:>8.1f}MB "
+                  f"{recall:>10.4f} {worst:>6.2f} {latency:>8.2f}")
+
+        report('float32', exact, None, 0)
+        report('int8', int8, None, 4)
+        for nprobe in NPROBES:
+            for rescore in (0, 4, 10):
+                report('ivfpq', ivfpq, nprobe, rescore)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else None,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1024,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    )
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Mesure du stockage quantifié de l'index vectoriel : mémoire, latence et recall@k
+des stockages float16 / int8 (avec et sans re-scoring float32) face au float32 exact
+
+Sans argument, un corpus synthétique (vecteurs groupés autour de thèmes, comme des
+chunks de bulletins) est généré ; sinon les vecteurs d'une version d'index existante
+sont recopiés. Les questions sont des vecteurs du corpus bruités.
+
+Usage: python bench_quantization.py [dossier_version | nb_vecteurs] [dimension] [nb_questions]
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+
+from vector_index import VectorIndex, IndexBuilder, normalize
+
+TOP_K = 20
+
+
+def synthetic_corpus(count, dim, topics=200, seed=0):
+    """Vecteurs normalisés répartis autour de centres thématiques"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    assignments = rng.integers(0, topics, count)
+    vectors = centers[assignments] + 0.8 * rng.standard_normal((count, dim)).astype(np.float32)
+    return normalize(vectors)
+
+
+def build_version(root, vectors, storage):
+    builder = IndexBuilder(root, 'bench', vectors.shape[1], version=storage)
+    for start in range(0, len(vectors), 8192):
+        block = vectors[start:start + 8192]
+        builder.add(block, [{'recordId': str(start + i), 'Text': ''} for i in range(len(block))])
+    builder.finalize(storage=storage)
+    return VectorIndex(builder.path)
+
+
+def measure(index, queries, truth, rescore):
+    recalls = []
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        found = {row for row, _ in index.search(query, TOP_K, rescore=rescore)}
+        recalls.append(len(found & expected) / TOP_K)
+    latency = (time.perf_counter() - start) / len(queries) * 1000
+    return float(np.mean(recalls)), float(np.min(recalls)), latency
+
+
+def main(source=None, dim=1024, query_count=200):
+    if source and os.path.isdir(source):
+        reference = VectorIndex(source)
+        vectors = np.asarray(reference.vectors)
+        print(f"📂 Version {reference.version}: {reference.count} vecteurs de dimension {reference.dim}")
+    else:
+        count = int(source) if source else 50000
+        vectors = synthetic_corpus(count, dim)
+        print(f"🧪 Corpus synthétique: {count} vecteurs de dimension {dim}")
+
+    rng = np.random.default_rng(1)
+    rows = rng.integers(0, len(vectors), query_count)
+    queries = normalize(vectors[rows] + 0.05 * rng.standard_normal(vectors[rows].shape).astype(np.float32))
+
+    root = tempfile.mkdtemp(prefix='bench_quantization_')
+    try:
+        exact = build_version(root, vectors, 'float32')
+        truth = [{row for row, _ in exact.search(query, TOP_K)} for query in queries]
+        reference_bytes = exact.memory_bytes()
+
+        print(f"\n{'stockage':<10} {'rescore':>7} {'mémoire':>10} {'gain':>6} "
+              f"{f'recall@{TOP_K}':>10} {'min':>6} {'ms/req':>8}")
+        for storage in ('float32', 'float16', 'int8'):
+            index = exact if storage == 'float32' else build_version(root, vectors, storage)
+            for rescore in ((0,) if storage == 'float32' else (0, 2, 4)):
+                recall, worst, latency = measure(index, queries, truth, rescore)
+                print(f"{storage:<10} {rescore:>7} {index.memory_bytes() / 1e6:>8.1f}MB "
+                      f"{reference_bytes / index.memory_bytes():>5.1f}x {recall:>10.4f} {worst:>6.2f} {latency:>8.2f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else None,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1024,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    )
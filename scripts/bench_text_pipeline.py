@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark du pipeline de texte : ancienne implémentation (regex compilées à l'appel,
+analyses redondantes) contre text_pipeline (précompilé, analyse fusionnée par chunk)
+
+Usage: python bench_text_pipeline.py <bulletin.pdf|texte.txt> [répétitions]
+"""
+
+import re
+import sys
+import time
+
+import text_pipeline
+
+
+def legacy_clean_text(text):
+    """Copie de l'ancien PDFProcessor.clean_text"""
+    text = re.sub(r'(\d+)\s*[,\.]\s*(\d+)', r'\1,\2', text)
+    text = re.sub(r'(\d+)\s*€', r'\1€', text)
+    text = re.sub(r'(\d+)\s*%', r'\1%', text)
+    text = re.sub(r'(\d+)\s*M€', r'\1M€', text)
+    text = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', text)
+    text = re.sub(r'([^.!?])\n([a-zà-ÿ])', r'\1 \2', text)
+    text = re.sub(r' +', ' ', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = re.sub(r'\t+', ' ', text)
+    text = re.sub(r'[^\w\s\.\,\;\:\!\?\€\%\(\)\-\n°/]', '', text)
+    return text.strip()
+
+
+def legacy_extract_financial_entities(text):
+    """Copie de l'ancien PDFProcessor.extract_financial_entities"""
+    return {
+        'prices': re.findall(r'(\d+(?:[,\.]\d+)*)\s*€', text),
+        'percentages': re.findall(r'(\d+(?:[,\.]\d+)*)\s*%', text),
+        'dates': re.findall(r'(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{4})', text),
+        'years': re.findall(r'\b(20\d{2})\b', text),
+        'quarters': re.findall(r'(\d+[er]*\s*trimestre\s*\d{4})', text, re.IGNORECASE),
+        'amounts_millions': re.findall(r'(\d+(?:[,\.]\d+)*)\s*[Mm]€', text),
+        'surfaces': re.findall(r'(\d+(?:[,\.]\d+)*)\s*m[²2]', text)
+    }
+
+
+def legacy_analyze_chunk(text):
+    """Ancienne analyse : classify, entités puis importance (qui ré-extrait les entités)"""
+    text_lower = text.lower()
+    scores = {}
+    for category, keywords in text_pipeline.CATEGORY_KEYWORDS.items():
+        score = sum(1 for keyword in keywords if keyword in text_lower)
+        if score > 0:
+            scores[category] = score / len(keywords)
+    content_type = max(scores, key=scores.get) if scores else 'general'
+
+    entities = legacy_extract_financial_entities(text)
+
+    importance_entities = legacy_extract_financial_entities(text)
+    score = len(importance_entities['prices']) * 2
+    score += len(importance_entities['percentages']) * 2
+    score += len(importance_entities['amounts_millions']) * 3
+    text_lower = text.lower()
+    for keyword in text_pipeline.IMPORTANT_KEYWORDS:
+        if keyword in text_lower:
+            score += 3
+
+    return {
+        'content_type': content_type,
+        'financial_entities': entities,
+        'financial_score': min(10, score),
+        'word_count': len(text.split())
+    }
+
+
+def load_raw_text(path):
+    """Texte brut d'un PDF (une section par page) ou d'un fichier texte"""
+    if not path.lower().endswith('.pdf'):
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    import fitz  # PyMuPDF
+    with fitz.open(path) as doc:
+        return "\n".join(f"\n--- Page {i + 1} ---\n{page.get_text('text')}" for i, page in enumerate(doc))
+
+
+def best_time(func, repeat):
+    """Meilleur temps sur plusieurs répétitions"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(path, repeat=20):
+    raw_text = load_raw_text(path)
+    cleaned = text_pipeline.clean_text(raw_text)
+    chunks = [cleaned[i:i + 800] for i in range(0, len(cleaned), 700)]
+
+    print(f"📄 {path}: {len(raw_text)} caractères bruts, {len(chunks)} chunks de 800 caractères")
+
+    results = {
+        'clean_text': (
+            best_time(lambda: legacy_clean_text(raw_text), repeat),
+            best_time(lambda: text_pipeline.clean_text(raw_text), repeat)
+        ),
+        'analyse chunks': (
+            best_time(lambda: [legacy_analyze_chunk(chunk) for chunk in chunks], repeat),
+            best_time(lambda: [text_pipeline.analyze_chunk(chunk) for chunk in chunks], repeat)
+        )
+    }
+
+    for stage, (legacy, fused) in results.items():
+        print(f"⏱️ {stage:<15} ancien: {legacy * 1000:8.2f} ms   nouveau: {fused * 1000:8.2f} ms   "
+              f"gain: x{legacy / fused:.2f}")
+
+    # Vérification : l'analyse doit rester identique
+    mismatches = sum(1 for chunk in chunks if legacy_analyze_chunk(chunk) != text_pipeline.analyze_chunk(chunk))
+    print(f"🔍 Analyses différentes: {mismatches}/{len(chunks)}")
+    print(f"🔍 Nettoyage identique: {'OUI' if legacy_clean_text(raw_text) == cleaned else 'NON (espaces/tabulations fusionnés)'}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 20)
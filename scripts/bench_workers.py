@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Débit du service de recherche selon le nombre de workers gunicorn
+Pour chaque nombre de workers : lancement de gunicorn (config/gunicorn.conf.py), attente
+de /ready, puis charge constante de clients concurrents sur POST /search.
+
+FileMaker et Ollama doivent être joignables (ou remplacés par des bouchons) : sinon
+le débit mesuré est celui des erreurs.
+
+Usage: python bench_workers.py [workers=1,2,4] [clients_par_worker=4] [durée_s=20] [port=9100]
+"""
+
+import os
+import sys
+import time
+import signal
+import threading
+import subprocess
+import requests
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS = [
+    "Quel est le prix de souscription actuel ?",
+    "Quelle SCPI a le meilleur taux de distribution en 2023 ?",
+    "Combien d'immeubles ont été acquis au dernier trimestre ?",
+    "Quel est le délai de jouissance ?",
+    "Quelle est la capitalisation de la SCPI ?"
+]
+
+
+def start_server(workers, port, threads):
+    env = dict(os.environ, SEARCH_WORKERS=str(workers), SEARCH_THREADS=str(threads), SEARCH_BIND=f"127.0.0.1:{port}")
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'config/gunicorn.conf.py', 'scripts.wsgi:app'],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+    start = time.time()
+    while time.time() - start < 600:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn arrêté (code {process.returncode})")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                return process, time.time() - start
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError("Service non prêt après 600s")
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait(timeout=60)
+
+
+def run_load(port, clients, duration, questions=QUESTIONS):
+    """Clients en boucle fermée ; retourne (latences ms des succès, nb d'erreurs, durée réelle)"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(client_id):
+        session = requests.Session()
+        i = client_id
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = session.post(f"http://127.0.0.1:{port}/search",
+                                        json={'question': questions[i % len(questions)]}, timeout=300)
+                ok = response.status_code == 200 and response.json().get('status') != 'error'
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+            i += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], time.perf_counter() - start
+
+
+def main(worker_counts=(1, 2, 4), clients_per_worker=4, duration=20, port=9100):
+    threads = int(os.getenv('SEARCH_THREADS', '2'))
+    print(f"🏁 {duration}s par palier, {clients_per_worker} clients par worker, {threads} threads par worker\n")
+    print(f"{'workers':>7} {'clients':>7} {'démarrage':>9} {'req/s':>7} {'p50':>8} {'p95':>8} {'erreurs':>7}")
+
+    for workers in worker_counts:
+        process, ready_time = start_server(workers, port, threads)
+        try:
+            clients = workers * clients_per_worker
+            latencies, errors, elapsed = run_load(port, clients, duration)
+        finally:
+            stop_server(process)
+
+        qps = len(latencies) / elapsed
+        p50 = np.percentile(latencies, 50) if latencies else float('nan')
+        p95 = np.percentile(latencies, 95) if latencies else float('nan')
+        print(f"{workers:>7} {clients:>7} {ready_time:>8.1f}s {qps:>7.1f} {p50:>6.0f}ms {p95:>6.0f}ms {errors:>7}")
+
+
+if __name__ == "__main__":
+    main(
+        tuple(int(n) for n in sys.argv[1].split(',')) if len(sys.argv) > 1 else (1, 2, 4),
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 20,
+        int(sys.argv[4]) if len(sys.argv) > 4 else 9100
+    )
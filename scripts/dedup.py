@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Détection de quasi-doublons par MinHash + LSH
+Remplace la comparaison Jaccard O(n²) entre chunks par des signatures MinHash
+indexées en bandes (LSH), utilisables dans un document ou sur tout le corpus
+(index persistant des chunks stockés), et repère les paragraphes répétés d'un
+document à l'autre (mentions légales)
+"""
+
+import os
+import re
+import zlib
+import sqlite3
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Constantes du hachage universel (a * h + b) mod p
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Nombres d'un texte (prix, taux, montants, dates)
+_NUMBER = re.compile(r'\d+(?:[.,]\d+)*')
+
+
+# Chiffre financier (prix, taux, montant, surface) : le paragraphe n'est jamais du boilerplate
+_FINANCIAL_FIGURE = re.compile(r'\d\s*(?:%|€|M€|m²|m2\b)')
+
+# Format de la table boilerplate (shingles avec chiffres depuis la version 2)
+BOILERPLATE_TABLE_VERSION = 2
+
+
+def numeric_tokens(text):
+    """Nombres du texte, triés et sans doublon : empreinte des chiffres d'un chunk"""
+    return ' '.join(sorted(set(_NUMBER.findall(text))))
+
+
+class MinHashLSH:
+    """Index LSH de signatures MinHash avec estimation de la similarité Jaccard"""
+
+    def __init__(self, threshold=0.8, num_perm=128, bands=16, seed=1):
+        """
+        Args:
+            threshold (float): Similarité Jaccard à partir de laquelle deux textes sont doublons
+            num_perm (int): Nombre de permutations (taille de la signature)
+            bands (int): Nombre de bandes LSH (num_perm doit en être un multiple)
+            seed (int): Graine des permutations, fixe pour des signatures reproductibles
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm doit être un multiple de bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, key):
+        return key in self._signatures
+
+    @staticmethod
+    def tokenize(text):
+        """Ensemble de mots utilisé pour la similarité (même base que l'ancien Jaccard)"""
+        return set(text.lower().split())
+
+    def signature(self, text):
+        """Calcule la signature MinHash d'un texte (None si le texte est vide)"""
+        tokens = self.tokenize(text)
+        if not tokens:
+            return None
+
+        hashes = np.fromiter(
+            (zlib.crc32(token.encode('utf-8')) for token in tokens),
+            dtype=np.uint64,
+            count=len(tokens)
+        )
+        permuted = np.bitwise_and((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME, _MAX_HASH)
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def similarity(self, signature, key):
+        """Similarité Jaccard estimée entre une signature et une entrée de l'index"""
+        return float(np.count_nonzero(signature == self._signatures[key])) / self.num_perm
+
+    def query(self, signature):
+        """
+        Recherche les entrées quasi-identiques à une signature
+
+        Returns:
+            list: Tuples (clé, similarité estimée) au-dessus du seuil, meilleur d'abord
+        """
+        if signature is None:
+            return []
+
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band].get(band_key)
+            if bucket:
+                candidates.update(bucket)
+
+        matches = []
+        for key in candidates:
+            similarity = self.similarity(signature, key)
+            if similarity >= self.threshold:
+                matches.append((key, similarity))
+
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
+
+    def insert(self, key, signature):
+        """Ajoute une signature à l'index sous une clé unique"""
+        if signature is None:
+            return
+        if key in self._signatures:
+            self.remove(key)
+
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+
+    def remove(self, key):
+        """Retire une entrée de l'index"""
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band].get(band_key)
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+
+class CorpusIndex:
+    """
+    Signatures MinHash des chunks déjà stockés, persistées en SQLite d'une exécution à l'autre
+
+    Un chunk n'est doublon d'un chunk d'un autre document que si les textes sont quasi
+    identiques (Jaccard estimé ≥ threshold) et portent exactement les mêmes nombres : un
+    bulletin qui reprend la mise en page du trimestre précédent avec de nouveaux chiffres
+    est conservé.
+    """
+
+    def __init__(self, path, threshold=0.95):
+        """
+        Args:
+            path (str): Fichier SQLite des signatures (créé si absent)
+            threshold (float): Similarité Jaccard estimée à partir de laquelle deux chunks sont doublons
+        """
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.lsh = MinHashLSH(threshold=threshold)
+        self.numbers = {}
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS chunk_signatures (
+                record_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                numbers TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                PRIMARY KEY (record_id, chunk_index)
+            );
+        """)
+        self.connection.commit()
+
+        for record_id, chunk_index, numbers, signature in self.connection.execute(
+                "SELECT record_id, chunk_index, numbers, signature FROM chunk_signatures"):
+            key = (record_id, chunk_index)
+            self.lsh.insert(key, np.frombuffer(signature, dtype=np.uint64))
+            self.numbers[key] = numbers
+        if self.numbers:
+            logger.info(f"📚 Index de déduplication chargé: {len(self.numbers)} chunks")
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def signature(self, text):
+        return self.lsh.signature(text)
+
+    def find(self, text, signature, exclude_document=None):
+        """
+        Chunk stocké dont le texte est un doublon de text
+
+        Args:
+            exclude_document (str, optional): Document dont les chunks sont ignorés
+
+        Returns:
+            tuple: Clé (document, position) du doublon, None sinon
+        """
+        numbers = numeric_tokens(text)
+        for key, _ in self.lsh.query(signature):
+            if key[0] != exclude_document and self.numbers.get(key) == numbers:
+                return key
+        return None
+
+    def add(self, record_id, chunk_index, text, signature=None):
+        """Enregistre un chunk stocké (écrit au prochain commit)"""
+        if signature is None:
+            signature = self.signature(text)
+            if signature is None:
+                return
+        key = (str(record_id), int(chunk_index))
+        numbers = numeric_tokens(text)
+        self.lsh.insert(key, signature)
+        self.numbers[key] = numbers
+        self.connection.execute(
+            "INSERT OR REPLACE INTO chunk_signatures (record_id, chunk_index, numbers, signature) VALUES (?, ?, ?, ?)",
+            (key[0], key[1], numbers, signature.astype(np.uint64).tobytes())
+        )
+
+    def remove_document(self, record_id):
+        """Oublie les chunks d'un document (retraitement, chunks supprimés)"""
+        record_id = str(record_id)
+        for key in [key for key in self.numbers if key[0] == record_id]:
+            self.lsh.remove(key)
+            del self.numbers[key]
+        self.connection.execute("DELETE FROM chunk_signatures WHERE record_id = ?", (record_id,))
+        self.connection.commit()
+
+    def rebuild(self, chunk_records):
+        """
+        Reconstruit l'index depuis les chunks stockés dans FileMaker
+
+        Returns:
+            int: Nombre de chunks indexés
+        """
+        for chunk_record in chunk_records:
+            field_data = chunk_record.get('fieldData', {})
+            text = field_data.get('Text', '')
+            try:
+                chunk_index = int(field_data.get('ChunkIndex'))
+            except (TypeError, ValueError):
+                continue
+            if text and field_data.get('idDocument'):
+                self.add(field_data['idDocument'], chunk_index, text)
+        self.commit()
+        return len(self)
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class BoilerplateFilter:
+    """Table de fréquence des shingles sur le corpus pour écarter les paragraphes répétés"""
+
+    def __init__(self, min_documents=5, shingle_size=5, min_words=8, coverage=0.8):
+        """
+        Args:
+            min_documents (int): Un paragraphe vu dans plus de N documents est du boilerplate
+            shingle_size (int): Nombre de mots par shingle
+            min_words (int): Les paragraphes plus courts ne sont jamais écartés (titres, pages)
+            coverage (float): Part des shingles du paragraphe devant dépasser le seuil
+        """
+        self.min_documents = min_documents
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self.coverage = coverage
+        self.counts = {}
+        self.documents = set()
+        # Empreinte d'un paragraphe répétitif -> seul document qui le conserve
+        self.owners = {}
+
+    @staticmethod
+    def _hash(text):
+        data = text.encode('utf-8')
+        return (zlib.crc32(data) << 32) | zlib.adler32(data)
+
+    def _shingles(self, paragraph):
+        """
+        Hashs 64 bits des shingles d'un paragraphe
+
+        Les chiffres sont conservés : un paragraphe de chiffres clés repris d'un bulletin à
+        l'autre avec de nouvelles valeurs n'est pas répétitif.
+        """
+        words = paragraph.lower().split()
+        if len(words) < self.min_words:
+            return set()
+
+        return {self._hash(' '.join(words[i:i + self.shingle_size]))
+                for i in range(len(words) - self.shingle_size + 1)}
+
+    def observe(self, doc_id, paragraph_shingles):
+        """Comptabilise une seule fois les shingles d'un document"""
+        if doc_id in self.documents:
+            return
+        self.documents.add(doc_id)
+
+        document_shingles = set()
+        for shingles in paragraph_shingles:
+            document_shingles.update(shingles)
+        for shingle in document_shingles:
+            self.counts[shingle] = self.counts.get(shingle, 0) + 1
+
+    def is_boilerplate(self, shingles):
+        """Vrai si la majorité des shingles du paragraphe dépasse le seuil de documents"""
+        if not shingles:
+            return False
+        frequent = sum(1 for shingle in shingles if self.counts.get(shingle, 0) > self.min_documents)
+        return frequent / len(shingles) >= self.coverage
+
+    def filter_text(self, doc_id, text):
+        """
+        Met à jour la table avec le document puis retire ses paragraphes répétitifs
+
+        Au-delà du seuil, un paragraphe répétitif n'est conservé que par le premier
+        document qui le rencontre (y compris quand ce document est retraité). Les
+        min_documents documents traités avant que le seuil soit atteint ont déjà gardé
+        leur copie : le corpus en contient au plus min_documents + 1 au lieu d'une par
+        bulletin, et ces copies antérieures ne disparaissent qu'au retraitement de leur
+        document. Les paragraphes portant des chiffres financiers (€, %, M€, m²) ne sont
+        jamais retirés.
+
+        Args:
+            doc_id (str): Identifiant du document
+            text (str): Texte nettoyé du document
+
+        Returns:
+            tuple: (texte sans boilerplate, nombre de paragraphes retirés)
+        """
+        # Après nettoyage, chaque ligne correspond à un paragraphe ou une phrase
+        paragraphs = text.split('\n')
+        paragraph_shingles = [self._shingles(paragraph) for paragraph in paragraphs]
+        self.observe(doc_id, paragraph_shingles)
+
+        kept = []
+        removed = 0
+        for paragraph, shingles in zip(paragraphs, paragraph_shingles):
+            if self.is_boilerplate(shingles) and not _FINANCIAL_FIGURE.search(paragraph):
+                owner = self.owners.setdefault(self._hash(' '.join(paragraph.lower().split())), str(doc_id))
+                if owner != str(doc_id):
+                    removed += 1
+                    continue
+            kept.append(paragraph)
+
+        return '\n'.join(kept), removed
+
+    def save(self, path):
+        """Sauvegarde la table (format npz compressé)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            shingles=np.fromiter(self.counts.keys(), dtype=np.uint64, count=len(self.counts)),
+            counts=np.fromiter(self.counts.values(), dtype=np.uint32, count=len(self.counts)),
+            documents=np.array(sorted(self.documents), dtype=str),
+            owned=np.fromiter(self.owners.keys(), dtype=np.uint64, count=len(self.owners)),
+            owners=np.array(list(self.owners.values()), dtype=str),
+            version=np.array(BOILERPLATE_TABLE_VERSION)
+        )
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """Recharge une table sauvegardée, si elle existe"""
+        if not os.path.exists(path):
+            return False
+
+        try:
+            with np.load(path) as data:
+                if 'version' not in data.files or int(data['version']) != BOILERPLATE_TABLE_VERSION:
+                    logger.warning("⚠️ Table boilerplate d'un format antérieur, reconstruction")
+                    return False
+                self.counts = dict(zip(data['shingles'].tolist(), data['counts'].tolist()))
+                self.documents = set(data['documents'].tolist())
+                self.owners = dict(zip(data['owned'].tolist(), data['owners'].tolist()))
+            logger.info(f"📚 Table boilerplate chargée: {len(self.documents)} documents, {len(self.counts)} shingles")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Table boilerplate illisible, reconstruction: {str(e)}")
+            return False
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Encodeurs de phrases : PyTorch (SentenceTransformer) ou ONNX Runtime
+Le backend ONNX exporte une fois le Transformer du modèle (variante float32 et variante
+int8 quantifiée dynamiquement), vérifie que ses embeddings correspondent à ceux de
+PyTorch, puis encode sans PyTorch : démarrage plus rapide et inférence CPU plus légère.
+
+Usage: python encoders.py export <modèle>
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+CONFIG_FILE = 'encoder.json'
+VARIANT_FILES = {
+    'onnx': 'model.onnx',
+    'onnx-int8': 'model-int8.onnx'
+}
+
+# Phrases de contrôle : embeddings ONNX comparés à ceux de PyTorch après l'export
+VERIFY_SENTENCES = [
+    "Quel est le prix de souscription de la SCPI au 1er trimestre 2024 ?",
+    "Le taux de distribution s'établit à 4,52% pour l'exercice.",
+    "La capitalisation atteint 1 250 M€ et le patrimoine compte 152 immeubles.",
+    "Acquisition d'un immeuble de bureaux à Lyon pour 18,5 M€ acte en main.",
+    "Les conditions de cession des parts restent inchangées.",
+    "Éditorial du président",
+    "Taux d'occupation financier (TOF) : 93,1 %",
+    "Le délai de jouissance est fixé au premier jour du quatrième mois suivant la souscription. "
+    "Les revenus sont versés trimestriellement aux associés."
+]
+
+
+def onnx_path(model_name, root=None):
+    """Dossier de l'export ONNX d'un modèle"""
+    root = root or os.getenv('ONNX_MODELS_PATH', '/opt/filemaker-ai-poc/IaGpt/data/onnx')
+    return os.path.join(root, model_name.replace('/', '__'))
+
+
+def _cosines(a, b):
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+class OnnxEncoder:
+    """Encodeur ONNX Runtime avec la même interface encode() que SentenceTransformer"""
+
+    def __init__(self, path, variant='onnx'):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(path, CONFIG_FILE), encoding='utf-8') as f:
+            self.config = json.load(f)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = int(os.getenv('ONNX_THREADS', '0'))
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.variant = variant
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(path, VARIANT_FILES[variant]), options, providers=['CPUExecutionProvider']
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.input_names = self.config['input_names']
+        self.max_seq_length = self.config['max_seq_length']
+        self.pooling = self.config['pooling']
+        self.normalize = self.config['normalize']
+
+    def get_sentence_embedding_dimension(self):
+        return self.config['dim']
+
+    def _pool(self, token_embeddings, attention_mask):
+        if self.pooling == 'cls':
+            embeddings = token_embeddings[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.normalize:
+            embeddings = embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, convert_to_numpy=True, **kwargs):
+        """
+        Embeddings (n, dim) float32 des phrases
+
+        Les phrases sont regroupées par longueur avant le découpage en lots (moins de
+        padding) puis remises dans l'ordre d'origine.
+        """
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        embeddings = np.empty((len(sentences), self.config['dim']), dtype=np.float32)
+        order = np.argsort([-len(sentence) for sentence in sentences], kind='stable')
+
+        for start in range(0, len(sentences), batch_size):
+            batch = order[start:start + batch_size]
+            tokens = self.tokenizer(
+                [sentences[i] for i in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors='np'
+            )
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+            embeddings[batch] = self._pool(token_embeddings, tokens['attention_mask'])
+
+        return embeddings[0] if single else embeddings
+
+
+def export_onnx(model_name, root=None, quantize=True, opset=17):
+    """
+    Exporte un SentenceTransformer en ONNX puis vérifie chaque variante
+
+    Args:
+        model_name (str): Modèle SentenceTransformer (Transformer + Pooling [+ Normalize])
+        quantize (bool): Produit aussi la variante int8 (quantification dynamique des poids)
+
+    Returns:
+        str: Dossier de l'export
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    start = time.time()
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0]
+    modules = [type(module).__name__ for module in model]
+
+    pooling_config = model[1].get_config_dict() if len(model) > 1 and modules[1] == 'Pooling' else {}
+    # 'pooling_mode' dans les versions récentes de sentence-transformers, drapeaux booléens avant
+    pooling = pooling_config.get('pooling_mode')
+    if pooling is None:
+        pooling = 'cls' if pooling_config.get('pooling_mode_cls_token') else (
+            'mean' if pooling_config.get('pooling_mode_mean_tokens') else None)
+    if pooling not in ('cls', 'mean'):
+        raise ValueError(f"Pooling non supporté pour l'export ONNX: {pooling_config or modules}")
+    if any(name not in ('Transformer', 'Pooling', 'Normalize') for name in modules):
+        raise ValueError(f"Modules non supportés pour l'export ONNX: {modules}")
+
+    path = onnx_path(model_name, root)
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    transformer.tokenizer.save_pretrained(tmp_path)
+    sample = transformer.tokenizer(VERIFY_SENTENCES[:2], padding=True, return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+
+    class TokenEmbeddings(torch.nn.Module):
+        """Sortie last_hidden_state du Transformer, entrées positionnelles pour l'export"""
+
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(input_names, inputs)), return_dict=True).last_hidden_state
+
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['token_embeddings']}
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer.auto_model.eval()),
+            tuple(sample[name] for name in input_names),
+            os.path.join(tmp_path, VARIANT_FILES['onnx']),
+            input_names=input_names,
+            output_names=['token_embeddings'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False
+        )
+
+    variants = ['onnx']
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(
+            os.path.join(tmp_path, VARIANT_FILES['onnx']),
+            os.path.join(tmp_path, VARIANT_FILES['onnx-int8']),
+            weight_type=QuantType.QInt8
+        )
+        variants.append('onnx-int8')
+
+    config = {
+        'model': model_name,
+        'dim': model.get_sentence_embedding_dimension(),
+        'max_seq_length': model.max_seq_length,
+        'pooling': pooling,
+        'normalize': 'Normalize' in modules,
+        'input_names': input_names,
+        'exported_at': time.time()
+    }
+    with open(os.path.join(tmp_path, CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+
+    # Vérification : similarité cosinus avec les embeddings PyTorch sur les phrases de contrôle
+    reference = model.encode(VERIFY_SENTENCES, show_progress_bar=False, convert_to_numpy=True)
+    config['verification'] = {}
+    for variant in variants:
+        embeddings = OnnxEncoder(tmp_path, variant).encode(VERIFY_SENTENCES)
+        cosines = _cosines(reference, embeddings)
+        config['verification'][variant] = {
+            'min_cosine': float(cosines.min()),
+            'max_abs_diff': float(np.abs(reference - embeddings).max())
+        }
+        logger.info(f"🔎 {variant}: cosinus min {cosines.min():.5f} avec PyTorch")
+
+    with open(os.path.join(tmp_path, CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    logger.info(f"📦 Export ONNX de {model_name} en {time.time() - start:.1f}s: {path}")
+    return path
+
+
+def load_encoder(model_name, backend=None):
+    """
+    Charge l'encodeur d'un modèle avec le backend demandé (EMBEDDING_BACKEND par défaut)
+
+    Le backend ONNX exporte le modèle au premier chargement. Une variante dont les
+    embeddings s'écartent de PyTorch (cosinus < ONNX_MIN_COSINE) n'est pas utilisée :
+    retour au SentenceTransformer PyTorch.
+    """
+    backend = backend or os.getenv('EMBEDDING_BACKEND', 'torch')
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend d'embedding inconnu: {backend} (attendu: {', '.join(BACKENDS)})")
+
+    if backend != 'torch':
+        try:
+            path = onnx_path(model_name)
+            if not os.path.exists(os.path.join(path, CONFIG_FILE)):
+                logger.info(f"📦 Pas d'export ONNX pour {model_name}, export en cours...")
+                export_onnx(model_name)
+
+            with open(os.path.join(path, CONFIG_FILE), encoding='utf-8') as f:
+                verification = json.load(f).get('verification', {}).get(backend)
+
+            min_cosine = float(os.getenv('ONNX_MIN_COSINE', '0.99'))
+            if verification and verification['min_cosine'] >= min_cosine:
+                return OnnxEncoder(path, backend)
+
+            logger.warning(f"⚠️ Export {backend} de {model_name} hors tolérance ({verification}), retour à PyTorch")
+        except Exception as e:
+            logger.warning(f"⚠️ Backend {backend} indisponible pour {model_name}, retour à PyTorch: {e}")
+
+    from sentence_transformers import SentenceTransformer
+    threads = int(os.getenv('TORCH_THREADS', '0'))
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    return SentenceTransformer(model_name)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 3 or sys.argv[1] != 'export':
+        print("Usage: python encoders.py export <modèle>")
+        sys.exit(1)
+    export_onnx(sys.argv[2])
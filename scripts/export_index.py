@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Export massif des chunks FileMaker vers une version d'index local
+Construit une version à partir des embeddings déjà stockés dans EmbeddingJson (sans
+ré-encoder le texte, voir reindex.py pour changer de modèle) :
+  - le layout Chunks est lu par fenêtres d'offsets concurrentes, une session FileMaker
+    par fenêtre active ;
+  - le décodage JSON des vecteurs est réparti sur un pool de processus ;
+  - vecteurs et métadonnées sont écrits directement par IndexBuilder (fichier binaire
+    + table SQLite), dans l'ordre FileMaker.
+Seuls les vecteurs du modèle demandé (champ CHUNKS_MODEL_FIELD, ou absent) et de la bonne
+dimension sont exportés.
+
+Usage: python export_index.py [modèle] [--windows=4] [--parsers=0] [--page-size=1000]
+       [--storage=float32|float16|int8] [--codec=ivfpq] [--no-activate]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+
+from filemaker_extractor import FileMakerExtractor
+from vector_index import IndexStore
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_embeddings(embeddings, dim=None):
+    """
+    Décode les EmbeddingJson d'une page (exécuté dans un processus du pool)
+
+    Args:
+        embeddings (list): Chaînes JSON des vecteurs
+        dim (int, optional): Dimension attendue (celle du premier vecteur valide sinon)
+
+    Returns:
+        tuple: (matrice float32 (n, dim), positions des vecteurs valides dans la page)
+    """
+    vectors, positions = [], []
+    for position, embedding_json in enumerate(embeddings):
+        try:
+            vector = np.asarray(json.loads(embedding_json), dtype=np.float32)
+        except (ValueError, TypeError):
+            continue
+        if vector.ndim != 1 or not len(vector) or (dim is not None and len(vector) != dim):
+            continue
+        dim = dim or len(vector)
+        vectors.append(vector)
+        positions.append(position)
+
+    if not vectors:
+        return np.zeros((0, dim or 0), dtype=np.float32), positions
+    return np.vstack(vectors), positions
+
+
+class ChunkExporter:
+    """Lecture concurrente du layout Chunks : une session FileMaker par thread de fenêtre"""
+
+    def __init__(self, layout='Chunks', page_size=1000):
+        self.layout = layout
+        self.page_size = page_size
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def _extractor(self):
+        extractor = getattr(self._local, 'extractor', None)
+        if extractor is None:
+            extractor = FileMakerExtractor()
+            if not extractor.login():
+                raise ConnectionError("Connexion FileMaker impossible pour une fenêtre d'export")
+            self._local.extractor = extractor
+            with self._lock:
+                self._sessions.append(extractor)
+        return extractor
+
+    def fetch(self, offset):
+        """
+        Lit une fenêtre d'offsets
+
+        Returns:
+            tuple: (enregistrements, nombre total de chunks)
+        """
+        return self._extractor().fetch_page(self.layout, offset, self.page_size)
+
+    def close(self):
+        for extractor in self._sessions:
+            extractor.logout()
+        self._sessions.clear()
+
+
+def select_records(records, model_name, model_field='EmbeddingModel'):
+    """
+    Chunks exportables d'une page : texte, embedding et modèle compatible
+
+    Returns:
+        tuple: (métadonnées, EmbeddingJson correspondants, chunks écartés pour un autre modèle)
+    """
+    metadata, embeddings, other_model = [], [], 0
+    for chunk_record in records:
+        field_data = chunk_record.get('fieldData', {})
+        text = field_data.get('Text', '').strip()
+        embedding_json = field_data.get('EmbeddingJson', '')
+        if not text or not isinstance(embedding_json, str) or not embedding_json.strip():
+            continue
+
+        embedding_model = field_data.get(model_field) if model_field else None
+        if embedding_model and embedding_model != model_name:
+            other_model += 1
+            continue
+
+        metadata.append({
+            'recordId': chunk_record.get('recordId'),
+            'idDocument': field_data.get('idDocument', ''),
+            'ChunkIndex': field_data.get('ChunkIndex'),
+            'Text': text
+        })
+        embeddings.append(embedding_json)
+    return metadata, embeddings, other_model
+
+
+def export(store, model_name, windows=4, parsers=None, page_size=1000, storage='float32', codec=None,
+           layout='Chunks'):
+    """
+    Exporte tous les chunks FileMaker dans une nouvelle version d'index
+
+    Args:
+        store (IndexStore): Dépôt des versions d'index
+        model_name (str): Modèle dont les vecteurs sont exportés
+        windows (int): Fenêtres d'offsets lues en parallèle (sessions FileMaker)
+        parsers (int, optional): Processus de décodage JSON (défaut: nombre de CPU)
+        page_size (int): Chunks par fenêtre (1000 au plus côté Data API)
+        storage (str): Stockage des vecteurs de la version ('float32', 'float16', 'int8')
+        codec (str): 'ivfpq' pour construire l'index compressé (IVF_NLIST, PQ_SUBVECTORS)
+
+    Returns:
+        dict: Version construite et statistiques (chunks/s, chunks écartés)
+    """
+    parsers = parsers or os.cpu_count() or 1
+    exporter = ChunkExporter(layout, page_size)
+    model_field = os.getenv('CHUNKS_MODEL_FIELD', 'EmbeddingModel')
+    # forkserver/spawn : le fork d'un processus multi-thread (lecteurs FileMaker) peut hériter de verrous pris
+    context = multiprocessing.get_context(
+        'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+    start = time.time()
+    stats = {'read': 0, 'exported': 0, 'other_model': 0, 'invalid': 0}
+    builder = None
+
+    def read_window(offset, pool, dim):
+        records, found = exporter.fetch(offset)
+        metadata, embeddings, other_model = select_records(records, model_name, model_field)
+        return len(records), found, metadata, other_model, pool.submit(parse_embeddings, embeddings, dim)
+
+    def write_window(result):
+        nonlocal builder
+        count, _, metadata, other_model, parsed = result
+        vectors, positions = parsed.result()
+        stats['read'] += count
+        stats['other_model'] += other_model
+        stats['invalid'] += len(metadata) - len(positions)
+        if not positions:
+            return
+        if builder is not None and vectors.shape[1] != builder.dim:
+            stats['invalid'] += len(positions)
+            return
+        if builder is None:
+            builder = store.create_builder(model_name, vectors.shape[1])
+        builder.add(vectors, [metadata[position] for position in positions])
+        stats['exported'] = builder.count
+
+    try:
+        with ThreadPoolExecutor(max_workers=windows, thread_name_prefix='fm-export') as readers, \
+                ProcessPoolExecutor(max_workers=parsers, mp_context=context) as pool:
+            # Première fenêtre seule : nombre total de chunks et dimension des vecteurs
+            first = read_window(1, pool, None)
+            total = first[1]
+            write_window(first)
+            dim = builder.dim if builder else None
+            logger.info(f"📦 {total} chunks à lire: {windows} fenêtres de {page_size}, {parsers} processus de décodage")
+
+            # Fenêtres suivantes dans l'ordre, au plus 2 en attente par fenêtre active
+            pending = deque()
+            last_log = time.time()
+            for offset in range(1 + page_size, total + 1, page_size):
+                pending.append(readers.submit(read_window, offset, pool, dim))
+                if len(pending) >= windows * 2:
+                    write_window(pending.popleft().result())
+                if time.time() - last_log >= 10:
+                    last_log = time.time()
+                    logger.info(f"📥 {stats['read']}/{total} chunks lus ({stats['read'] / (last_log - start):.0f} chunks/s)")
+
+            while pending:
+                write_window(pending.popleft().result())
+
+        if builder is None:
+            raise ValueError(f"Aucun embedding du modèle {model_name} dans FileMaker")
+
+        elapsed = time.time() - start
+        codec_options = {
+            'nlist': int(os.getenv('IVF_NLIST', '0')) or None,
+            'm': int(os.getenv('PQ_SUBVECTORS', '0')) or None
+        }
+        builder.finalize(storage=storage, codec=codec, codec_options=codec_options,
+                         source='filemaker-export', elapsed=elapsed, skipped_other_model=stats['other_model'],
+                         skipped_invalid=stats['invalid'])
+    except BaseException:
+        if builder is not None:
+            builder.abort()
+        raise
+    finally:
+        exporter.close()
+
+    stats.update(version=builder.version, elapsed_s=elapsed, records_per_s=stats['read'] / elapsed if elapsed else 0.0)
+    logger.info(f"✅ Version {builder.version}: {stats['exported']} chunks exportés sur {stats['read']} lus "
+                f"en {elapsed:.1f}s ({stats['records_per_s']:.0f} chunks/s)")
+    if stats['other_model'] or stats['invalid']:
+        logger.info(f"⏭️ Écartés: {stats['other_model']} d'un autre modèle, {stats['invalid']} vecteurs illisibles")
+    return stats
+
+
+def main(model_name=None, windows=None, parsers=None, page_size=1000, activate=True, storage=None, codec=None):
+    model_name = model_name or os.getenv('EMBEDDING_MODEL', 'dangvantuan/sentence-camembert-large')
+    store = IndexStore(os.getenv('VECTOR_INDEX_PATH', '/opt/filemaker-ai-poc/IaGpt/data/index'))
+    storage = storage or os.getenv('VECTOR_INDEX_STORAGE', 'float32')
+    codec = codec or os.getenv('VECTOR_INDEX_CODEC') or None
+    windows = windows or int(os.getenv('EXPORT_WINDOWS', '4'))
+    parsers = parsers or int(os.getenv('EXPORT_PARSE_WORKERS', '0')) or None
+
+    try:
+        stats = export(store, model_name, windows, parsers, page_size, storage=storage, codec=codec,
+                       layout=os.getenv('CHUNKS_EXPORT_LAYOUT', 'Chunks'))
+    except Exception as e:
+        logger.error(f"❌ Export échoué, index actif inchangé: {str(e)}")
+        return None
+
+    if activate:
+        store.activate(stats['version'])
+        store.prune(keep=2)
+    else:
+        logger.info(f"⏸️ Version {stats['version']} prête, non activée")
+
+    return stats['version']
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    main(
+        args[0] if args else None,
+        int(options['windows']) if 'windows' in options else None,
+        int(options['parsers']) if 'parsers' in options else None,
+        int(options.get('page-size', 1000)),
+        activate='--no-activate' not in sys.argv,
+        storage=options.get('storage'),
+        codec=options.get('codec')
+    )
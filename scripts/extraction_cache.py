@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Cache local des extractions PDF adressé par contenu
+Stocke le texte nettoyé et les offsets des chunks (SQLite, texte compressé zlib,
+offsets en entiers 32 bits) pour qu'un re-chunking ou un re-embedding du corpus
+saute le téléchargement et le parsing PyMuPDF/pdfplumber
+"""
+
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+from array import array
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data):
+    """Empreinte SHA-256 d'un contenu (octets ou texte)"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+class ExtractionCache:
+    """Cache texte + chunks indexé par empreinte du PDF et par version d'enregistrement FileMaker"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Fichier SQLite du cache (créé si absent)
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                content_hash TEXT PRIMARY KEY,
+                text BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sources (
+                source_key TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunk_spans (
+                content_hash TEXT NOT NULL,
+                chunker TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                spans BLOB NOT NULL,
+                PRIMARY KEY (content_hash, chunker)
+            );
+        """)
+        self.connection.commit()
+
+    @staticmethod
+    def source_key(record_id, mod_id):
+        """Clé d'un document FileMaker : recordId + modId (incrémenté à chaque modification)"""
+        return f"{record_id}:{mod_id}"
+
+    def lookup_source(self, source_key):
+        """Empreinte du contenu déjà extrait pour une version d'enregistrement"""
+        row = self.connection.execute(
+            "SELECT content_hash FROM sources WHERE source_key = ?", (source_key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def link_source(self, source_key, digest):
+        """Associe une version d'enregistrement à une empreinte de contenu"""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO sources (source_key, content_hash) VALUES (?, ?)",
+            (source_key, digest)
+        )
+        self.connection.commit()
+
+    def get_text(self, digest):
+        """Texte nettoyé en cache pour une empreinte, None si absent"""
+        row = self.connection.execute(
+            "SELECT text FROM extractions WHERE content_hash = ?", (digest,)
+        ).fetchone()
+        return zlib.decompress(row[0]).decode('utf-8') if row else None
+
+    def put_text(self, digest, text):
+        """Enregistre le texte nettoyé d'un contenu"""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO extractions (content_hash, text, created_at) VALUES (?, ?, ?)",
+            (digest, zlib.compress(text.encode('utf-8')), time.time())
+        )
+        self.connection.commit()
+
+    def get_spans(self, digest, chunker, text):
+        """
+        Offsets des chunks calculés pour ce contenu et cette version du chunker
+
+        Les offsets ne sont réutilisés que si le texte découpé est identique (le filtrage
+        du boilerplate peut le faire évoluer d'une exécution à l'autre).
+
+        Returns:
+            list: Tuples (start, end), None si absent ou périmé
+        """
+        row = self.connection.execute(
+            "SELECT text_hash, spans FROM chunk_spans WHERE content_hash = ? AND chunker = ?",
+            (digest, chunker)
+        ).fetchone()
+        if not row or row[0] != content_hash(text):
+            return None
+
+        offsets = array('I')
+        offsets.frombytes(row[1])
+        return list(zip(offsets[0::2], offsets[1::2]))
+
+    def put_spans(self, digest, chunker, text, spans):
+        """Enregistre les offsets des chunks d'un contenu"""
+        offsets = array('I', [offset for span in spans for offset in span])
+        self.connection.execute(
+            "INSERT OR REPLACE INTO chunk_spans (content_hash, chunker, text_hash, spans) VALUES (?, ?, ?, ?)",
+            (digest, chunker, content_hash(text), offsets.tobytes())
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,678 @@
+#!/usr/bin/env python3
+"""
+Client asyncio du Data API FileMaker
+Variante de FileMakerExtractor pour l'ingestion et la recherche concurrentes : de
+nombreux appels en vol sans un thread chacun. Mêmes méthodes (coroutines) et mêmes
+formes de retour ; configuration, requêtes et politique d'appel (délais par type
+d'appel, nouvelles tentatives, disjoncteur partagé du processus) sont celles de
+FileMakerExtractor.
+
+Les connexions HTTP sont plafonnées par FILEMAKER_ASYNC_CONNECTIONS et peuvent être
+partagées entre clients en passant la même aiohttp.ClientSession. Un jeton expiré est
+renouvelé une seule fois pour toutes les requêtes qui l'utilisaient.
+
+Usage:
+    async with AsyncFileMakerExtractor() as fm:
+        chunks, documents = await asyncio.gather(fm.search_chunks_smart(question),
+                                                 fm.get_documents_without_chunks())
+"""
+
+import os
+import time
+import asyncio
+
+import aiohttp
+
+# Module frère : importé via le paquet scripts (service) ou directement (scripts d'ingestion)
+if __package__:
+    from . import metrics, resilience
+    from .filemaker_extractor import FileMakerExtractor, PDFWriter
+else:
+    import metrics
+    import resilience
+    from filemaker_extractor import FileMakerExtractor, PDFWriter
+
+# Erreurs réseau d'aiohttp (connexion, protocole, délai dépassé)
+NETWORK_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+async def _read_json(response):
+    try:
+        return await response.json(content_type=None)
+    except ValueError:
+        return {}
+
+
+class AsyncFileMakerExtractor(FileMakerExtractor):
+    """Extracteur FileMaker asynchrone (aiohttp), mêmes formes de retour que FileMakerExtractor"""
+
+    def __init__(self, session=None):
+        """
+        Args:
+            session (aiohttp.ClientSession, optional): Session HTTP partagée (et son plafond
+                de connexions) ; créée à la première requête sinon
+        """
+        super().__init__()
+        self.connection_limit = int(os.getenv('FILEMAKER_ASYNC_CONNECTIONS', '16'))
+        self._session = session
+        self._owns_session = session is None
+        self._login_lock = asyncio.Lock()
+
+    def _http(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, ssl=False)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
+        return self._session
+
+    async def close(self):
+        """Ferme la session HTTP si elle a été créée par ce client"""
+        if self._owns_session and self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _request(self, endpoint, method, url, idempotent=True, bearer=True, retry=True, read=None,
+                       **kwargs):
+        """
+        Appel Data API commun (politique de FileMakerExtractor._request)
+
+        Args:
+            read (coroutine, optional): read(response) pour une réponse 200 ; corps JSON sinon
+
+        Returns:
+            tuple: (statut HTTP, corps JSON ou résultat de read)
+
+        Raises:
+            FileMakerUnavailable: Disjoncteur ouvert, requête non envoyée
+            aiohttp.ClientError, asyncio.TimeoutError: Erreur réseau après les nouvelles tentatives
+        """
+        connect, sock_read = resilience.endpoint_timeout(endpoint)
+        kwargs.setdefault('timeout', aiohttp.ClientTimeout(sock_connect=connect, sock_read=sock_read))
+        headers = dict(kwargs.pop('headers', None) or {})
+        retries = self.retry_policy.retries if retry else 0
+        deadline = time.monotonic() + self.retry_policy.budget
+        renewed = False
+        attempt = 0
+
+        while True:
+            if not self.breaker.allow():
+                metrics.FILEMAKER_REJECTED.labels(endpoint).inc()
+                raise resilience.FileMakerUnavailable(
+                    f"FileMaker indisponible, disjoncteur ouvert ({self.breaker.retry_after():.0f}s restantes)")
+
+            token = self.token
+            if bearer:
+                headers['Authorization'] = f'Bearer {token}'
+            status, payload, code = None, None, None
+            try:
+                async with self._http().request(method, url, headers=headers, **kwargs) as response:
+                    status = response.status
+                    if status == 200 and read is not None:
+                        payload = await read(response)
+                    else:
+                        payload = await _read_json(response)
+                        if status >= 400:
+                            code = str((payload.get('messages') or [{}])[0].get('code'))
+            except NETWORK_ERRORS as e:
+                if self.breaker.record_failure():
+                    self.logger.error(f"⛔ Disjoncteur FileMaker ouvert pour {self.breaker.cooldown:.0f}s: {e!r}")
+                if not (idempotent or isinstance(e, aiohttp.ClientConnectorError)) or attempt >= retries:
+                    raise
+                error = e
+            else:
+                if status == 401 and code == '952' and bearer and not renewed:
+                    self.breaker.record_success()
+                    renewed = True
+                    if await self._renew(token):
+                        continue
+                    return status, payload
+                if not resilience.is_transient(status, code):
+                    self.breaker.record_success()
+                    return status, payload
+                if self.breaker.record_failure():
+                    self.logger.error(f"⛔ Disjoncteur FileMaker ouvert pour {self.breaker.cooldown:.0f}s: HTTP {status}")
+                if attempt >= retries or (not idempotent and status in (502, 504)):
+                    return status, payload
+                error = f"HTTP {status}" + (f" (code {code})" if code else "")
+
+            delay = self.retry_policy.delay(attempt)
+            if time.monotonic() + delay >= deadline or self.breaker.state == 'open':
+                if isinstance(error, Exception):
+                    raise error
+                return status, payload
+            attempt += 1
+            metrics.FILEMAKER_RETRIES.labels(endpoint).inc()
+            self.logger.warning(f"🔁 {endpoint}: {error!r}, tentative {attempt + 1}/{retries + 1} dans {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def _renew(self, stale_token):
+        """Une seule reconnexion pour toutes les requêtes parties avec le jeton expiré"""
+        async with self._login_lock:
+            if self.token != stale_token and self.session_active:
+                return True
+            self.logger.info("🔑 Jeton FileMaker expiré, reconnexion")
+            return await self.login()
+
+    async def login(self):
+        """Établit une session avec FileMaker Server"""
+        url = f"{self.server}/fmi/data/v1/databases/{self.database}/sessions"
+        headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Basic {self._encode_credentials()}'
+        }
+
+        try:
+            self.logger.info("🔐 Tentative de connexion à FileMaker...")
+            status, data = await self._request('login', 'POST', url, bearer=False, headers=headers)
+
+            if status in [200, 201]:
+                self.token = data['response']['token']
+                self.session_active = True
+                self.logger.info("✅ Connexion FileMaker établie")
+                return True
+            self.logger.error(f"❌ Échec connexion: {status} - {data.get('messages')}")
+            return False
+
+        except resilience.FileMakerUnavailable as e:
+            self.logger.error(f"⛔ {str(e)}")
+            return False
+        except NETWORK_ERRORS as e:
+            self.logger.error(f"❌ Erreur réseau FileMaker: {e!r}")
+            return False
+        except Exception as e:
+            self.logger.error(f"❌ Erreur inattendue connexion: {str(e)}")
+            return False
+
+    async def connect(self):
+        """Alias pour login() - compatibilité avec les autres services"""
+        return await self.login()
+
+    async def ping(self, timeout=5):
+        """Disponibilité du Data API sans ouvrir de session"""
+        url = f"{self.server}/fmi/data/v1/productInfo"
+        try:
+            async with self._http().get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                return response.status == 200
+        except NETWORK_ERRORS as e:
+            self.logger.warning(f"⚠️ FileMaker injoignable: {e!r}")
+            return False
+
+    async def logout(self):
+        """Ferme la session FileMaker"""
+        if not self.token:
+            return True
+
+        url = f"{self.server}/fmi/data/v1/databases/{self.database}/sessions/{self.token}"
+        try:
+            await self._request('logout', 'DELETE', url, bearer=False, retry=False)
+            self.logger.info("👋 Session FileMaker fermée")
+        except Exception as e:
+            self.logger.warning(f"⚠️ Erreur fermeture session: {str(e)}")
+        finally:
+            self.token = None
+            self.session_active = False
+
+        return True
+
+    async def get_all_chunks_sample(self, limit=1000):
+        """Récupère un échantillon de tous les chunks sans filtre"""
+        if not self._check_connection():
+            return []
+
+        try:
+            chunks, _ = await self.fetch_page('Chunks', 1, min(limit, 1000))
+            self.logger.info(f"✅ {len(chunks)} chunks récupérés")
+            return chunks
+        except ConnectionError as e:
+            self.logger.error(f"❌ Exception: {str(e)}")
+            return []
+
+    async def search_chunks_smart(self, question, limit=1000, embeddings=False):
+        """
+        Recherche intelligente dans les chunks avec extraction automatique de mots-clés
+
+        Args:
+            embeddings (bool): Renvoyer EmbeddingJson même si CHUNKS_SEARCH_LAYOUT est défini
+
+        Returns:
+            list: Liste des chunks trouvés au format FileMaker natif
+        """
+        if not self._check_connection():
+            return []
+
+        payload = self._smart_find_payload(question, limit, embeddings)
+        if payload is None:
+            return []
+
+        url = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/Chunks/_find"
+        try:
+            self.logger.info(f"🎯 Recherche FileMaker: {len(payload['query'])} conditions")
+            with metrics.span('filemaker_find'):
+                status, data = await self._request('find', 'POST', url, json=payload)
+                while status != 200:
+                    code = str((data.get('messages') or [{}])[0].get('code'))
+                    payload = self._smart_find_fallback(question, limit, embeddings, payload, code)
+                    if payload is None:
+                        break
+                    status, data = await self._request('find', 'POST', url, json=payload)
+        except resilience.FileMakerUnavailable as e:
+            self.logger.warning(f"⛔ Recherche non envoyée: {str(e)}")
+            return []
+        except NETWORK_ERRORS as e:
+            self.logger.error(f"❌ Erreur réseau recherche: {e!r}")
+            return []
+
+        if status == 200:
+            chunks = data['response']['data']
+            self.logger.info(f"✅ {len(chunks)} chunks trouvés")
+            return chunks
+
+        messages = data.get('messages', [{}])
+        # Code 401 FileMaker : aucun enregistrement ne correspond
+        if not (messages and str(messages[0].get('code')) == '401'):
+            self.logger.error(f"❌ Erreur recherche: {status} - {messages}")
+        return []
+
+    async def fetch_page(self, layout, offset, page_size, query=None, portals=None, portal_limit=None,
+                         response_layout=None):
+        """
+        Lit une page d'enregistrements d'un layout (GET records, ou _find si une requête est fournie)
+
+        Returns:
+            tuple: (enregistrements, nombre total trouvé)
+
+        Raises:
+            ConnectionError: Si la page ne peut pas être lue
+            KeyError: Si un champ de la requête n'est pas sur le layout (102)
+        """
+        endpoint, method, url, options = self._page_request(layout, offset, page_size, query, portals, portal_limit,
+                                                            response_layout)
+        try:
+            status, data = await self._request(endpoint, method, url, **options)
+        except NETWORK_ERRORS as e:
+            raise ConnectionError(f"Erreur réseau lecture {layout} (offset {offset}): {e!r}")
+        return self._page_result(layout, offset, query, status, data)
+
+    async def iter_documents(self, page_size=None, limit=None, layout=None, query=None, portals=None,
+                             portal_limit=None, prefetch=True, response_layout=None):
+        """
+        Parcourt les documents page par page, la page suivante étant lue pendant le
+        traitement de la page courante (mêmes arguments que FileMakerExtractor.iter_documents)
+
+        Yields:
+            dict: Enregistrement FileMaker (recordId, modId, fieldData, portalData)
+
+        Raises:
+            ConnectionError: Si une page ne peut pas être lue
+        """
+        if not self._check_connection():
+            raise ConnectionError("Pas de session FileMaker active")
+
+        layout = layout or os.getenv('DOCUMENTS_LAYOUT', 'Documents')
+        page_size = page_size or int(os.getenv('DOCUMENTS_PAGE_SIZE', '100'))
+        self.documents_found = None
+
+        async def fetch(offset):
+            size = page_size if limit is None else min(page_size, limit - offset + 1)
+            return await self.fetch_page(layout, offset, size, query, portals, portal_limit, response_layout), size
+
+        offset = 1
+        pending = asyncio.ensure_future(fetch(offset)) if prefetch else None
+        try:
+            while True:
+                (page, found), size = await pending if prefetch else await fetch(offset)
+                if self.documents_found is None:
+                    self.documents_found = found if limit is None else min(found, limit)
+
+                offset += len(page)
+                last = len(page) < size or (limit is not None and offset > limit)
+                if prefetch and not last:
+                    pending = asyncio.ensure_future(fetch(offset))
+
+                self.logger.info(f"📄 Lot récupéré: {len(page)} docs (total: {offset - 1}/{found})")
+                for document in page:
+                    yield document
+
+                if last:
+                    break
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+    async def get_documents(self, limit=None):
+        """
+        Récupère tous les documents avec pagination automatique
+
+        Returns:
+            list: Liste de tous les documents (partielle si une page échoue)
+        """
+        if not self._check_connection():
+            return []
+
+        all_documents = []
+        try:
+            async for document in self.iter_documents(limit=limit):
+                all_documents.append(document)
+        except ConnectionError as e:
+            self.logger.error(f"❌ Exception récupération documents: {str(e)}")
+
+        self.logger.info(f"📄 TOTAL DOCUMENTS: {len(all_documents)}")
+        return all_documents
+
+    async def iter_documents_without_chunks(self, page_size=None, layout=None):
+        """
+        Parcourt les documents qui n'ont encore aucun chunk (recherche "=" sur le champ lié),
+        page par page (voir FileMakerExtractor.iter_documents_without_chunks)
+
+        Raises:
+            ConnectionError: Si une page ne peut pas être lue
+            KeyError: Si le champ lié n'est pas sur le layout (avant tout document)
+        """
+        if not self._check_connection():
+            raise ConnectionError("Pas de session FileMaker active")
+
+        layout, page_size, query, response_layout = self._without_chunks_find(page_size, layout)
+        self.documents_found = None
+        seen = set()
+        offset = 1
+        while offset is not None:
+            page, found = await self.fetch_page(layout, offset, page_size, query, response_layout=response_layout)
+            if self.documents_found is None:
+                self.documents_found = found
+
+            documents, offset = self._next_without_chunks(page, page_size, offset, seen)
+            if documents:
+                self.logger.info(f"📄 Lot récupéré: {len(documents)} docs sans chunks ({found} restants)")
+            for document in documents:
+                yield document
+
+    async def get_document(self, record_id, layout=None):
+        """
+        Relit un document complet par son recordId
+
+        Returns:
+            dict: Enregistrement FileMaker, None s'il n'existe plus
+
+        Raises:
+            ConnectionError: Si l'enregistrement ne peut pas être lu
+        """
+        layout = layout or os.getenv('DOCUMENTS_LAYOUT', 'Documents')
+        url = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/{layout}/records/{record_id}"
+        try:
+            status, data = await self._request('records', 'GET', url)
+        except NETWORK_ERRORS as e:
+            raise ConnectionError(f"Erreur réseau lecture {layout} ({record_id}): {e!r}")
+
+        if status != 200 and str((data.get('messages') or [{}])[0].get('code')) == '101':
+            return None
+        page, _ = self._page_result(layout, record_id, None, status, data)
+        return page[0] if page else None
+
+    async def get_documents_without_chunks(self, page_size=100):
+        """
+        Récupère en une seule recherche les documents qui n'ont encore aucun chunk
+
+        Returns:
+            list: Documents sans chunk, None si la recherche n'est pas disponible
+        """
+        if not self._check_connection():
+            return None
+
+        documents = []
+        try:
+            async for document in self.iter_documents_without_chunks(page_size):
+                documents.append(document)
+        except (ConnectionError, KeyError) as e:
+            self.logger.error(f"❌ Exception recherche documents sans chunks: {str(e)}")
+            return None
+
+        self.logger.info(f"📄 {len(documents)} documents sans chunks")
+        return documents
+
+    async def get_chunks_for_document(self, doc_id):
+        """
+        Chunks existants d'un document
+
+        Returns:
+            list: Liste des chunks existants pour ce document
+        """
+        if not self._check_connection():
+            return []
+
+        try:
+            chunks, _ = await self.fetch_page('Chunks', 1, 1000, query=[{"idDocument": doc_id}])
+            return chunks
+        except ConnectionError as e:
+            self.logger.error(f"❌ Erreur récupération chunks: {str(e)}")
+            return []
+
+    async def delete_chunks_for_document(self, doc_id):
+        """
+        Supprime tous les chunks d'un document (reprise d'un document interrompu)
+
+        Returns:
+            int: Nombre de chunks supprimés
+
+        Raises:
+            ConnectionError: Si un chunk ne peut pas être lu ou supprimé
+        """
+        if not self._check_connection():
+            raise ConnectionError("Pas de session FileMaker active")
+
+        base = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/Chunks/records"
+
+        async def delete(record_id):
+            try:
+                status, data = await self._request('delete', 'DELETE', f"{base}/{record_id}")
+            except NETWORK_ERRORS as e:
+                raise ConnectionError(f"Erreur réseau suppression chunk {record_id}: {e!r}")
+            if status != 200 and str((data.get('messages') or [{}])[0].get('code')) != '101':
+                raise ConnectionError(f"Erreur suppression chunk {record_id}: {status}")
+
+        deleted = 0
+        while True:
+            records, _ = await self.fetch_page('Chunks', 1, 1000, query=[{"idDocument": f"=={doc_id}"}],
+                                               response_layout=self.search_layout or None)
+            if not records:
+                return deleted
+            await asyncio.gather(*(delete(record['recordId']) for record in records))
+            deleted += len(records)
+
+    async def iter_chunk_records(self, page_size=1000):
+        """
+        Parcourt tous les enregistrements du layout Chunks page par page
+
+        Raises:
+            ConnectionError: Si une page ne peut pas être lue
+        """
+        if not self._check_connection():
+            raise ConnectionError("Pas de session FileMaker active")
+
+        offset = 1
+        while True:
+            records, _ = await self.fetch_page('Chunks', offset, page_size)
+            for record in records:
+                yield record
+            if len(records) < page_size:
+                break
+            offset += page_size
+
+    async def load_chunk_fields(self):
+        """
+        Champs du layout Chunks (métadonnées du Data API), lus une fois par session
+
+        Returns:
+            set: Noms des champs, None si les métadonnées ne sont pas lisibles
+        """
+        if self.chunk_fields_checked or not self._check_connection():
+            return self.chunk_fields
+
+        url = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/Chunks"
+        try:
+            status, data = await self._request('metadata', 'GET', url)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Métadonnées du layout Chunks illisibles: {e!r}")
+            return None
+
+        if status == 200:
+            self._set_chunk_fields(data)
+        else:
+            self.chunk_fields_checked = True
+            self.logger.warning(f"⚠️ Métadonnées du layout Chunks illisibles: {status} - {data.get('messages')}")
+        return self.chunk_fields
+
+    async def create_chunk(self, idDocument, chunk_text, chunk_index, embeddings=None, embedding_model=None):
+        """Crée un nouveau chunk dans FileMaker avec tous les champs"""
+        if not self._check_connection():
+            return False
+        await self.load_chunk_fields()
+
+        url = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/Chunks/records"
+        field_data = self._chunk_field_data(idDocument, chunk_text, chunk_index, embeddings, embedding_model)
+
+        try:
+            status, data = await self._request('create', 'POST', url, json={"fieldData": field_data}, idempotent=False)
+            # Champ optionnel absent du layout : chunk non créé, nouvel essai sans
+            if status >= 400 and str((data.get('messages') or [{}])[0].get('code')) == '102':
+                field_data = self._without_optional_fields(field_data)
+                if field_data is not None:
+                    status, data = await self._request('create', 'POST', url, json={"fieldData": field_data},
+                                                       idempotent=False)
+        except Exception as e:
+            self.logger.error(f"❌ Exception création chunk: {str(e)}")
+            return False
+
+        if status in [200, 201]:
+            self.logger.debug(f"✅ Chunk créé: doc={idDocument}, index={chunk_index}")
+            return True
+        self.logger.error(f"❌ Erreur création chunk: {status} - {data.get('messages')}")
+        return False
+
+    async def update_chunk(self, record_id, field_data):
+        """Met à jour des champs d'un chunk existant"""
+        if not self._check_connection():
+            return False
+
+        url = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/Chunks/records/{record_id}"
+        try:
+            status, data = await self._request('update', 'PATCH', url, json={"fieldData": field_data})
+        except Exception as e:
+            self.logger.error(f"❌ Exception mise à jour chunk {record_id}: {str(e)}")
+            return False
+
+        if status == 200:
+            return True
+        self.logger.error(f"❌ Erreur mise à jour chunk {record_id}: {status} - {data.get('messages')}")
+        return False
+
+    async def get_chunks_with_embeddings(self, chunks):
+        """
+        Relit avec tous leurs champs (EmbeddingJson) des chunks renvoyés par une recherche réduite
+
+        Returns:
+            list: Enregistrements complets trouvés (liste vide en cas d'échec)
+        """
+        query = self._embeddings_query(chunks)
+        if not query or not self._check_connection():
+            return []
+
+        try:
+            records, _ = await self.fetch_page('Chunks', 1, min(len(query), 1000), query=query)
+            return records
+        except ConnectionError as e:
+            self.logger.error(f"❌ Erreur lecture des embeddings: {str(e)}")
+            return []
+
+    async def download_pdf(self, pdf_url, output_path):
+        """
+        Télécharge un PDF depuis FileMaker Server vers un fichier local
+
+        Returns:
+            bool: Succès du téléchargement
+        """
+        if not self._check_connection():
+            return False
+
+        async def save(response):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            with open(output_path, 'wb') as f:
+                async for chunk in response.content.iter_chunked(65536):
+                    f.write(chunk)
+            return True
+
+        try:
+            self.logger.info(f"📥 Téléchargement PDF: {os.path.basename(output_path)}")
+            status, _ = await self._request('container', 'GET', pdf_url, read=save)
+        except Exception as e:
+            self.logger.error(f"❌ Exception téléchargement: {str(e)}")
+            return False
+
+        if status != 200:
+            self.logger.error(f"❌ Erreur téléchargement: {status}")
+            return False
+        self.logger.info(f"✅ PDF téléchargé: {output_path}")
+        return True
+
+    async def download_pdf_buffer(self, pdf_url, memory_limit=None):
+        """
+        Télécharge un PDF en mémoire, fichier temporaire au-delà de memory_limit octets
+
+        Returns:
+            PDFBuffer: PDF téléchargé, None en cas d'échec
+        """
+        if not self._check_connection():
+            return None
+
+        if memory_limit is None:
+            memory_limit = self.pdf_memory_limit
+
+        async def receive(response):
+            writer = PDFWriter(self._spill_file, memory_limit, response.content_length or 0)
+            try:
+                async for chunk in response.content.iter_chunked(65536):
+                    writer.write(chunk)
+            except BaseException:
+                writer.abort()
+                raise
+            return writer
+
+        try:
+            status, result = await self._request('container', 'GET', pdf_url, read=receive)
+        except Exception as e:
+            self.logger.error(f"❌ Exception téléchargement: {str(e)}")
+            return None
+
+        if status != 200:
+            self.logger.error(f"❌ Erreur téléchargement: {status}")
+            return None
+        return self._finish_download(result)
+
+    async def __aenter__(self):
+        if await self.login():
+            return self
+        await self.close()
+        raise ConnectionError("Impossible de se connecter à FileMaker")
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.logout()
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError("AsyncFileMakerExtractor s'utilise avec 'async with'")
+
+
+# Test rapide si le script est exécuté directement
+if __name__ == "__main__":
+    async def _smoke_test():
+        async with AsyncFileMakerExtractor() as fm:
+            print("✅ Connexion réussie")
+            questions = ["prix souscription", "taux de distribution", "capitalisation"]
+            start = time.perf_counter()
+            results = await asyncio.gather(*(fm.search_chunks_smart(question, limit=5) for question in questions))
+            print(f"📊 {[len(chunks) for chunks in results]} chunks en {time.perf_counter() - start:.2f}s")
+
+    print("🧪 Test AsyncFileMakerExtractor...")
+    try:
+        asyncio.run(_smoke_test())
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
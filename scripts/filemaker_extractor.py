@@ -6,17 +6,111 @@ Extraction et recherche de données FileMaker pour le système RAG
 
 import requests
 import base64
+import hashlib
 import urllib3
 import logging
 import json
 import os
 import re
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+# Module frère : importé via le paquet scripts (service) ou directement (scripts d'ingestion)
+if __package__:
+    from . import metrics, resilience, text_pipeline
+else:
+    import metrics
+    import resilience
+    import text_pipeline
+
 # Désactive les avertissements SSL
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
+class PDFBuffer:
+    """PDF téléchargé : en mémoire sous le seuil, fichier temporaire unique au-delà"""
+
+    def __init__(self, data=None, path=None):
+        self.data = data
+        self.path = path
+
+    @property
+    def source(self):
+        """Contenu en mémoire ou chemin du fichier temporaire (accepté par fitz.open)"""
+        return self.data if self.data is not None else self.path
+
+    @property
+    def size(self):
+        if self.data is not None:
+            return len(self.data)
+        return os.path.getsize(self.path) if self.path and os.path.exists(self.path) else 0
+
+    def sha256(self):
+        """Empreinte SHA-256 du contenu (clé du cache d'extraction)"""
+        digest = hashlib.sha256()
+        if self.data is not None:
+            digest.update(self.data)
+        else:
+            with open(self.path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+        return digest.hexdigest()
+
+    def close(self):
+        """Libère la mémoire ou supprime le fichier temporaire"""
+        self.data = None
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class PDFWriter:
+    """Réception d'un PDF par blocs : en mémoire sous le seuil, fichier temporaire au-delà"""
+
+    def __init__(self, spill_file, memory_limit, declared_size=0):
+        self._spill_file = spill_file
+        self.memory_limit = memory_limit
+        self.buffer = bytearray()
+        self.spill, self.spill_path = None, None
+        # Taille annoncée au-dessus du seuil : directement sur disque
+        if declared_size > memory_limit:
+            self.spill, self.spill_path = spill_file()
+
+    def write(self, chunk):
+        if not chunk:
+            return
+        if self.spill is None:
+            self.buffer += chunk
+            if len(self.buffer) > self.memory_limit:
+                self.spill, self.spill_path = self._spill_file()
+                self.spill.write(self.buffer)
+                self.buffer = bytearray()
+        else:
+            self.spill.write(chunk)
+
+    def finish(self):
+        """PDF reçu (PDFBuffer)"""
+        if self.spill is not None:
+            self.spill.close()
+            return PDFBuffer(path=self.spill_path)
+        return PDFBuffer(data=self.buffer)
+
+    def abort(self):
+        """Supprime le fichier temporaire d'une réception interrompue"""
+        if self.spill is not None:
+            self.spill.close()
+            os.remove(self.spill_path)
+            self.spill, self.spill_path = None, None
+
+
 class FileMakerExtractor:
     """Extracteur de données FileMaker avec recherche intelligente"""
 
@@ -26,6 +120,11 @@ class FileMakerExtractor:
         self._setup_logging()
         self.token = None
         self.session_active = False
+        self.documents_found = None
+        # Champs du layout Chunks (métadonnées, lues à la première création de chunk)
+        self.chunk_fields = None
+        self.chunk_fields_checked = False
+        self.missing_chunk_fields = set()
 
     def _load_config(self):
         """Charge la configuration depuis le fichier .env"""
@@ -36,6 +135,9 @@ class FileMakerExtractor:
         )
         load_dotenv(config_path)
 
+        self.temp_path = os.getenv('TEMP_PATH')
+        self.pdf_memory_limit = int(os.getenv('PDF_MEMORY_LIMIT_MB', '64')) * 1024 * 1024
+
         self.server = os.getenv('FILEMAKER_SERVER')
         self.database = os.getenv('FILEMAKER_DATABASE')
         self.username = os.getenv('FILEMAKER_USERNAME')
@@ -45,10 +147,24 @@ class FileMakerExtractor:
         if not all([self.server, self.database, self.username, self.password]):
             raise ValueError("Configuration FileMaker incomplète dans config.env")
 
+        self.retry_policy = resilience.RetryPolicy()
+        self.breaker = resilience.breaker_for(self.server)
+
+        # Recherche des chunks : champ de mots-clés indexé (vide : recherche *mot* dans Text)
+        # et layout de réponse sans EmbeddingJson (vide : layout Chunks complet)
+        self.keywords_field = os.getenv('CHUNKS_KEYWORDS_FIELD', '')
+        # Champ rempli pour tous les chunks (backfill_keywords.py terminé) : un 401 est une
+        # vraie absence de résultat, sans nouvelle recherche dans Text
+        self.keywords_backfilled = os.getenv('CHUNKS_KEYWORDS_BACKFILLED', 'false').lower() == 'true'
+        self.search_layout = os.getenv('CHUNKS_SEARCH_LAYOUT', '')
+        # Champ du modèle d'embedding des chunks (vide : non écrit)
+        self.model_field = os.getenv('CHUNKS_MODEL_FIELD', 'EmbeddingModel')
+
     def _setup_logging(self):
         """Configure le logging"""
         self.logger = logging.getLogger(__name__)
-        if not self.logger.handlers:
+        # Handler propre seulement si l'application n'a pas configuré le logging (évite les doublons)
+        if not self.logger.handlers and not logging.getLogger().handlers:
             handler = logging.StreamHandler()
             formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
             handler.setFormatter(formatter)
@@ -60,6 +176,99 @@ class FileMakerExtractor:
         credentials = f"{self.username}:{self.password}"
         return base64.b64encode(credentials.encode()).decode()
 
+    @staticmethod
+    def _error_code(response):
+        """Code d'erreur FileMaker d'une réponse en échec (messages[0].code)"""
+        if response.status_code < 400:
+            return None
+        try:
+            return str(response.json()['messages'][0]['code'])
+        except (ValueError, KeyError, IndexError, TypeError):
+            return None
+
+    def _request(self, endpoint, method, url, idempotent=True, bearer=True, retry=True, **kwargs):
+        """
+        Appel Data API commun à toutes les méthodes
+
+        Délai (connexion, lecture) propre au type d'appel, nouvelles tentatives avec
+        backoff exponentiel et jitter sur les erreurs réseau et les réponses de surcharge,
+        dans le budget FILEMAKER_RETRY_BUDGET. Un jeton expiré (952) est renouvelé une fois.
+        Une création n'est retentée que si la requête n'a pas pu partir (connexion
+        impossible ou serveur qui refuse de la traiter) pour ne pas dupliquer de chunk.
+
+        Args:
+            endpoint (str): Type d'appel (login, find, records, create, container...)
+            idempotent (bool): La requête peut être renvoyée après un timeout de lecture
+            bearer (bool): Ajoute le jeton de session courant
+            retry (bool): Autorise les nouvelles tentatives
+
+        Returns:
+            requests.Response: Dernière réponse reçue, à interpréter par l'appelant
+
+        Raises:
+            FileMakerUnavailable: Disjoncteur ouvert, requête non envoyée
+            requests.RequestException: Erreur réseau après les nouvelles tentatives
+        """
+        kwargs.setdefault('timeout', resilience.endpoint_timeout(endpoint))
+        kwargs.setdefault('verify', False)
+        headers = dict(kwargs.pop('headers', None) or {})
+        retries = self.retry_policy.retries if retry else 0
+        deadline = time.monotonic() + self.retry_policy.budget
+        renewed = False
+        attempt = 0
+
+        while True:
+            if not self.breaker.allow():
+                metrics.FILEMAKER_REJECTED.labels(endpoint).inc()
+                raise resilience.FileMakerUnavailable(
+                    f"FileMaker indisponible, disjoncteur ouvert ({self.breaker.retry_after():.0f}s restantes)")
+
+            if bearer:
+                headers['Authorization'] = f'Bearer {self.token}'
+            try:
+                response = requests.request(method, url, headers=headers, **kwargs)
+            except requests.RequestException as e:
+                if self.breaker.record_failure():
+                    self.logger.error(f"⛔ Disjoncteur FileMaker ouvert pour {self.breaker.cooldown:.0f}s: {str(e)}")
+                if not (idempotent or isinstance(e, requests.ConnectTimeout)) or attempt >= retries:
+                    raise
+                error = e
+            else:
+                code = self._error_code(response)
+                if response.status_code == 401 and code == '952' and bearer and not renewed:
+                    # Jeton expiré (session fermée par le serveur) : nouvelle session, même requête
+                    self.breaker.record_success()
+                    renewed = True
+                    self.logger.info("🔑 Jeton FileMaker expiré, reconnexion")
+                    if self.login():
+                        response.close()
+                        continue
+                    return response
+                if not resilience.is_transient(response.status_code, code):
+                    self.breaker.record_success()
+                    return response
+                if self.breaker.record_failure():
+                    self.logger.error(f"⛔ Disjoncteur FileMaker ouvert pour {self.breaker.cooldown:.0f}s: "
+                                      f"HTTP {response.status_code}")
+                # Passerelle en timeout : la création a pu être faite
+                if attempt >= retries or (not idempotent and response.status_code in (502, 504)):
+                    return response
+                error = f"HTTP {response.status_code}" + (f" (code {code})" if code else "")
+
+            # Budget épuisé ou circuit ouvert par cet échec : pas d'attente inutile
+            delay = self.retry_policy.delay(attempt)
+            if time.monotonic() + delay >= deadline or self.breaker.state == 'open':
+                if isinstance(error, Exception):
+                    raise error
+                return response
+            if not isinstance(error, Exception):
+                # Réponse abandonnée : connexion rendue au pool (stream=True la garderait ouverte)
+                response.close()
+            attempt += 1
+            metrics.FILEMAKER_RETRIES.labels(endpoint).inc()
+            self.logger.warning(f"🔁 {endpoint}: {error}, tentative {attempt + 1}/{retries + 1} dans {delay:.2f}s")
+            time.sleep(delay)
+
     def login(self):
         """Établit une session avec FileMaker Server"""
         url = f"{self.server}/fmi/data/v1/databases/{self.database}/sessions"
@@ -71,7 +280,7 @@ class FileMakerExtractor:
 
         try:
             self.logger.info("🔐 Tentative de connexion à FileMaker...")
-            response = requests.post(url, headers=headers, verify=False, timeout=10)
+            response = self._request('login', 'POST', url, bearer=False, headers=headers)
 
             if response.status_code in [200, 201]:
                 data = response.json()
@@ -83,6 +292,9 @@ class FileMakerExtractor:
                 self.logger.error(f"❌ Échec connexion: {response.status_code} - {response.text}")
                 return False
 
+        except resilience.FileMakerUnavailable as e:
+            self.logger.error(f"⛔ {str(e)}")
+            return False
         except requests.RequestException as e:
             self.logger.error(f"❌ Erreur réseau FileMaker: {str(e)}")
             return False
@@ -94,6 +306,21 @@ class FileMakerExtractor:
         """Alias pour login() - compatibilité avec les autres services"""
         return self.login()
 
+    def ping(self, timeout=5):
+        """
+        Disponibilité du Data API sans ouvrir de session (productInfo ne demande pas de jeton)
+
+        Returns:
+            bool: True si le serveur répond
+        """
+        url = f"{self.server}/fmi/data/v1/productInfo"
+        try:
+            response = requests.get(url, verify=False, timeout=timeout)
+            return response.status_code == 200
+        except requests.RequestException as e:
+            self.logger.warning(f"⚠️ FileMaker injoignable: {str(e)}")
+            return False
+
     def logout(self):
         """Ferme la session FileMaker"""
         if not self.token:
@@ -102,7 +329,7 @@ class FileMakerExtractor:
         url = f"{self.server}/fmi/data/v1/databases/{self.database}/sessions/{self.token}"
 
         try:
-            requests.delete(url, verify=False, timeout=5)
+            self._request('logout', 'DELETE', url, bearer=False, retry=False)
             self.logger.info("👋 Session FileMaker fermée")
         except Exception as e:
             self.logger.warning(f"⚠️ Erreur fermeture session: {str(e)}")
@@ -130,13 +357,7 @@ class FileMakerExtractor:
         try:
             self.logger.info(f"🎯 Récupération échantillon: {limit} chunks")
 
-            response = requests.get(
-                url,
-                headers=headers,
-                params=params,
-                verify=False,
-                timeout=30
-            )
+            response = self._request('records', 'GET', url, headers=headers, params=params)
 
             if response.status_code == 200:
                 data = response.json()
@@ -184,13 +405,73 @@ class FileMakerExtractor:
         # Suppression des doublons en gardant l'ordre
         return list(dict.fromkeys(keywords))
 
-    def search_chunks_smart(self, question, limit=1000):
+    def _smart_find_payload(self, question, limit, embeddings=False, keywords=True):
+        """
+        Requête _find de search_chunks_smart, None sans mot-clé significatif
+
+        Avec CHUNKS_KEYWORDS_FIELD, chaque terme normalisé est cherché en mot entier
+        (=terme) dans le champ de mots-clés : recherche servie par l'index FileMaker,
+        là où *mot* dans Text parcourt toute la table. keywords=False force la
+        recherche *mot* dans Text.
+        """
+        if keywords and self._chunk_field_enabled(self.keywords_field):
+            keywords = text_pipeline.search_terms(question)
+            criterion, field = "={}", self.keywords_field
+        else:
+            keywords = self.extract_keywords(question)
+            criterion, field = "*{}*", "Text"
+        self.logger.info(f"🔍 Mots-clés extraits: {keywords[:8]}")  # Affiche max 8
+
+        if not keywords:
+            self.logger.warning("❌ Aucun mot-clé significatif trouvé")
+            return None
+
+        # Construction de la requête OR (recherche sur plusieurs mots-clés)
+        query_conditions = []
+        for keyword in keywords[:10]:  # Limite à 10 mots-clés pour éviter la surcharge
+            query_conditions.append({field: criterion.format(keyword)})
+
+        payload = {
+            "query": query_conditions,
+            "limit": str(min(limit, 1000))  # FileMaker Data API limite à 1000
+        }
+        # Réponse réduite aux champs de la recherche (ni EmbeddingJson ni mots-clés)
+        if self.search_layout and not embeddings:
+            payload["layout.response"] = self.search_layout
+        return payload
+
+    def _smart_find_fallback(self, question, limit, embeddings, payload, code):
+        """
+        Requête à renvoyer après un _find de search_chunks_smart en échec, None sinon
+
+        105 : layout de réponse absent, désactivé. 102 : champ de mots-clés absent du
+        layout, désactivé. 401 sur le champ de mots-clés : chunks peut-être pas encore
+        remplis (backfill_keywords.py), la question est cherchée dans Text, sauf avec
+        CHUNKS_KEYWORDS_BACKFILLED=true.
+        """
+        if code == '105' and payload.get('layout.response'):
+            self.logger.warning(f"⚠️ Layout {self.search_layout} absent, réponse sur le layout Chunks")
+            self.search_layout = ''
+            return {name: value for name, value in payload.items() if name != 'layout.response'}
+
+        if code not in ('102', '401') or self.keywords_field not in payload['query'][0]:
+            return None
+        if code == '401' and self.keywords_backfilled:
+            return None
+        if code == '102':
+            self.missing_chunk_fields.add(self.keywords_field)
+            self.logger.warning(f"⚠️ Champ {self.keywords_field} absent du layout Chunks, recherche dans Text")
+        return self._smart_find_payload(question, limit, embeddings, keywords=False)
+
+    def search_chunks_smart(self, question, limit=1000, embeddings=False):
         """
         Recherche intelligente dans les chunks avec extraction automatique de mots-clés
 
         Args:
             question (str): Question en langage naturel
             limit (int): Nombre maximum de résultats (max 1000)
+            embeddings (bool): Renvoyer EmbeddingJson (layout Chunks complet) même si
+                CHUNKS_SEARCH_LAYOUT est défini
 
         Returns:
             list: Liste des chunks trouvés au format FileMaker natif
@@ -198,49 +479,40 @@ class FileMakerExtractor:
         if not self._check_connection():
             return []
 
-        # Extraction des mots-clés
-        keywords = self.extract_keywords(question)
-        self.logger.info(f"🔍 Mots-clés extraits: {keywords[:8]}")  # Affiche max 8
-
-        if not keywords:
-            self.logger.warning("❌ Aucun mot-clé significatif trouvé")
+        payload = self._smart_find_payload(question, limit, embeddings)
+        if payload is None:
             return []
 
-        # Configuration de la requête FileMaker
         url = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/Chunks/_find"
         headers = {
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {self.token}'
         }
 
-        # Construction de la requête OR (recherche sur plusieurs mots-clés)
-        query_conditions = []
-        for keyword in keywords[:10]:  # Limite à 10 mots-clés pour éviter la surcharge
-            query_conditions.append({"Text": f"*{keyword}*"})
-
-        payload = {
-            "query": query_conditions,
-            "limit": str(min(limit, 1000))  # FileMaker Data API limite à 1000
-        }
-
         try:
-            self.logger.info(f"🎯 Recherche FileMaker: {len(query_conditions)} conditions")
-
-            response = requests.post(
-                url,
-                json=payload,
-                headers=headers,
-                verify=False,
-                timeout=30
-            )
+            self.logger.info(f"🎯 Recherche FileMaker: {len(payload['query'])} conditions")
+
+            with metrics.span('filemaker_find'):
+                response = self._request('find', 'POST', url, json=payload, headers=headers)
+                while response.status_code != 200:
+                    payload = self._smart_find_fallback(question, limit, embeddings, payload,
+                                                        self._error_code(response))
+                    if payload is None:
+                        break
+                    response = self._request('find', 'POST', url, json=payload, headers=headers)
 
             if response.status_code == 200:
-                data = response.json()
+                with metrics.span('filemaker_json_decode'):
+                    data = response.json()
                 chunks = data['response']['data']
 
                 self.logger.info(f"✅ {len(chunks)} chunks trouvés")
                 return chunks
 
+            elif self._error_code(response) == '401':
+                self.logger.info("✅ 0 chunks trouvés")
+                return []
+
             elif response.status_code == 401:
                 self.logger.error("❌ Token expiré - reconnexion nécessaire")
                 self.session_active = False
@@ -252,6 +524,9 @@ class FileMakerExtractor:
                     self.logger.error(f"Détails: {response.text[:200]}")
                 return []
 
+        except resilience.FileMakerUnavailable as e:
+            self.logger.warning(f"⛔ Recherche non envoyée: {str(e)}")
+            return []
         except requests.Timeout:
             self.logger.error("❌ Timeout de la recherche FileMaker")
             return []
@@ -262,6 +537,145 @@ class FileMakerExtractor:
             self.logger.error(f"❌ Erreur inattendue recherche: {str(e)}")
             return []
 
+    def fetch_page(self, layout, offset, page_size, query=None, portals=None, portal_limit=None,
+                   response_layout=None):
+        """
+        Lit une page d'enregistrements d'un layout (GET records, ou _find si une requête est fournie)
+
+        Args:
+            response_layout (str, optional): Layout des champs renvoyés par un _find
+
+        Returns:
+            tuple: (enregistrements, nombre total trouvé)
+
+        Raises:
+            ConnectionError: Si la page ne peut pas être lue
+            KeyError: Si un champ de la requête n'est pas sur le layout (102)
+        """
+        endpoint, method, url, options = self._page_request(layout, offset, page_size, query, portals, portal_limit,
+                                                            response_layout)
+        headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.token}'
+        }
+
+        try:
+            response = self._request(endpoint, method, url, headers=headers, **options)
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise ConnectionError(f"Erreur réseau lecture {layout} (offset {offset}): {str(e)}")
+
+        return self._page_result(layout, offset, query, response.status_code, data)
+
+    def _page_request(self, layout, offset, page_size, query=None, portals=None, portal_limit=None,
+                      response_layout=None):
+        """
+        Appel de lecture d'une page : GET records, ou _find si une requête est fournie
+
+        Returns:
+            tuple: (type d'appel, méthode HTTP, URL, paramètres ou corps JSON)
+        """
+        base = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/{layout}"
+        if query is None:
+            params = {'_offset': offset, '_limit': page_size}
+            if portals is not None:
+                params['portal'] = json.dumps(list(portals))
+                if portal_limit:
+                    params.update({f'_limit.{portal}': portal_limit for portal in portals})
+            return 'records', 'GET', f"{base}/records", {'params': params}
+
+        payload = {'query': query, 'offset': str(offset), 'limit': str(page_size)}
+        if response_layout:
+            payload['layout.response'] = response_layout
+        if portals is not None:
+            payload['portal'] = list(portals)
+            if portal_limit:
+                payload.update({f'limit.{portal}': str(portal_limit) for portal in portals})
+        return 'find', 'POST', f"{base}/_find", {'json': payload}
+
+    @staticmethod
+    def _page_result(layout, offset, query, status, data):
+        """
+        Enregistrements et nombre total trouvé d'une réponse de lecture de page
+
+        Raises:
+            ConnectionError: Si la réponse est une erreur
+            KeyError: Si un champ de la requête n'est pas sur le layout (102)
+        """
+        if status != 200:
+            messages = data.get('messages', [{}])
+            code = str(messages[0].get('code')) if messages else None
+            # Code 401 FileMaker : aucun enregistrement ne correspond
+            if query is not None and code == '401':
+                return [], 0
+            if query is not None and code == '102':
+                raise KeyError(f"Champ de la recherche absent du layout {layout}: {messages[0].get('message')}")
+            raise ConnectionError(f"Erreur lecture {layout} (offset {offset}): {status} - {messages}")
+
+        page = data['response']['data']
+        found = data['response'].get('dataInfo', {}).get('foundCount', len(page))
+        return page, int(found)
+
+    def iter_documents(self, page_size=None, limit=None, layout=None, query=None, portals=None,
+                       portal_limit=None, prefetch=True, response_layout=None):
+        """
+        Parcourt les documents page par page, la page suivante étant lue pendant le
+        traitement de la page courante
+
+        La mémoire ne dépend que de la taille de page, pas du nombre de documents.
+        Le Data API ne sélectionne pas de champs : un layout réduit (DOCUMENTS_LAYOUT)
+        limite la charge utile aux champs utiles.
+
+        Args:
+            page_size (int, optional): Documents par requête (défaut: DOCUMENTS_PAGE_SIZE)
+            limit (int, optional): Nombre maximum de documents
+            layout (str, optional): Layout interrogé (défaut: DOCUMENTS_LAYOUT)
+            query (list, optional): Requêtes _find ; tous les enregistrements si absent
+            portals (list, optional): Portails renvoyés ([] : aucun, None : tous ceux du layout)
+            portal_limit (int, optional): Lignes de portail par enregistrement
+            prefetch (bool): Lit la page suivante en arrière-plan
+            response_layout (str, optional): Layout des champs renvoyés (avec query)
+
+        Yields:
+            dict: Enregistrement FileMaker (recordId, modId, fieldData, portalData)
+
+        Raises:
+            ConnectionError: Si une page ne peut pas être lue
+        """
+        if not self._check_connection():
+            raise ConnectionError("Pas de session FileMaker active")
+
+        layout = layout or os.getenv('DOCUMENTS_LAYOUT', 'Documents')
+        page_size = page_size or int(os.getenv('DOCUMENTS_PAGE_SIZE', '100'))
+        self.documents_found = None
+
+        def fetch(offset):
+            size = page_size if limit is None else min(page_size, limit - offset + 1)
+            return self.fetch_page(layout, offset, size, query, portals, portal_limit, response_layout), size
+
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fm-prefetch') if prefetch else None
+        offset = 1
+        pending = executor.submit(fetch, offset) if executor else None
+        try:
+            while True:
+                (page, found), size = pending.result() if executor else fetch(offset)
+                if self.documents_found is None:
+                    self.documents_found = found if limit is None else min(found, limit)
+
+                offset += len(page)
+                last = len(page) < size or (limit is not None and offset > limit)
+                if executor and not last:
+                    pending = executor.submit(fetch, offset)
+
+                self.logger.info(f"📄 Lot récupéré: {len(page)} docs (total: {offset - 1}/{found})")
+                yield from page
+
+                if last:
+                    break
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
     def get_documents(self, limit=None):
         """
         Récupère tous les documents avec pagination automatique
@@ -270,69 +684,134 @@ class FileMakerExtractor:
             limit (int, optional): Limite du nombre de documents à récupérer
 
         Returns:
-            list: Liste de tous les documents
+            list: Liste de tous les documents (partielle si une page échoue)
         """
         if not self._check_connection():
             return []
 
         all_documents = []
-        offset = 1
-        batch_size = 100  # Taille des lots FileMaker
-        total_retrieved = 0
+        try:
+            for document in self.iter_documents(limit=limit):
+                all_documents.append(document)
+        except ConnectionError as e:
+            self.logger.error(f"❌ Exception récupération documents: {str(e)}")
 
-        while True:
-            url = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/Documents/records"
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.token}'
-            }
+        self.logger.info(f"📄 TOTAL DOCUMENTS: {len(all_documents)}")
+        return all_documents
 
-            params = {
-                '_offset': offset,
-                '_limit': batch_size
-            }
+    def _without_chunks_find(self, page_size=None, layout=None):
+        """Paramètres de la recherche "=" sur le champ lié aux chunks (DOCUMENTS_CHUNKS_FIELD)"""
+        related_field = os.getenv('DOCUMENTS_CHUNKS_FIELD', 'Chunks::idDocument')
+        return (
+            layout or os.getenv('DOCUMENTS_LAYOUT', 'Documents'),
+            page_size or int(os.getenv('DOCUMENTS_PAGE_SIZE', '100')),
+            [{related_field: "="}],
+            os.getenv('DOCUMENTS_LIST_LAYOUT') or None
+        )
 
-            try:
-                response = requests.get(
-                    url,
-                    headers=headers,
-                    params=params,
-                    verify=False,
-                    timeout=30
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    documents = data['response']['data']
+    def _next_without_chunks(self, page, page_size, offset, seen):
+        """
+        Documents pas encore rendus d'une page de la recherche "=" et offset de la page suivante
 
-                    if not documents:
-                        break
+        Les documents traités sortent de l'ensemble trouvé : la même page est relue tant
+        qu'elle apporte des documents, l'offset n'avance que sur une page dont tous les
+        documents sont déjà connus (ignorés par l'appelant ou en échec).
+
+        Returns:
+            tuple: (nouveaux documents, offset suivant ou None en fin de parcours)
+        """
+        new = [document for document in page if document['recordId'] not in seen]
+        seen.update(document['recordId'] for document in new)
+        if len(page) < page_size and not new:
+            return new, None
+        return new, offset if new else offset + len(page)
+
+    def iter_documents_without_chunks(self, page_size=None, layout=None):
+        """
+        Parcourt les documents qui n'ont encore aucun chunk, page par page
 
-                    all_documents.extend(documents)
-                    total_retrieved += len(documents)
+        Recherche "=" côté serveur sur le champ lié aux chunks (DOCUMENTS_CHUNKS_FIELD, par
+        défaut "Chunks::idDocument"), vide pour ces documents : seuls eux sont transférés.
+        L'ensemble trouvé rétrécit à mesure que l'ingestion crée des chunks : chaque page
+        est relue depuis son offset après traitement (voir _next_without_chunks). Avec
+        DOCUMENTS_LIST_LAYOUT, les champs renvoyés sont ceux de ce layout réduit (sans le
+        champ text) : le document complet est relu avec get_document avant traitement.
 
-                    self.logger.info(f"📄 Lot récupéré: {len(documents)} docs (total: {total_retrieved})")
+        Yields:
+            dict: Documents sans chunk
 
-                    # Vérification des limites
-                    if limit and total_retrieved >= limit:
-                        all_documents = all_documents[:limit]
-                        break
+        Raises:
+            ConnectionError: Si une page ne peut pas être lue
+            KeyError: Si le champ lié n'est pas sur le layout (avant tout document)
+        """
+        if not self._check_connection():
+            raise ConnectionError("Pas de session FileMaker active")
 
-                    if len(documents) < batch_size:
-                        break  # Dernier lot
+        layout, page_size, query, response_layout = self._without_chunks_find(page_size, layout)
+        self.documents_found = None
+        seen = set()
+        offset = 1
+        while offset is not None:
+            page, found = self.fetch_page(layout, offset, page_size, query, response_layout=response_layout)
+            if self.documents_found is None:
+                self.documents_found = found
 
-                    offset += batch_size
+            documents, offset = self._next_without_chunks(page, page_size, offset, seen)
+            if documents:
+                self.logger.info(f"📄 Lot récupéré: {len(documents)} docs sans chunks ({found} restants)")
+            yield from documents
 
-                else:
-                    self.logger.error(f"❌ Erreur récupération documents: {response.status_code}")
-                    break
+    def get_document(self, record_id, layout=None):
+        """
+        Relit un document complet par son recordId
 
-            except Exception as e:
-                self.logger.error(f"❌ Exception récupération documents: {str(e)}")
-                break
+        Returns:
+            dict: Enregistrement FileMaker, None s'il n'existe plus
 
-        self.logger.info(f"📄 TOTAL DOCUMENTS: {len(all_documents)}")
-        return all_documents
+        Raises:
+            ConnectionError: Si l'enregistrement ne peut pas être lu
+        """
+        layout = layout or os.getenv('DOCUMENTS_LAYOUT', 'Documents')
+        url = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/{layout}/records/{record_id}"
+        headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.token}'
+        }
+
+        try:
+            response = self._request('records', 'GET', url, headers=headers)
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise ConnectionError(f"Erreur réseau lecture {layout} ({record_id}): {str(e)}")
+
+        # Code 101 : enregistrement supprimé
+        if self._error_code(response) == '101':
+            return None
+        page, _ = self._page_result(layout, record_id, None, response.status_code, data)
+        return page[0] if page else None
+
+    def get_documents_without_chunks(self, page_size=100):
+        """
+        Récupère en une seule recherche les documents qui n'ont encore aucun chunk
+
+        Nécessite un champ lié aux chunks sur le layout Documents (par défaut
+        "Chunks::idDocument", configurable via DOCUMENTS_CHUNKS_FIELD) : le critère "="
+        de FileMaker trouve les enregistrements où ce champ est vide.
+
+        Returns:
+            list: Documents sans chunk, None si la recherche n'est pas disponible
+        """
+        if not self._check_connection():
+            return None
+
+        try:
+            documents = list(self.iter_documents_without_chunks(page_size))
+        except (ConnectionError, KeyError) as e:
+            self.logger.error(f"❌ Exception recherche documents sans chunks: {str(e)}")
+            return None
+
+        self.logger.info(f"📄 {len(documents)} documents sans chunks")
+        return documents
 
     def get_chunks_for_document(self, doc_id):
         """
@@ -359,7 +838,7 @@ class FileMakerExtractor:
         }
 
         try:
-            response = requests.post(url, json=payload, headers=headers, verify=False)
+            response = self._request('find', 'POST', url, json=payload, headers=headers)
 
             if response.status_code == 200:
                 data = response.json()
@@ -371,10 +850,54 @@ class FileMakerExtractor:
             self.logger.error(f"❌ Erreur récupération chunks: {str(e)}")
             return []
 
-    def create_chunk(self, idDocument, chunk_text, chunk_index, embeddings=None):
-        """Crée un nouveau chunk dans FileMaker avec tous les champs"""
+    def delete_chunks_for_document(self, doc_id):
+        """
+        Supprime tous les chunks d'un document (reprise d'un document interrompu)
+
+        Returns:
+            int: Nombre de chunks supprimés
+
+        Raises:
+            ConnectionError: Si un chunk ne peut pas être lu ou supprimé
+        """
         if not self._check_connection():
-            return False
+            raise ConnectionError("Pas de session FileMaker active")
+
+        base = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/Chunks/records"
+        headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.token}'
+        }
+
+        deleted = 0
+        while True:
+            records, _ = self.fetch_page('Chunks', 1, 1000, query=[{"idDocument": f"=={doc_id}"}],
+                                         response_layout=self.search_layout or None)
+            if not records:
+                return deleted
+            for record in records:
+                try:
+                    response = self._request('delete', 'DELETE', f"{base}/{record['recordId']}", headers=headers)
+                except requests.RequestException as e:
+                    raise ConnectionError(f"Erreur réseau suppression chunk {record['recordId']}: {str(e)}")
+                # Code 101 : déjà supprimé (nouvel essai après un délai dépassé)
+                if response.status_code != 200 and self._error_code(response) != '101':
+                    raise ConnectionError(f"Erreur suppression chunk {record['recordId']}: {response.status_code}")
+                deleted += 1
+
+    def iter_chunk_records(self, page_size=1000):
+        """
+        Parcourt tous les enregistrements du layout Chunks page par page
+
+        Yields:
+            dict: Enregistrement FileMaker (recordId, modId, fieldData)
+
+        Raises:
+            ConnectionError: Si une page ne peut pas être lue (un parcours partiel
+                produirait un index incomplet)
+        """
+        if not self._check_connection():
+            raise ConnectionError("Pas de session FileMaker active")
 
         url = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/Chunks/records"
         headers = {
@@ -382,12 +905,94 @@ class FileMakerExtractor:
             'Authorization': f'Bearer {self.token}'
         }
 
+        offset = 1
+        while True:
+            params = {
+                '_offset': offset,
+                '_limit': page_size
+            }
+
+            try:
+                response = self._request('records', 'GET', url, headers=headers, params=params)
+            except requests.RequestException as e:
+                raise ConnectionError(f"Erreur réseau lecture chunks (offset {offset}): {str(e)}")
+
+            if response.status_code != 200:
+                raise ConnectionError(f"Erreur lecture chunks (offset {offset}): {response.status_code}")
+
+            records = response.json()['response']['data']
+            yield from records
+
+            if len(records) < page_size:
+                break
+            offset += page_size
+
+    def load_chunk_fields(self):
+        """
+        Champs du layout Chunks (métadonnées du Data API), lus une fois par session
+
+        Les champs optionnels (mots-clés, modèle d'embedding) ne sont écrits que s'ils
+        sont sur le layout : une base pas encore migrée refuserait la création (102).
+
+        Returns:
+            set: Noms des champs, None si les métadonnées ne sont pas lisibles
+        """
+        if self.chunk_fields_checked or not self._check_connection():
+            return self.chunk_fields
+
+        url = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/Chunks"
+        headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.token}'
+        }
+
+        try:
+            response = self._request('metadata', 'GET', url, headers=headers)
+            if response.status_code == 200:
+                self._set_chunk_fields(response.json())
+            else:
+                # Pas de nouvel essai à chaque chunk : l'erreur 102 reste rattrapée à la création
+                self.chunk_fields_checked = True
+                self.logger.warning(f"⚠️ Métadonnées du layout Chunks illisibles: {response.status_code}")
+        except Exception as e:
+            self.logger.warning(f"⚠️ Métadonnées du layout Chunks illisibles: {str(e)}")
+        return self.chunk_fields
+
+    def _set_chunk_fields(self, data):
+        self.chunk_fields_checked = True
+        self.chunk_fields = {field['name'] for field in data['response'].get('fieldMetaData', [])}
+        for name in (self.keywords_field, self.model_field):
+            if name and name not in self.chunk_fields:
+                self.missing_chunk_fields.add(name)
+                self.logger.warning(f"⚠️ Champ {name} absent du layout Chunks : non écrit")
+
+    def _chunk_field_enabled(self, name):
+        """Champ optionnel configuré et non absent du layout Chunks"""
+        return bool(name) and name not in self.missing_chunk_fields
+
+    def _without_optional_fields(self, field_data):
+        """
+        Champs d'un chunk refusé (102 : champ absent) sans les champs optionnels,
+        désactivés pour la session ; None s'il n'y en avait pas
+        """
+        optional = [name for name in (self.keywords_field, self.model_field) if name and name in field_data]
+        if not optional:
+            return None
+        self.missing_chunk_fields.update(optional)
+        self.logger.warning(f"⚠️ Champ(s) {', '.join(optional)} refusé(s) par FileMaker (102), chunks créés sans")
+        return {name: value for name, value in field_data.items() if name not in optional}
+
+    def _chunk_field_data(self, idDocument, chunk_text, chunk_index, embeddings=None, embedding_model=None):
+        """Champs d'un nouveau chunk"""
         # ✅ TOUS les champs corrects maintenant !
         field_data = {
             "idDocument": str(idDocument),
             "Text": chunk_text,
             "ChunkIndex": chunk_index  # ✅ Maintenant ça existe !
         }
+        # Termes normalisés du texte, cherchés par search_chunks_smart
+        if self._chunk_field_enabled(self.keywords_field):
+            field_data[self.keywords_field] = text_pipeline.keyword_field(chunk_text)
 
         # ✅ Nom de champ corrigé
         if embeddings:
@@ -395,11 +1000,39 @@ class FileMakerExtractor:
                 field_data["EmbeddingJson"] = embeddings
             else:
                 field_data["EmbeddingJson"] = json.dumps(embeddings)
+            if embedding_model and self._chunk_field_enabled(self.model_field):
+                field_data[self.model_field] = embedding_model
+        return field_data
 
-        payload = {"fieldData": field_data}
+    def create_chunk(self, idDocument, chunk_text, chunk_index, embeddings=None, embedding_model=None):
+        """
+        Crée un nouveau chunk dans FileMaker avec tous les champs
+
+        Args:
+            embedding_model (str, optional): Identifiant du modèle ayant produit l'embedding,
+                stocké dans le champ CHUNKS_MODEL_FIELD pour ne comparer que des vecteurs compatibles
+        """
+        if not self._check_connection():
+            return False
+        self.load_chunk_fields()
+
+        url = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/Chunks/records"
+        headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.token}'
+        }
+
+        field_data = self._chunk_field_data(idDocument, chunk_text, chunk_index, embeddings, embedding_model)
 
         try:
-            response = requests.post(url, json=payload, headers=headers, verify=False, timeout=30)
+            response = self._request('create', 'POST', url, json={"fieldData": field_data}, headers=headers,
+                                     idempotent=False)
+            # Champ optionnel absent du layout : chunk non créé, nouvel essai sans
+            if self._error_code(response) == '102':
+                field_data = self._without_optional_fields(field_data)
+                if field_data is not None:
+                    response = self._request('create', 'POST', url, json={"fieldData": field_data},
+                                             headers=headers, idempotent=False)
 
             if response.status_code in [200, 201]:
                 self.logger.debug(f"✅ Chunk créé: doc={idDocument}, index={chunk_index}")
@@ -414,6 +1047,66 @@ class FileMakerExtractor:
             self.logger.error(f"❌ Exception création chunk: {str(e)}")
             return False
 
+    def update_chunk(self, record_id, field_data):
+        """
+        Met à jour des champs d'un chunk existant (ex. remplissage du champ de mots-clés)
+
+        Returns:
+            bool: Succès de la mise à jour
+        """
+        if not self._check_connection():
+            return False
+
+        url = f"{self.server}/fmi/data/v1/databases/{self.database}/layouts/Chunks/records/{record_id}"
+        headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.token}'
+        }
+
+        try:
+            response = self._request('update', 'PATCH', url, json={"fieldData": field_data}, headers=headers)
+
+            if response.status_code == 200:
+                return True
+            self.logger.error(f"❌ Erreur mise à jour chunk {record_id}: {response.status_code}")
+            if response.text:
+                self.logger.error(f"Détails: {response.text[:500]}")
+            return False
+
+        except Exception as e:
+            self.logger.error(f"❌ Exception mise à jour chunk {record_id}: {str(e)}")
+            return False
+
+    @staticmethod
+    def _embeddings_query(chunks):
+        """Requêtes _find (OU) retrouvant des chunks par document et position"""
+        query = []
+        for chunk in chunks:
+            field_data = chunk.get('fieldData', {})
+            if field_data.get('idDocument') not in (None, '') and field_data.get('ChunkIndex') not in (None, ''):
+                query.append({"idDocument": f"=={field_data['idDocument']}",
+                              "ChunkIndex": f"=={field_data['ChunkIndex']}"})
+        return query
+
+    def get_chunks_with_embeddings(self, chunks):
+        """
+        Relit avec tous leurs champs (EmbeddingJson) des chunks renvoyés par une recherche
+        réduite, en une seule recherche
+
+        Returns:
+            list: Enregistrements complets trouvés (liste vide en cas d'échec)
+        """
+        query = self._embeddings_query(chunks)
+        if not query or not self._check_connection():
+            return []
+
+        try:
+            records, _ = self.fetch_page('Chunks', 1, min(len(query), 1000), query=query)
+            return records
+        except ConnectionError as e:
+            self.logger.error(f"❌ Erreur lecture des embeddings: {str(e)}")
+            return []
+
     def download_pdf(self, pdf_url, output_path):
         """
         Télécharge un PDF depuis FileMaker Server
@@ -435,15 +1128,12 @@ class FileMakerExtractor:
         try:
             self.logger.info(f"📥 Téléchargement PDF: {os.path.basename(output_path)}")
 
-            response = requests.get(
-                pdf_url,
-                headers=headers,
-                verify=False,
-                stream=True,
-                timeout=60
-            )
+            # stream=True : la connexion ne retourne au pool qu'une fois la réponse fermée
+            with self._request('container', 'GET', pdf_url, headers=headers, stream=True) as response:
+                if response.status_code != 200:
+                    self.logger.error(f"❌ Erreur téléchargement: {response.status_code}")
+                    return False
 
-            if response.status_code == 200:
                 os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
                 with open(output_path, 'wb') as f:
@@ -451,16 +1141,75 @@ class FileMakerExtractor:
                         if chunk:
                             f.write(chunk)
 
-                self.logger.info(f"✅ PDF téléchargé: {output_path}")
-                return True
-            else:
-                self.logger.error(f"❌ Erreur téléchargement: {response.status_code}")
-                return False
+            self.logger.info(f"✅ PDF téléchargé: {output_path}")
+            return True
 
         except Exception as e:
             self.logger.error(f"❌ Exception téléchargement: {str(e)}")
             return False
 
+    def _spill_file(self):
+        """Crée un fichier temporaire au nom unique (TEMP_PATH si disponible)"""
+        temp_dir = None
+        if self.temp_path:
+            try:
+                os.makedirs(self.temp_path, exist_ok=True)
+                temp_dir = self.temp_path
+            except OSError:
+                temp_dir = None
+        fd, path = tempfile.mkstemp(prefix='fm_', suffix='.pdf', dir=temp_dir)
+        return os.fdopen(fd, 'wb'), path
+
+    def download_pdf_buffer(self, pdf_url, memory_limit=None):
+        """
+        Télécharge un PDF en mémoire, sans passer par le disque sous le seuil
+
+        Au-delà de memory_limit octets, le contenu bascule dans un fichier temporaire
+        au nom unique : plusieurs ingestions peuvent tourner en parallèle sans collision.
+
+        Args:
+            pdf_url (str): URL du PDF sur FileMaker Server
+            memory_limit (int, optional): Seuil en octets (défaut: PDF_MEMORY_LIMIT_MB)
+
+        Returns:
+            PDFBuffer: PDF téléchargé, None en cas d'échec
+        """
+        if not self._check_connection():
+            return None
+
+        if memory_limit is None:
+            memory_limit = self.pdf_memory_limit
+
+        headers = {
+            'Authorization': f'Bearer {self.token}'
+        }
+
+        writer = None
+        try:
+            with self._request('container', 'GET', pdf_url, headers=headers, stream=True) as response:
+                if response.status_code != 200:
+                    self.logger.error(f"❌ Erreur téléchargement: {response.status_code}")
+                    return None
+
+                writer = PDFWriter(self._spill_file, memory_limit, int(response.headers.get('Content-Length') or 0))
+                for chunk in response.iter_content(chunk_size=65536):
+                    writer.write(chunk)
+            return self._finish_download(writer)
+
+        except Exception as e:
+            self.logger.error(f"❌ Exception téléchargement: {str(e)}")
+            if writer is not None:
+                writer.abort()
+            return None
+
+    def _finish_download(self, writer):
+        pdf = writer.finish()
+        if pdf.path:
+            self.logger.info(f"📥 PDF téléchargé sur disque: {pdf.size} octets")
+        else:
+            self.logger.info(f"📥 PDF téléchargé en mémoire: {pdf.size} octets")
+        return pdf
+
     def __enter__(self):
         """Support du context manager (with statement)"""
         if self.login():
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Journal local des exécutions d'ingestion
+État par document (SQLite) : une exécution reprend exactement là où la précédente
+s'est arrêtée et ignore les documents terminés sans aucun appel réseau
+"""
+
+import os
+import time
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATUS_DONE = 'done'
+# Tous les chunks existent déjà dans le corpus : terminé sans aucun chunk écrit
+STATUS_DUPLICATE = 'duplicate'
+STATUS_FAILED = 'failed'
+STATUS_IN_PROGRESS = 'in_progress'
+# Sauvegarde des chunks incomplète (FileMaker indisponible) : chunks partiels à supprimer avant reprise
+STATUS_INTERRUPTED = 'interrupted'
+# Document terminé puis modifié dans FileMaker (modId différent) : chunks à remplacer
+STATUS_MODIFIED = 'modified'
+
+
+class IngestionJournal:
+    """Journal SQLite des documents traités par pdf_processor"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Fichier SQLite du journal (créé si absent)
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                record_id TEXT PRIMARY KEY,
+                mod_id TEXT,
+                filename TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_status ON documents (status);
+        """)
+        self.connection.commit()
+
+    def failed_ids(self):
+        """Identifiants des documents en échec lors d'une exécution précédente"""
+        rows = self.connection.execute(
+            "SELECT record_id FROM documents WHERE status = ?", (STATUS_FAILED,)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def resumable_ids(self, include_failed=False):
+        """
+        Identifiants des documents commencés sans être terminés (exécution arrêtée en
+        cours de document ou sauvegarde interrompue), et en échec si demandé : leurs
+        chunks éventuels sont à supprimer avant de les retraiter
+        """
+        statuses = (STATUS_IN_PROGRESS, STATUS_INTERRUPTED, STATUS_MODIFIED) + ((STATUS_FAILED,) if include_failed else ())
+        rows = self.connection.execute(
+            f"SELECT record_id FROM documents WHERE status IN ({', '.join('?' * len(statuses))})", statuses
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def completed_ids(self):
+        """Identifiants des documents terminés (chunks écrits ou doublons du corpus)"""
+        return set(self.completed_versions())
+
+    def completed_versions(self):
+        """
+        Documents terminés et version (modId) traitée
+
+        Returns:
+            dict: record_id -> mod_id (None si inconnu)
+        """
+        rows = self.connection.execute(
+            "SELECT record_id, mod_id FROM documents WHERE status IN (?, ?)", (STATUS_DONE, STATUS_DUPLICATE)
+        ).fetchall()
+        return dict(rows)
+
+    @staticmethod
+    def is_modified(known_mod_id, mod_id):
+        """Version courante différente de la version traitée (inconnue d'un côté : non modifié)"""
+        return known_mod_id is not None and mod_id is not None and str(mod_id) != known_mod_id
+
+    def status(self, record_id):
+        row = self.connection.execute(
+            "SELECT status FROM documents WHERE record_id = ?", (str(record_id),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _record(self, record_id, status, mod_id=None, filename=None, error=None, attempt=False):
+        self.connection.execute("""
+            INSERT INTO documents (record_id, mod_id, filename, status, attempts, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(record_id) DO UPDATE SET
+                mod_id = COALESCE(excluded.mod_id, mod_id),
+                filename = COALESCE(excluded.filename, filename),
+                status = excluded.status,
+                attempts = attempts + excluded.attempts,
+                error = excluded.error,
+                updated_at = excluded.updated_at
+        """, (str(record_id), mod_id, filename, status, int(attempt), error, time.time()))
+        self.connection.commit()
+
+    def mark_started(self, record_id, mod_id=None, filename=None):
+        """Document en cours : reste à reprendre si l'exécution s'interrompt"""
+        self._record(record_id, STATUS_IN_PROGRESS, mod_id, filename, attempt=True)
+
+    def mark_done(self, record_id, mod_id=None, filename=None):
+        self._record(record_id, STATUS_DONE, mod_id, filename)
+
+    def mark_duplicate(self, record_id, mod_id=None, filename=None):
+        self._record(record_id, STATUS_DUPLICATE, mod_id, filename)
+
+    def mark_failed(self, record_id, error=None):
+        self._record(record_id, STATUS_FAILED, error=error)
+
+    def mark_interrupted(self, record_id, error=None):
+        self._record(record_id, STATUS_INTERRUPTED, error=error)
+
+    def mark_modified(self, record_id):
+        self._record(record_id, STATUS_MODIFIED)
+
+    def summary(self):
+        """Nombre de documents par état"""
+        rows = self.connection.execute("SELECT status, COUNT(*) FROM documents GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        self.connection.close()
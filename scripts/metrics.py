@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Traçage léger du pipeline RAG et métriques au format Prometheus
+Chaque étape est chronométrée par span() (horloge monotone perf_counter) : la durée
+alimente l'histogramme de l'étape et, pendant une requête, la trace de cette requête.
+
+Plusieurs processus (workers gunicorn) : avec METRICS_MULTIPROC_DIR, chaque processus écrit
+ses valeurs dans un fichier de ce dossier (flush) et /metrics rend leur somme, quel que soit
+le worker qui répond. Les fichiers des workers terminés restent comptés (compteurs
+monotones) ; le dossier est vidé au démarrage de gunicorn (config/gunicorn.conf.py).
+"""
+
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Bornes des histogrammes (secondes) : de la milliseconde à la génération LLM
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _label_string(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra) if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def state(self):
+        with self.lock:
+            return [list(self.counts), self.sum]
+
+    def merge(self, state):
+        counts, total = state
+        with self.lock:
+            self.counts = [current + added for current, added in zip(self.counts, counts)]
+            self.sum += total
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self.lock:
+            self.value += amount
+
+    def state(self):
+        return self.value
+
+    def merge(self, state):
+        self.inc(state)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def empty(self):
+        """Métrique de même définition, sans valeur"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Supprime les valeurs (enfant d'un fork : verrous hérités non repris)"""
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def state(self):
+        return [[list(values), child.state()] for values, child in list(self._children.items())]
+
+    def merge(self, state):
+        for values, child_state in state:
+            self.labels(*values).merge(child_state)
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def empty(self):
+        return Histogram(self.name, self.documentation, self.labelnames, self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        with child.lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f"{self.name}_bucket{_label_string(self.labelnames, values, [('le', le)])} {cumulative}")
+        labels = _label_string(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {total}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def empty(self):
+        return Counter(self.name, self.documentation, self.labelnames)
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}_total{_label_string(self.labelnames, values)} {child.value}"]
+
+
+class MetricsRegistry:
+    """Ensemble des métriques d'un processus, rendu au format texte Prometheus"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+    def flush(self, directory):
+        """Écrit les valeurs du processus dans son fichier du dossier partagé (remplacement atomique)"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'metrics_{_process_key}.json')
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({metric.name: metric.state() for metric in self.metrics}, f)
+        os.replace(temporary, path)
+
+    def aggregate(self, directory):
+        """Registre cumulant les fichiers de tous les processus du dossier partagé"""
+        total = MetricsRegistry()
+        total.metrics = [metric.empty() for metric in self.metrics]
+        by_name = {metric.name: metric for metric in total.metrics}
+        for name in sorted(os.listdir(directory)):
+            if not (name.startswith('metrics_') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for metric_name, metric_state in state.items():
+                if metric_name in by_name:
+                    by_name[metric_name].merge(metric_state)
+        return total
+
+
+# Fichier du processus dans METRICS_MULTIPROC_DIR : pid et instant de création (pid réutilisé
+# par un nouveau worker sans écraser le fichier d'un worker terminé)
+_process_key = f'{os.getpid()}_{time.time_ns()}'
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram('rag_stage_seconds', "Durée de chaque étape du pipeline RAG", ['stage'])
+REQUEST_SECONDS = REGISTRY.histogram('rag_request_seconds', "Durée totale d'une recherche", ['status'])
+REQUESTS = REGISTRY.counter('rag_requests', "Recherches traitées", ['status'])
+OLLAMA_TOKENS = REGISTRY.counter('rag_ollama_tokens', "Tokens traités par Ollama", ['kind'])
+FILEMAKER_RETRIES = REGISTRY.counter('rag_filemaker_retries', "Appels FileMaker retentés", ['endpoint'])
+FILEMAKER_REJECTED = REGISTRY.counter('rag_filemaker_rejected', "Appels FileMaker refusés, disjoncteur ouvert",
+                                      ['endpoint'])
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Trace:
+    """Durées des étapes d'une requête (une étape répétée est cumulée)"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def timings_ms(self):
+        return {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+
+
+_current_trace = contextvars.ContextVar('rag_trace', default=None)
+
+
+@contextmanager
+def trace():
+    """Trace de la requête courante : les span() exécutés dans ce contexte y sont ajoutés"""
+    current = Trace()
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+
+def record(stage, seconds):
+    """Enregistre une durée mesurée (ou rapportée par un service externe)"""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    current = _current_trace.get()
+    if current is not None:
+        current.add(stage, seconds)
+
+
+@contextmanager
+def span(stage):
+    """Chronomètre un bloc de code comme étape du pipeline"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def multiproc_dir():
+    """Dossier partagé des métriques multi-processus, vide en mono-processus"""
+    return os.getenv('METRICS_MULTIPROC_DIR', '')
+
+
+def flush():
+    """Publie les valeurs du processus dans METRICS_MULTIPROC_DIR (sans effet sinon)"""
+    directory = multiproc_dir()
+    if not directory:
+        return
+    try:
+        REGISTRY.flush(directory)
+    except OSError as e:
+        logger.warning(f"⚠️ Écriture des métriques dans {directory} échouée: {str(e)}")
+
+
+def render():
+    directory = multiproc_dir()
+    if not directory:
+        return REGISTRY.render()
+    flush()
+    return REGISTRY.aggregate(directory).render()
+
+
+def _after_fork_in_child():
+    """Worker forké : valeurs du maître (warmup) déjà publiées par lui, pas recopiées"""
+    global _process_key
+    _process_key = f'{os.getpid()}_{time.time_ns()}'
+    if multiproc_dir():
+        REGISTRY.clear()
+
+
+# Le maître publie ses valeurs (warmup) avant chaque fork, une seule fois pour tous les workers
+os.register_at_fork(before=flush, after_in_child=_after_fork_in_child)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Extraction du texte des PDF page par page
+Générateur de pages nettoyées, répartition des gros PDF sur un pool de processus
+et fallback pdfplumber page par page plutôt que sur tout le document
+"""
+
+import io
+import os
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+import pdfplumber
+
+import text_pipeline
+
+logger = logging.getLogger(__name__)
+
+# En dessous de ce nombre de caractères, PyMuPDF est considéré comme en échec sur la page
+MIN_PAGE_CHARS = 20
+
+# Document ouvert une fois par processus du pool (voir _init_worker)
+_worker_source = None
+_worker_doc = None
+
+
+def open_pdf(source):
+    """Ouvre un PDF avec PyMuPDF depuis un chemin ou des octets en mémoire"""
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def _open_plumber(source):
+    if isinstance(source, (bytes, bytearray)):
+        return pdfplumber.open(io.BytesIO(source))
+    return pdfplumber.open(source)
+
+
+def _plumber_page_text(plumber_pdf, page_index):
+    """Texte d'une page via pdfplumber (meilleur pour les tableaux)"""
+    try:
+        return plumber_pdf.pages[page_index].extract_text(layout=True) or ""
+    except Exception as e:
+        logger.warning(f"⚠️ pdfplumber échoué page {page_index + 1}: {str(e)}")
+        return ""
+
+
+def _extract_range(doc, source, first, last):
+    """
+    Extrait les pages [first, last) d'un document déjà ouvert
+
+    Returns:
+        list: Tuples (numéro de page, texte nettoyé), pages vides exclues
+    """
+    pages = []
+    plumber_pdf = None
+
+    try:
+        for page_index in range(first, last):
+            # Mode "text" : bien plus léger que "dict", la mise en page n'est pas utilisée
+            try:
+                page_text = doc[page_index].get_text("text")
+            except Exception as e:
+                logger.warning(f"⚠️ PyMuPDF échoué page {page_index + 1}: {str(e)}")
+                page_text = ""
+
+            if len(page_text.strip()) < MIN_PAGE_CHARS:
+                if plumber_pdf is None:
+                    plumber_pdf = _open_plumber(source)
+                fallback_text = _plumber_page_text(plumber_pdf, page_index)
+                if len(fallback_text.strip()) > len(page_text.strip()):
+                    page_text = fallback_text
+
+            page_text = text_pipeline.clean_text(page_text)
+            if page_text:
+                pages.append((page_index + 1, page_text))
+    finally:
+        if plumber_pdf is not None:
+            plumber_pdf.close()
+
+    return pages
+
+
+def _init_worker(source):
+    """Initialise un processus du pool : le PDF n'est transmis et ouvert qu'une fois"""
+    global _worker_source, _worker_doc
+    _worker_source = source
+    _worker_doc = open_pdf(source)
+
+
+def _extract_range_in_worker(first, last):
+    return _extract_range(_worker_doc, _worker_source, first, last)
+
+
+def _iter_plumber_only(source):
+    """Fallback complet quand PyMuPDF ne peut pas ouvrir le fichier"""
+    with _open_plumber(source) as plumber_pdf:
+        for page_index in range(len(plumber_pdf.pages)):
+            page_text = text_pipeline.clean_text(_plumber_page_text(plumber_pdf, page_index))
+            if page_text:
+                yield page_index + 1, page_text
+
+
+def iter_pdf_pages(source, workers=None, parallel_min_pages=40, pages_per_task=8):
+    """
+    Génère le texte nettoyé d'un PDF page par page
+
+    Args:
+        source (str | bytes): Chemin du PDF ou contenu en mémoire
+        workers (int, optional): Nombre de processus (défaut: nombre de CPU)
+        parallel_min_pages (int): Nombre de pages à partir duquel le pool est utilisé
+        pages_per_task (int): Pages traitées par tâche du pool
+
+    Yields:
+        tuple: (numéro de page, texte nettoyé) dans l'ordre du document
+    """
+    try:
+        doc = open_pdf(source)
+    except Exception as e:
+        logger.warning(f"⚠️ PyMuPDF failed, trying pdfplumber: {str(e)}")
+        yield from _iter_plumber_only(source)
+        return
+
+    workers = workers or os.cpu_count() or 1
+
+    with doc:
+        page_count = doc.page_count
+        if workers <= 1 or page_count < parallel_min_pages:
+            for first in range(0, page_count, pages_per_task):
+                yield from _extract_range(doc, source, first, min(first + pages_per_task, page_count))
+            return
+
+    # Gros document : tranches de pages réparties sur le pool, résultats rendus dans l'ordre
+    # avec au plus 2 tranches en attente par processus pour garder une mémoire constante
+    ranges = [(first, min(first + pages_per_task, page_count)) for first in range(0, page_count, pages_per_task)]
+    # forkserver/spawn : pas de fork d'un processus qui a déjà des threads (préchargement, clients HTTP)
+    context = multiprocessing.get_context(
+        'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+    logger.info(f"⚡ Extraction parallèle: {page_count} pages sur {workers} processus")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(source,)) as pool:
+        pending = deque()
+        for first, last in ranges:
+            pending.append(pool.submit(_extract_range_in_worker, first, last))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
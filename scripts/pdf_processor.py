@@ -2,248 +2,275 @@
 import os
 import re
 import json
-import fitz  # PyMuPDF
-import pdfplumber
-from sentence_transformers import SentenceTransformer
+import itertools
 import numpy as np
 from filemaker_extractor import FileMakerExtractor
+from dedup import MinHashLSH, BoilerplateFilter, CorpusIndex
+import text_pipeline
+from pdf_extraction import iter_pdf_pages
+from extraction_cache import ExtractionCache, content_hash
+from ingestion_journal import IngestionJournal, STATUS_DONE, STATUS_DUPLICATE, STATUS_FAILED, STATUS_INTERRUPTED
+from encoders import load_encoder
 import logging
 import sys
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Patterns pour identifier les sections importantes (ordre = priorité à position égale)
+SECTION_PATTERNS = {
+    'chiffres_cles': r'chiffres?\s+cl[ée]s?|situation\s+au|r[ée]sum[ée]|les\s+chiffres',
+    'prix_tarifs': r'prix\s+de\s+souscription|modalit[ée]s\s+de\s+souscription|tarifs?',
+    'performance': r'performance|rendement|distribution|r[ée]sultats?|tri|rgi',
+    'patrimoine': r'patrimoine|acquisitions?|actifs?|portefeuille|zoom\s+sur',
+    'editorial': r'[ée]ditorial|message|pr[ée]sident|directeur\s+g[ée]n[ée]ral',
+    'evolution': r'[ée]volution|coup\s+d.oeil|nouvelles?\s+acquisitions?',
+    'conditions': r'conditions?\s+de\s+cession|modalit[ée]s|fiscalit[ée]',
+    'actualite': r'actualit[ée]|news|informations?\s+g[ée]n[ée]rales?'
+}
+
+# Alternation unique : un seul passage sur le texte, la section est donnée par match.lastgroup
+SECTION_SCANNER = re.compile(
+    '|'.join(f'(?P<{name}>{pattern})' for name, pattern in SECTION_PATTERNS.items()),
+    re.IGNORECASE
+)
+SENTENCE_END = re.compile(r'[.!?](?=[ \n])')
+WORD_BOUNDARY = re.compile(r'\s')
+
+# Version du découpage : à changer dès que les règles de chunking évoluent (invalide les offsets en cache)
+CHUNKER_VERSION = 'intelligent-v3:800:100'
+
+
+def strip_span(text, start, end):
+    """Équivalent de text[start:end].strip() exprimé en offsets"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
 
 class PDFProcessor:
     def __init__(self):
         self.extractor = FileMakerExtractor()
-        # Modèle d'embeddings spécialisé français
+        # Modèle d'embeddings spécialisé français (identifiant stocké avec chaque vecteur)
+        # Backend PyTorch ou ONNX Runtime selon EMBEDDING_BACKEND
+        self.embedding_model_name = os.getenv('EMBEDDING_MODEL', 'dangvantuan/sentence-camembert-large')
         try:
-            self.embedding_model = SentenceTransformer('dangvantuan/sentence-camembert-large')
+            self.embedding_model = load_encoder(self.embedding_model_name)
         except:
             # Fallback vers le modèle original si le spécialisé n'est pas disponible
-            self.embedding_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+            self.embedding_model_name = 'sentence-transformers/all-MiniLM-L6-v2'
+            self.embedding_model = load_encoder(self.embedding_model_name)
             logger.info("📝 Utilisation du modèle d'embedding par défaut")
 
-    def clean_text(self, text):
-        """Nettoyage intelligent préservant les informations financières"""
-        # Normalisation des nombres et devises
-        text = re.sub(r'(\d+)\s*[,\.]\s*(\d+)', r'\1,\2', text)  # Normalise les nombres
-        text = re.sub(r'(\d+)\s*€', r'\1€', text)  # Colle € aux nombres
-        text = re.sub(r'(\d+)\s*%', r'\1%', text)  # Colle % aux nombres
-        text = re.sub(r'(\d+)\s*M€', r'\1M€', text)  # Millions d'euros
-
-        # Réparation des mots coupés par les sauts de ligne
-        text = re.sub(r'(\w+)-\s*\n\s*(\w+)', r'\1\2', text)
-        text = re.sub(r'([^.!?])\n([a-zà-ÿ])', r'\1 \2', text)
-
-        # Nettoyage des espaces
-        text = re.sub(r' +', ' ', text)
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        text = re.sub(r'\t+', ' ', text)
-
-        # Suppression des caractères indésirables mais préservation de la ponctuation financière
-        text = re.sub(r'[^\w\s\.\,\;\:\!\?\€\%\(\)\-\n°/]', '', text)
-
-        return text.strip()
-
-    def extract_text_from_pdf(self, pdf_path):
-        """Extraction améliorée avec PyMuPDF et fallback pdfplumber"""
-        try:
-            text_content = []
-
-            # Tentative avec PyMuPDF (meilleur pour la structure)
+        # Index MinHash des chunks stockés, persistant : les bulletins répètent des paragraphes entiers
+        if os.getenv('DEDUP_CROSS_DOCUMENTS', 'true').lower() == 'true':
+            corpus_index_path = os.getenv(
+                'CORPUS_INDEX_PATH',
+                os.path.join(os.getenv('PDF_EXTRACTION_PATH', '/tmp'), 'corpus_index.sqlite')
+            )
+            threshold = float(os.getenv('DEDUP_CORPUS_THRESHOLD', '0.95'))
             try:
-                doc = fitz.open(pdf_path)
-                for page_num, page in enumerate(doc):
-                    # Extraction avec préservation de la mise en page
-                    text_dict = page.get_text("dict")
-                    page_text = self.reconstruct_text_with_structure(text_dict)
-                    if page_text.strip():
-                        text_content.append(f"\n--- Page {page_num + 1} ---\n{page_text}")
-                doc.close()
-
-                final_text = "\n".join(text_content)
-                if len(final_text.strip()) > 100:
-                    return self.clean_text(final_text)
-
+                self.corpus_index = CorpusIndex(corpus_index_path, threshold)
             except Exception as e:
-                logger.warning(f"⚠️ PyMuPDF failed, trying pdfplumber: {str(e)}")
+                logger.warning(f"⚠️ Index de déduplication indisponible ({corpus_index_path}), index en mémoire: {str(e)}")
+                self.corpus_index = CorpusIndex(':memory:', threshold)
+        else:
+            self.corpus_index = None
+
+        # Table de fréquence des paragraphes sur le corpus (mentions légales répétées)
+        self.boilerplate = BoilerplateFilter(min_documents=int(os.getenv('BOILERPLATE_MIN_DOCUMENTS', '5')))
+        self.boilerplate_path = os.getenv(
+            'BOILERPLATE_TABLE_PATH',
+            os.path.join(os.getenv('PDF_EXTRACTION_PATH', '/tmp'), 'boilerplate.npz')
+        )
+        self.boilerplate.load(self.boilerplate_path)
+        # Sauvegarde tous les N documents : le journal enregistre chaque document terminé, une
+        # table perdue (arrêt brutal) ne reverrait plus leurs paragraphes
+        self.state_save_every = int(os.getenv('BOILERPLATE_SAVE_EVERY', '25'))
+
+        # Cache local des extractions (texte nettoyé + offsets des chunks)
+        cache_path = os.getenv(
+            'EXTRACTION_CACHE_PATH',
+            os.path.join(os.getenv('PDF_EXTRACTION_PATH', '/tmp'), 'extraction_cache.sqlite')
+        )
+        try:
+            self.cache = ExtractionCache(cache_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache d'extraction indisponible ({cache_path}), cache en mémoire: {str(e)}")
+            self.cache = ExtractionCache(':memory:')
+
+        # Journal des exécutions : reprise sans appel réseau pour les documents terminés
+        journal_path = os.getenv(
+            'INGESTION_JOURNAL_PATH',
+            os.path.join(os.getenv('PDF_EXTRACTION_PATH', '/tmp'), 'ingestion_journal.sqlite')
+        )
+        try:
+            self.journal = IngestionJournal(journal_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Journal d'ingestion indisponible ({journal_path}), journal en mémoire: {str(e)}")
+            self.journal = IngestionJournal(':memory:')
 
-            # Fallback avec pdfplumber (meilleur pour les tableaux)
-            try:
-                with pdfplumber.open(pdf_path) as pdf:
-                    pages_text = []
-                    for page_num, page in enumerate(pdf.pages):
-                        page_text = page.extract_text(layout=True)
-                        if page_text and page_text.strip():
-                            pages_text.append(f"\n--- Page {page_num + 1} ---\n{page_text}")
+        # Processus d'extraction pour les gros PDF (0 = nombre de CPU)
+        self.extraction_workers = int(os.getenv('PDF_EXTRACTION_WORKERS', '0')) or None
 
-                    final_text = "\n".join(pages_text)
-                    if len(final_text.strip()) > 100:
-                        return self.clean_text(final_text)
+    def save_state(self):
+        """Sauvegarde l'état partagé entre exécutions (table boilerplate)"""
+        try:
+            self.boilerplate.save(self.boilerplate_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Sauvegarde table boilerplate échouée: {str(e)}")
 
-            except Exception as e:
-                logger.error(f"❌ pdfplumber aussi échoué: {str(e)}")
+    def clean_text(self, text):
+        """Nettoyage intelligent préservant les informations financières"""
+        return text_pipeline.clean_text(text)
 
-            logger.error(f"❌ Toutes les méthodes d'extraction ont échoué pour {pdf_path}")
-            return ""
+    def extract_text_from_pdf(self, pdf_source):
+        """
+        Extraction page par page (PyMuPDF, fallback pdfplumber par page)
 
+        Args:
+            pdf_source (str | bytes): Chemin du PDF ou contenu en mémoire
+        """
+        try:
+            pages = [
+                f"\n--- Page {page_num} ---\n{page_text}"
+                for page_num, page_text in iter_pdf_pages(pdf_source, workers=self.extraction_workers)
+            ]
         except Exception as e:
-            logger.error(f"❌ Erreur extraction PDF {pdf_path}: {str(e)}")
+            logger.error(f"❌ Erreur extraction PDF: {str(e)}")
             return ""
 
-    def reconstruct_text_with_structure(self, text_dict):
-        """Reconstruit le texte en préservant la structure des colonnes"""
-        lines = []
+        final_text = "\n".join(pages).strip()
+        if len(final_text) > 100:
+            return final_text
 
-        try:
-            for block in text_dict.get("blocks", []):
-                if "lines" in block:
-                    for line in block["lines"]:
-                        line_text = ""
-                        for span in line.get("spans", []):
-                            line_text += span.get("text", "") + " "
-                        if line_text.strip():
-                            lines.append(line_text.strip())
-
-            return "\n".join(lines)
-        except Exception as e:
-            logger.warning(f"⚠️ Erreur reconstruction structure: {str(e)}")
-            return ""
+        logger.error("❌ Toutes les méthodes d'extraction ont échoué")
+        return ""
 
     def classify_content_type(self, text):
         """Classifie le type de contenu du chunk"""
-        text_lower = text.lower()
-
-        # Mots-clés par catégorie
-        categories = {
-            'pricing': ['prix', 'souscription', 'commission', 'frais', 'tarif', 'modalités'],
-            'performance': ['rendement', 'distribution', 'tri', 'rgi', 'performance', 'dividende'],
-            'assets': ['acquisition', 'patrimoine', 'actif', 'immobilier', 'surface', 'locataire'],
-            'financial_data': ['capitalisation', 'collecte', 'parts', 'euros', 'bilan', 'résultat'],
-            'editorial': ['éditorial', 'message', 'président', 'directeur'],
-            'legal': ['conditions', 'cession', 'retrait', 'fiscalité', 'règlement']
-        }
-
-        scores = {}
-        for category, keywords in categories.items():
-            score = sum(1 for keyword in keywords if keyword in text_lower)
-            if score > 0:
-                scores[category] = score / len(keywords)
-
-        if not scores:
-            return 'general'
-
-        return max(scores, key=scores.get)
+        return text_pipeline.classify_content_type(text)
 
     def extract_financial_entities(self, text):
         """Extrait les entités financières du texte"""
-        return {
-            'prices': re.findall(r'(\d+(?:[,\.]\d+)*)\s*€', text),
-            'percentages': re.findall(r'(\d+(?:[,\.]\d+)*)\s*%', text),
-            'dates': re.findall(r'(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{4})', text),
-            'years': re.findall(r'\b(20\d{2})\b', text),
-            'quarters': re.findall(r'(\d+[er]*\s*trimestre\s*\d{4})', text, re.IGNORECASE),
-            'amounts_millions': re.findall(r'(\d+(?:[,\.]\d+)*)\s*[Mm]€', text),
-            'surfaces': re.findall(r'(\d+(?:[,\.]\d+)*)\s*m[²2]', text)
-        }
+        return text_pipeline.extract_financial_entities(text)
 
     def calculate_financial_importance(self, text):
         """Calcule un score d'importance financière"""
-        score = 0
-
-        # Présence d'entités financières
-        entities = self.extract_financial_entities(text)
-        score += len(entities['prices']) * 2
-        score += len(entities['percentages']) * 2
-        score += len(entities['amounts_millions']) * 3
-
-        # Mots-clés importants
-        important_keywords = [
-            'prix de souscription', 'rendement', 'distribution', 'capitalisation',
-            'tri', 'rgi', 'performance', 'acquisition', 'collecte'
-        ]
-
-        text_lower = text.lower()
-        for keyword in important_keywords:
-            if keyword in text_lower:
-                score += 3
-
-        return min(10, score)  # Score max de 10
+        return text_pipeline.calculate_financial_importance(text)
 
     def chunk_text_intelligent(self, text, chunk_size=800, overlap=100):
         """Chunking intelligent par sections financières"""
+        chunks = self.chunk_spans_intelligent(text, chunk_size, overlap)
 
-        # Patterns pour identifier les sections importantes
-        section_patterns = {
-            'chiffres_cles': r'(?i)(chiffres?\s+cl[ée]s?|situation\s+au|r[ée]sum[ée]|les\s+chiffres)',
-            'prix_tarifs': r'(?i)(prix\s+de\s+souscription|modalit[ée]s\s+de\s+souscription|tarifs?)',
-            'performance': r'(?i)(performance|rendement|distribution|r[ée]sultats?|tri|rgi)',
-            'patrimoine': r'(?i)(patrimoine|acquisitions?|actifs?|portefeuille|zoom\s+sur)',
-            'editorial': r'(?i)([ée]ditorial|message|pr[ée]sident|directeur\s+g[ée]n[ée]ral)',
-            'evolution': r'(?i)([ée]volution|coup\s+d.oeil|nouvelles?\s+acquisitions?)',
-            'conditions': r'(?i)(conditions?\s+de\s+cession|modalit[ée]s|fiscalit[ée])',
-            'actualite': r'(?i)(actualit[ée]|news|informations?\s+g[ée]n[ée]rales?)'
-        }
+        # Retour du texte simple pour compatibilité avec le système existant
+        return [chunk['text'] for chunk in chunks if len(chunk['text'].strip()) > 50]
 
-        chunks = []
-        processed_ranges = []
+    def chunk_spans_intelligent(self, text, chunk_size=800, overlap=100):
+        """
+        Chunking intelligent en un seul passage, les chunks étant repérés par leurs offsets
 
+        Returns:
+            list: Chunks enrichis (texte, offsets start/end, section, métadonnées financières)
+        """
         # Premier passage : sections identifiées
-        for section_name, pattern in section_patterns.items():
-            matches = list(re.finditer(pattern, text))
-
-            for match in matches:
-                # Contexte étendu autour de la section
-                start = max(0, match.start() - 150)
-                end = min(len(text), match.start() + chunk_size + 200)
-
-                # Éviter les chevauchements avec des sections déjà traitées
-                if any(start < proc_end and end > proc_start for proc_start, proc_end in processed_ranges):
-                    continue
+        section_spans = self.scan_section_spans(text, chunk_size)
+
+        # Deuxième passage : chunking traditionnel pour le reste, intervalle par intervalle.
+        # Un intervalle court est rattaché à la section voisine (offsets contigus) au lieu
+        # de former un chunk tronqué
+        spans = []
+        gap_start = 0
+        for span_start, span_end, section in section_spans + [(len(text), len(text), None)]:
+            if span_start > gap_start:
+                stripped_start, stripped_end = strip_span(text, gap_start, span_start)
+                if stripped_end - stripped_start > chunk_size // 2 or (section is None and not spans):
+                    spans.extend(
+                        [start, end, 'general']
+                        for start, end in self.traditional_chunk_spans(text, chunk_size, overlap, gap_start, span_start)
+                    )
+                elif spans:
+                    spans[-1][1] = span_start
+                else:
+                    span_start = gap_start
+            if section is not None:
+                spans.append([span_start, span_end, section])
+            gap_start = max(gap_start, span_end)
+
+        # Fragments trop courts (fin de section, dernier morceau d'un intervalle) : fusionnés
+        # avec le chunk précédent
+        merged = []
+        for span in spans:
+            stripped_start, stripped_end = strip_span(text, span[0], span[1])
+            if merged and stripped_end - stripped_start < chunk_size // 4:
+                merged[-1][1] = max(merged[-1][1], span[1])
+            else:
+                merged.append(span)
 
-                # Chercher une fin de section ou de phrase naturelle
-                chunk_end = self.find_natural_boundary(text, end)
-                chunk_text = text[start:chunk_end].strip()
-
-                if len(chunk_text) > 100:  # Chunk significatif
-                    # Enrichissement avec métadonnées
-                    chunk_info = {
-                        'text': chunk_text,
-                        'section': section_name,
-                        'content_type': self.classify_content_type(chunk_text),
-                        'financial_entities': self.extract_financial_entities(chunk_text),
-                        'financial_score': self.calculate_financial_importance(chunk_text),
-                        'word_count': len(chunk_text.split())
-                    }
-
-                    chunks.append(chunk_info)
-                    processed_ranges.append((start, chunk_end))
-
-        # Deuxième passage : chunking traditionnel pour le reste
-        remaining_text = text
-        for proc_start, proc_end in sorted(processed_ranges, reverse=True):
-            remaining_text = remaining_text[:proc_start] + remaining_text[proc_end:]
-
-        if remaining_text.strip():
-            traditional_chunks = self.traditional_chunking(remaining_text, chunk_size, overlap)
-            for chunk_text in traditional_chunks:
-                chunk_info = {
-                    'text': chunk_text,
-                    'section': 'general',
-                    'content_type': self.classify_content_type(chunk_text),
-                    'financial_entities': self.extract_financial_entities(chunk_text),
-                    'financial_score': self.calculate_financial_importance(chunk_text),
-                    'word_count': len(chunk_text.split())
-                }
-                chunks.append(chunk_info)
+        chunks = [self.build_chunk_info(text, start, end, section) for start, end, section in merged]
 
         # Tri par importance financière et suppression des doublons
-        chunks = self.deduplicate_and_sort_chunks(chunks)
+        return self.deduplicate_and_sort_chunks(chunks)
+
+    def scan_section_spans(self, text, chunk_size=800):
+        """
+        Repère les sections financières avec une seule regex précompilée
+
+        Les sections sont acceptées dans l'ordre du texte et ne se chevauchent pas : seule
+        la dernière section retenue peut chevaucher un nouveau candidat, ce qui permet de
+        reprendre la recherche directement après elle.
+
+        Returns:
+            list: Tuples (start, end, section) triés par position
+        """
+        spans = []
+        covered_end = 0
+        position = 0
+
+        while True:
+            match = SECTION_SCANNER.search(text, position)
+            if not match:
+                break
 
-        # Retour du texte simple pour compatibilité avec le système existant
-        return [chunk['text'] for chunk in chunks if len(chunk['text'].strip()) > 50]
+            # Contexte étendu autour de la section, sans couper de mot
+            start = max(0, match.start() - 150)
+            if start > 0 and not text[start - 1].isspace():
+                word_end = WORD_BOUNDARY.search(text, start, match.start())
+                start = word_end.start() if word_end else match.start()
+            if start < covered_end:
+                # Chevauchement : aucun candidat possible avant covered_end + 150
+                position = max(match.end(), covered_end + 150)
+                continue
+
+            end = min(len(text), match.start() + chunk_size + 200)
+
+            # Chercher une fin de section ou de phrase naturelle
+            chunk_end = self.find_natural_boundary(text, end)
+            stripped_start, stripped_end = strip_span(text, start, chunk_end)
+
+            if stripped_end - stripped_start > 100:  # Chunk significatif
+                spans.append((start, chunk_end, match.lastgroup))
+                covered_end = chunk_end
+                position = max(match.end(), covered_end + 150)
+            else:
+                position = match.end()
+
+        return spans
+
+    def build_chunk_info(self, text, start, end, section):
+        """Enrichit un intervalle du texte avec ses métadonnées"""
+        start, end = strip_span(text, start, end)
+        chunk_text = text[start:end]
+        chunk_info = {
+            'text': chunk_text,
+            'start': start,
+            'end': end,
+            'section': section
+        }
+        chunk_info.update(text_pipeline.analyze_chunk(chunk_text))
+        return chunk_info
 
     def find_natural_boundary(self, text, position):
         """Trouve une frontière naturelle pour découper le texte"""
@@ -251,72 +278,117 @@ class PDFProcessor:
             return len(text)
 
         # Chercher la fin du paragraphe le plus proche
-        for i in range(position, min(position + 200, len(text))):
-            if text[i:i + 2] == '\n\n':
-                return i
+        paragraph_end = text.find('\n\n', position, min(position + 200, len(text)) + 1)
+        if paragraph_end != -1:
+            return paragraph_end
 
         # Sinon, chercher la fin de phrase
-        for i in range(position, min(position + 100, len(text))):
-            if text[i] in '.!?' and i + 1 < len(text) and text[i + 1] in ' \n':
-                return i + 1
+        sentence_end = SENTENCE_END.search(text, position, min(position + 101, len(text)))
+        if sentence_end:
+            return sentence_end.start() + 1
 
-        return position
+        # À défaut, fin du mot en cours
+        word_end = WORD_BOUNDARY.search(text, position)
+        return word_end.start() if word_end else len(text)
 
     def traditional_chunking(self, text, chunk_size, overlap):
         """Chunking traditionnel amélioré"""
-        if len(text) <= chunk_size:
-            return [text] if text.strip() else []
+        return [text[start:end] for start, end in self.traditional_chunk_spans(text, chunk_size, overlap)]
+
+    def traditional_chunk_spans(self, text, chunk_size, overlap, lower=0, upper=None):
+        """
+        Chunking traditionnel sur l'intervalle [lower, upper) du texte, sans copie
 
-        chunks = []
-        start = 0
+        Returns:
+            list: Tuples (start, end) des chunks, espaces de bord exclus
+        """
+        if upper is None:
+            upper = len(text)
 
-        while start < len(text):
-            end = min(start + chunk_size, len(text))
+        if upper - lower <= chunk_size:
+            start, end = strip_span(text, lower, upper)
+            return [(start, end)] if end > start else []
+
+        spans = []
+        start = lower
+
+        while start < upper:
+            end = min(start + chunk_size, upper)
 
             # Ajuster pour ne pas couper au milieu d'une phrase
-            if end < len(text):
+            if end < upper:
                 # Chercher la fin de phrase la plus proche
                 for i in range(end, max(start + chunk_size - 200, start), -1):
-                    if text[i] in '.!?' and i + 1 < len(text) and text[i + 1] in ' \n':
+                    if text[i] in '.!?' and i + 1 < upper and text[i + 1] in ' \n':
                         end = i + 1
                         break
 
-            chunk = text[start:end].strip()
-            if chunk and len(chunk) > 50:
-                chunks.append(chunk)
+            chunk_start, chunk_end = strip_span(text, start, end)
+            if chunk_end - chunk_start > 50:
+                spans.append((chunk_start, chunk_end))
 
             start = max(start + chunk_size - overlap, end - overlap)
-            if start >= len(text):
+            if start >= upper:
                 break
 
-        return chunks
+        return spans
 
     def deduplicate_and_sort_chunks(self, chunks):
-        """Déduplique et trie les chunks par importance"""
-        # Déduplication basée sur la similarité du contenu
-        unique_chunks = []
+        """Déduplique (MinHash + LSH) et trie les chunks par importance"""
+        # Déduplication basée sur la similarité du contenu, sans comparaison deux à deux
+        index = MinHashLSH(threshold=0.8)  # 80% de similarité = doublon
+        unique_chunks = {}
+
+        for position, chunk in enumerate(chunks):
+            signature = index.signature(chunk['text'])
+            if signature is None:
+                continue
+
+            matches = index.query(signature)
+            if matches:
+                existing_key = matches[0][0]
+                # Garder le chunk avec le meilleur score financier
+                if chunk['financial_score'] > unique_chunks[existing_key]['financial_score']:
+                    index.remove(existing_key)
+                    del unique_chunks[existing_key]
+                    index.insert(position, signature)
+                    unique_chunks[position] = chunk
+                continue
+
+            index.insert(position, signature)
+            unique_chunks[position] = chunk
 
-        for chunk in chunks:
-            is_duplicate = False
-            chunk_words = set(chunk['text'].lower().split())
+        # Tri par score financier décroissant
+        return sorted(unique_chunks.values(), key=lambda x: x['financial_score'], reverse=True)
 
-            for existing in unique_chunks:
-                existing_words = set(existing['text'].lower().split())
-                similarity = len(chunk_words & existing_words) / len(chunk_words | existing_words)
+    def filter_corpus_duplicates(self, chunks, record_id=None):
+        """
+        Écarte les chunks quasi-identiques (mêmes nombres) à des chunks déjà stockés pour d'autres documents
 
-                if similarity > 0.8:  # 80% de similarité = doublon
-                    is_duplicate = True
-                    # Garder le chunk avec le meilleur score financier
-                    if chunk['financial_score'] > existing['financial_score']:
-                        unique_chunks.remove(existing)
-                        unique_chunks.append(chunk)
-                    break
+        Args:
+            chunks (list): Textes des chunks du document courant
+            record_id (str, optional): Document courant (ses propres chunks ne comptent pas)
 
-            if not is_duplicate:
-                unique_chunks.append(chunk)
+        Returns:
+            tuple: (chunks conservés, signatures MinHash correspondantes)
+        """
+        if self.corpus_index is None:
+            return chunks, [None] * len(chunks)
 
-        # Tri par score financier décroissant
-        return sorted(unique_chunks, key=lambda x: x['financial_score'], reverse=True)
+        kept_chunks = []
+        signatures = []
+        for chunk in chunks:
+            signature = self.corpus_index.signature(chunk)
+            if self.corpus_index.find(chunk, signature, exclude_document=str(record_id)) is not None:
+                continue
+            kept_chunks.append(chunk)
+            signatures.append(signature)
+
+        skipped = len(chunks) - len(kept_chunks)
+        if skipped:
+            logger.info(f"♻️ {skipped} chunks déjà présents dans le corpus ignorés")
+
+        return kept_chunks, signatures
 
     def generate_embeddings(self, texts):
         """Génère les embeddings pour une liste de textes"""
@@ -327,8 +399,82 @@ class PDFProcessor:
             logger.error(f"❌ Erreur génération embeddings: {str(e)}")
             raise
 
-    def process_document(self, document_record, doc_index, total_docs):
-        """Traite un document complet"""
+    def load_document_text(self, document_record, filename, pdf_url, existing_text):
+        """
+        Texte nettoyé d'un document, sans téléchargement ni parsing s'il est déjà en cache
+
+        Returns:
+            tuple: (texte, empreinte du contenu) - texte vide en cas d'échec
+        """
+        if existing_text and len(existing_text.strip()) >= 100:
+            logger.info(f"📝 Utilisation du texte existant ({len(existing_text)} caractères)")
+            return existing_text, content_hash(existing_text)
+
+        if not pdf_url:
+            logger.error(f"❌ Pas de texte ni d'URL PDF pour {filename}")
+            return "", None
+
+        # Version d'enregistrement déjà extraite : ni téléchargement ni parsing
+        source_key = ExtractionCache.source_key(document_record['recordId'], document_record.get('modId'))
+        digest = self.cache.lookup_source(source_key)
+        if digest:
+            text = self.cache.get_text(digest)
+            if text is not None:
+                logger.info(f"💾 Texte repris du cache ({len(text)} caractères)")
+                return text, digest
+
+        # Téléchargement en mémoire (fichier temporaire unique au-delà du seuil)
+        pdf_buffer = self.extractor.download_pdf_buffer(pdf_url)
+        if pdf_buffer is None:
+            logger.error(f"❌ Impossible de télécharger {filename}")
+            return "", None
+
+        with pdf_buffer:
+            digest = pdf_buffer.sha256()
+            text = self.cache.get_text(digest)
+            if text is not None:
+                logger.info(f"💾 PDF déjà extrait, texte repris du cache ({len(text)} caractères)")
+            else:
+                text = self.extract_text_from_pdf(pdf_buffer.source)
+                logger.info(f"📄 Texte extrait du PDF ({len(text)} caractères)")
+                if text:
+                    self.cache.put_text(digest, text)
+
+        if text:
+            self.cache.link_source(source_key, digest)
+        return text, digest
+
+    def chunk_document(self, text, digest=None):
+        """Chunking intelligent avec réutilisation des offsets en cache"""
+        if digest:
+            spans = self.cache.get_spans(digest, CHUNKER_VERSION, text)
+            if spans is not None:
+                logger.info(f"💾 Découpage repris du cache ({len(spans)} chunks)")
+                return [text[start:end] for start, end in spans]
+
+        spans = [
+            (chunk['start'], chunk['end'])
+            for chunk in self.chunk_spans_intelligent(text)
+            if len(chunk['text'].strip()) > 50
+        ]
+        if digest:
+            self.cache.put_spans(digest, CHUNKER_VERSION, text, spans)
+
+        return [text[start:end] for start, end in spans]
+
+    def process_document(self, document_record, doc_index, total_docs, check_existing=True):
+        """
+        Traite un document complet
+
+        Args:
+            check_existing (bool): Vérifie dans FileMaker que le document n'a pas déjà de
+                chunks (inutile quand il provient de get_documents_without_chunks)
+
+        Returns:
+            str: STATUS_DONE, STATUS_DUPLICATE (tous les chunks existent déjà dans le
+                corpus, rien n'est écrit), STATUS_INTERRUPTED (une partie seulement des
+                chunks est sauvegardée) ou STATUS_FAILED (aucun chunk sauvegardé)
+        """
         record_id = document_record['recordId']
         field_data = document_record['fieldData']
         filename = field_data.get('Nom_fichier', 'Inconnu')
@@ -336,39 +482,29 @@ class PDFProcessor:
         existing_text = field_data.get('text', '')
 
         # ✅ VÉRIFICATION ANTI-DOUBLON
-        existing_chunks = self.extractor.get_chunks_for_document(record_id)
-        if existing_chunks and len(existing_chunks) > 0:
-            logger.info(f"⏭️ [{doc_index}/{total_docs}] {filename} - Déjà traité ({len(existing_chunks)} chunks)")
-            return True
+        if check_existing:
+            existing_chunks = self.extractor.get_chunks_for_document(record_id)
+            if existing_chunks and len(existing_chunks) > 0:
+                logger.info(f"⏭️ [{doc_index}/{total_docs}] {filename} - Déjà traité ({len(existing_chunks)} chunks)")
+                return STATUS_DONE
 
         logger.info(f"🔄 [{doc_index}/{total_docs}] Nouveau traitement: {filename}")
 
-        # Extraction du texte
-        text = ""
-        if existing_text and len(existing_text.strip()) >= 100:
-            text = existing_text
-            logger.info(f"📝 Utilisation du texte existant ({len(text)} caractères)")
-        elif pdf_url:
-            # Télécharger et extraire avec la nouvelle méthode
-            pdf_path = f"/tmp/{filename}"
-            if self.extractor.download_pdf(pdf_url, pdf_path):
-                text = self.extract_text_from_pdf(pdf_path)
-                os.remove(pdf_path)  # Nettoie
-                logger.info(f"📄 Texte extrait du PDF ({len(text)} caractères)")
-            else:
-                logger.error(f"❌ Impossible de télécharger {filename}")
-                return False
-        else:
-            logger.error(f"❌ Pas de texte ni d'URL PDF pour {filename}")
-            return False
+        # Extraction du texte (FileMaker, cache local ou PDF)
+        text, digest = self.load_document_text(document_record, filename, pdf_url, existing_text)
 
         if not text or len(text.strip()) < 100:
             logger.warning(f"⚠️ Texte insuffisant pour {filename}")
-            return False
+            return STATUS_FAILED
 
-        # Chunking intelligent
+        # Suppression des paragraphes répétés dans tout le corpus avant embedding
+        text, boilerplate_count = self.boilerplate.filter_text(record_id, text)
+        if boilerplate_count:
+            logger.info(f"🧹 {boilerplate_count} paragraphes boilerplate écartés ({len(text)} caractères restants)")
+
+        # Chunking intelligent (offsets réutilisés depuis le cache si le texte est inchangé)
         try:
-            chunks = self.chunk_text_intelligent(text)
+            chunks = self.chunk_document(text, digest)
             logger.info(f"📝 {len(chunks)} chunks créés avec chunking intelligent")
         except Exception as e:
             logger.warning(f"⚠️ Chunking intelligent échoué, fallback traditionnel: {str(e)}")
@@ -377,7 +513,13 @@ class PDFProcessor:
 
         if not chunks:
             logger.warning(f"⚠️ Aucun chunk créé pour {filename}")
-            return False
+            return STATUS_FAILED
+
+        # Déduplication inter-documents
+        chunks, signatures = self.filter_corpus_duplicates(chunks, record_id)
+        if not chunks:
+            logger.info(f"♻️ Tous les chunks de {filename} existent déjà dans le corpus")
+            return STATUS_DUPLICATE
 
         # Génération des embeddings
         try:
@@ -385,78 +527,258 @@ class PDFProcessor:
             logger.info(f"🧮 Embeddings générés pour {len(chunks)} chunks")
         except Exception as e:
             logger.error(f"❌ Erreur embardings: {str(e)}")
-            return False
+            return STATUS_FAILED
 
         # Sauvegarde dans FileMaker
         success_count = 0
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+        for i, (chunk, embedding, signature) in enumerate(zip(chunks, embeddings, signatures)):
+            # Disjoncteur ouvert : inutile d'envoyer les chunks suivants un par un
+            if self.extractor.breaker.state == 'open':
+                logger.error(f"⛔ FileMaker indisponible, sauvegarde de {filename} interrompue")
+                break
             try:
                 embedding_json = json.dumps(embedding.tolist())
-                if self.extractor.create_chunk(record_id, chunk, i + 1, embedding_json):
+                if self.extractor.create_chunk(record_id, chunk, i + 1, embedding_json,
+                                              embedding_model=self.embedding_model_name):
                     success_count += 1
+                    if self.corpus_index is not None:
+                        self.corpus_index.add(record_id, i + 1, chunk, signature)
             except Exception as e:
                 logger.error(f"❌ Erreur sauvegarde chunk {i + 1}: {str(e)}")
 
+        if self.corpus_index is not None:
+            self.corpus_index.commit()
+
         success_rate = (success_count / len(chunks)) * 100
         logger.info(f"✅ {success_count}/{len(chunks)} chunks sauvegardés ({success_rate:.1f}%)")
 
-        return success_count > 0
-
-
-def main(start_index=0, batch_size=450):
-    """Traitement principal avec pagination"""
+        if success_count == len(chunks):
+            return STATUS_DONE
+        # Document partiel : ses chunks le masquent des documents sans chunks, le journal
+        # le fera nettoyer puis retraiter
+        return STATUS_INTERRUPTED if success_count > 0 else STATUS_FAILED
+
+    def discard_chunks(self, record_id):
+        """
+        Supprime les chunks déjà écrits d'un document avant de le retraiter (FileMaker
+        et index de déduplication)
+
+        Returns:
+            int: Nombre de chunks supprimés dans FileMaker
+
+        Raises:
+            ConnectionError: Si les chunks ne peuvent pas être supprimés
+        """
+        deleted = self.extractor.delete_chunks_for_document(record_id)
+        if self.corpus_index is not None:
+            self.corpus_index.remove_document(record_id)
+            self.corpus_index.commit()
+        return deleted
+
+    def rebuild_corpus_index(self):
+        """Index de déduplication vide (première exécution, fichier perdu) : reconstruit depuis FileMaker"""
+        if self.corpus_index is None or len(self.corpus_index):
+            return
+        try:
+            count = self.corpus_index.rebuild(self.extractor.iter_chunk_records())
+        except ConnectionError as e:
+            logger.warning(f"⚠️ Reconstruction de l'index de déduplication impossible: {str(e)}")
+            return
+        if count:
+            logger.info(f"📚 Index de déduplication reconstruit depuis FileMaker: {count} chunks")
+
+
+def mark_modified_documents(extractor, journal, completed):
+    """
+    Passe à l'état modifié du journal les documents terminés dont le modId a changé
+
+    Ces documents ont des chunks et n'apparaissent donc pas parmi les documents sans
+    chunks : les documents au champ lié non vide ("*") sont parcourus, sur le layout
+    réduit DOCUMENTS_LIST_LAYOUT s'il est défini.
+
+    Returns:
+        int: Nombre de documents modifiés
+    """
+    related_field = os.getenv('DOCUMENTS_CHUNKS_FIELD', 'Chunks::idDocument')
+    modified = 0
+    for document in extractor.iter_documents(query=[{related_field: "*"}],
+                                             response_layout=os.getenv('DOCUMENTS_LIST_LAYOUT') or None):
+        record_id = str(document['recordId'])
+        if record_id in completed and journal.is_modified(completed[record_id], document.get('modId')):
+            journal.mark_modified(record_id)
+            del completed[record_id]
+            modified += 1
+    return modified
+
+
+def main(batch_size=450, retry_failed=False, check_modified=False):
+    """
+    Traitement principal avec reprise sur journal
+
+    Args:
+        batch_size (int): Nombre maximum de documents traités par exécution
+        retry_failed (bool): Retente les documents en échec lors des exécutions précédentes
+        check_modified (bool): Recherche aussi les documents terminés modifiés depuis leur
+            traitement (parcours de tous les documents qui ont des chunks)
+    """
     processor = PDFProcessor()
+    journal = processor.journal
+
+    # Documents terminés connus localement (et version traitée) : aucun appel FileMaker pour eux
+    completed = journal.completed_versions()
+    failed = set() if retry_failed else journal.failed_ids()
+    logger.info(f"📒 Journal: {len(completed)} documents terminés, {len(failed)} en échec ignorés")
 
     if not processor.extractor.login():
         logger.error("❌ Connexion FileMaker échouée")
         return
 
-    # Récupère TOUS les documents
-    documents = processor.extractor.get_documents()
-    total_docs = len(documents)
+    processor.rebuild_corpus_index()
 
-    if total_docs == 0:
-        logger.error("❌ Aucun document trouvé")
-        processor.extractor.logout()
+    if check_modified:
+        try:
+            modified = mark_modified_documents(processor.extractor, journal, completed)
+            logger.info(f"✏️ {modified} documents modifiés depuis leur traitement")
+        except (ConnectionError, KeyError) as e:
+            logger.error(f"❌ Recherche des documents modifiés impossible: {str(e)}")
+
+    # Documents commencés sans être terminés ou modifiés depuis : chunks supprimés, le
+    # document redevient un document sans chunks et est retraité en entier
+    for record_id in sorted(journal.resumable_ids(include_failed=retry_failed)):
+        try:
+            deleted = processor.discard_chunks(record_id)
+        except ConnectionError as e:
+            logger.error(f"❌ Nettoyage du document {record_id} impossible, ignoré: {str(e)}")
+            failed.add(record_id)
+            continue
+        if deleted:
+            logger.info(f"🧹 Document {record_id}: {deleted} chunks supprimés avant retraitement")
+
+    # Documents sans chunks en flux (recherche "=" sur le champ lié), vérification par document en
+    # secours : le traitement commence dès la première page, la mémoire ne dépend pas de la taille du corpus
+    extractor = processor.extractor
+    documents = extractor.iter_documents_without_chunks()
+    check_existing = False
+    try:
+        try:
+            first = next(documents, None)
+        except KeyError as e:
+            logger.warning(f"⚠️ {e.args[0]}, vérification des chunks document par document")
+            documents = extractor.iter_documents()
+            check_existing = True
+            first = next(documents, None)
+    except ConnectionError as e:
+        logger.error(f"❌ Énumération des documents impossible: {str(e)}")
+        extractor.logout()
         return
 
-    logger.info(f"📁 {total_docs} documents trouvés au total")
-
-    # Calcul de la plage de traitement
-    end_index = min(start_index + batch_size, total_docs)
-    batch_docs = documents[start_index:end_index]
-
-    logger.info(f"🎯 Traitement: documents {start_index + 1} à {end_index}")
-    logger.info(f"📊 Batch: {len(batch_docs)} documents à traiter")
+    # Layout réduit (DOCUMENTS_LIST_LAYOUT) : le document complet est relu avant traitement
+    reload_documents = bool(os.getenv('DOCUMENTS_LIST_LAYOUT')) and not check_existing
+    candidates = itertools.chain([first], documents) if first is not None else iter(())
+    # Document terminé dont le modId a changé : à retraiter
+    pending = (
+        doc for doc in candidates
+        if str(doc['recordId']) not in failed and (
+            str(doc['recordId']) not in completed
+            or journal.is_modified(completed[str(doc['recordId'])], doc.get('modId')))
+    )
+    # Borne haute : les documents écartés par le journal ne sont connus qu'au fil du flux
+    total_docs = min(batch_size, extractor.documents_found or 0)
+
+    logger.info(f"📁 {extractor.documents_found or 0} documents à examiner, lus en flux")
+    logger.info(f"📊 Batch: jusqu'à {total_docs} documents à traiter")
 
     # Traitement
     processed = 0
+    duplicates = 0
     errors = 0
+    interrupted = False
+
+    try:
+        for doc_index, doc in enumerate(itertools.islice(pending, batch_size), 1):
+            record_id = doc['recordId']
+            if reload_documents:
+                doc = extractor.get_document(record_id)
+                if doc is None:
+                    logger.warning(f"⚠️ Document {record_id} supprimé entre-temps")
+                    continue
+            journal.mark_started(record_id, doc.get('modId'), doc['fieldData'].get('Nom_fichier'))
+            error = None
 
-    for i, doc in enumerate(batch_docs):
-        doc_index = start_index + i + 1
+            if str(record_id) in completed:
+                # Version déjà traitée remplacée : ses chunks (et signatures) ne valent plus
+                deleted = processor.discard_chunks(record_id)
+                logger.info(f"✏️ Document {record_id} modifié depuis son traitement: {deleted} chunks remplacés")
 
-        try:
-            success = processor.process_document(doc, doc_index, total_docs)
-            if success:
+            try:
+                outcome = processor.process_document(doc, doc_index, total_docs, check_existing=check_existing)
+            except Exception as e:
+                logger.error(f"💥 Erreur document {doc_index}: {str(e)}")
+                outcome = STATUS_FAILED
+                error = str(e)
+
+            if outcome in (STATUS_FAILED, STATUS_INTERRUPTED) and extractor.breaker.state != 'closed':
+                # Échec dû à l'indisponibilité de FileMaker : document repris (chunks partiels
+                # supprimés) à la prochaine exécution et batch arrêté plutôt que d'insister
+                journal.mark_interrupted(record_id, error or "FileMaker indisponible")
+                logger.error("⛔ FileMaker indisponible, batch interrompu")
+                interrupted = True
+                break
+
+            if outcome == STATUS_DONE:
+                journal.mark_done(record_id, doc.get('modId'))
                 processed += 1
+            elif outcome == STATUS_DUPLICATE:
+                # Aucun chunk écrit : le journal seul évite de le retraiter
+                journal.mark_duplicate(record_id, doc.get('modId'))
+                duplicates += 1
+            elif outcome == STATUS_INTERRUPTED:
+                journal.mark_interrupted(record_id, "chunks partiellement sauvegardés")
+                errors += 1
             else:
+                journal.mark_failed(record_id, error)
                 errors += 1
-        except Exception as e:
-            logger.error(f"💥 Erreur document {doc_index}: {str(e)}")
-            errors += 1
+
+            if processor.state_save_every and doc_index % processor.state_save_every == 0:
+                processor.save_state()
+    except ConnectionError as e:
+        # Page suivante illisible : les documents déjà traités restent acquis (journal)
+        logger.error(f"❌ Lecture des documents interrompue: {str(e)}")
+        interrupted = True
+    finally:
+        # Arrête la lecture anticipée de la page suivante
+        documents.close()
+        # Table boilerplate au niveau du journal, même après une exception ou un Ctrl+C
+        processor.save_state()
+
+    if processed + duplicates + errors == 0 and not interrupted:
+        logger.info("✅ Rien à traiter")
+        extractor.logout()
+        return
 
     # Résumé final
-    logger.info(f"🏁 RÉSUMÉ du batch {start_index}-{end_index}:")
+    logger.info(f"🏁 RÉSUMÉ du batch:")
     logger.info(f"   ✅ Traités avec succès: {processed}")
+    logger.info(f"   ♻️ Doublons du corpus: {duplicates}")
     logger.info(f"   ❌ Erreurs: {errors}")
     logger.info(
-        f"   📊 Taux de succès: {(processed / (processed + errors) * 100):.1f}%" if (processed + errors) > 0 else "")
+        f"   📊 Taux de succès: {((processed + duplicates) / (processed + duplicates + errors) * 100):.1f}%"
+        if (processed + duplicates + errors) > 0 else "")
+    logger.info(f"   📒 Journal: {journal.summary()}")
 
     processor.extractor.logout()
 
 
 if __name__ == "__main__":
-    start = int(sys.argv[1]) if len(sys.argv) > 1 else 0
-    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 450
-    main(start, batch)
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) > 2:
+        sys.exit("Usage: python pdf_processor.py [batch_size=450] [--retry-failed] [--check-modified]")
+    if len(args) == 2:
+        # Ancienne forme "<start> <batch>" : la reprise est assurée par le journal d'ingestion
+        logger.warning(
+            f"⚠️ Forme 'pdf_processor.py <start> <batch>' dépréciée : start={args[0]} ignoré "
+            f"(reprise par le journal), batch={args[1]}"
+        )
+        args = args[1:]
+    batch = int(args[0]) if args else 450
+    main(batch, retry_failed='--retry-failed' in sys.argv, check_modified='--check-modified' in sys.argv)
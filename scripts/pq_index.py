@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Index compressé par quantification produit (PQ) derrière une couche IVF
+Les vecteurs sont répartis en listes autour de centroïdes grossiers (k-means), puis le
+résidu de chaque vecteur est codé sur m octets (un centroïde par sous-espace). Une
+question n'est comparée qu'aux listes les plus proches, via des tables de produits
+scalaires précalculées (calcul asymétrique : la question n'est pas quantifiée).
+"""
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ASSIGN_BATCH_ROWS = 16384
+
+
+def assign(data, centroids):
+    """Indice du centroïde le plus proche (distance L2) de chaque ligne, par lots"""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assignments = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), ASSIGN_BATCH_ROWS):
+        block = np.asarray(data[start:start + ASSIGN_BATCH_ROWS], dtype=np.float32)
+        # ||x - c||² = ||x||² - 2 x.c + ||c||² : ||x||² ne change pas l'argmin
+        distances = centroid_norms[None, :] - 2 * (block @ centroids.T)
+        assignments[start:start + len(block)] = distances.argmin(axis=1)
+    return assignments
+
+
+def kmeans(data, k, iterations=20, seed=0):
+    """
+    k-means de Lloyd en NumPy
+
+    Args:
+        data (array): Matrice (n, d) d'apprentissage
+        k (int): Nombre de centroïdes (borné par n)
+
+    Returns:
+        array: Centroïdes (k, d) en float32
+    """
+    data = np.asarray(data, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign(data, centroids)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=k)
+        filled = counts > 0
+
+        # Somme par cluster sur les lignes triées : une seule passe sans boucle Python
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        centroids[filled] = sums / counts[filled][:, None]
+
+        # Clusters vides : ré-initialisés sur des points tirés au hasard
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+
+    return centroids
+
+
+def default_subvectors(dim, target_dsub=8):
+    """Plus grand nombre de sous-espaces divisant dim avec au moins target_dsub dimensions chacun"""
+    for m in range(max(1, dim // target_dsub), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+class ProductQuantizer:
+    """Codec PQ : m sous-espaces, 2^nbits centroïdes par sous-espace, codes uint8"""
+
+    def __init__(self, dim, m=None, nbits=8):
+        m = m or default_subvectors(dim)
+        if dim % m:
+            raise ValueError(f"La dimension {dim} n'est pas divisible en {m} sous-espaces")
+        if not 1 <= nbits <= 8:
+            raise ValueError("nbits doit être compris entre 1 et 8 (codes sur un octet)")
+
+        self.dim = dim
+        self.m = m
+        self.dsub = dim // m
+        self.ksub = 2 ** nbits
+        self.codebooks = None
+
+    def train(self, vectors, iterations=20, seed=0):
+        """Apprend un dictionnaire (ksub, dsub) par sous-espace"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.codebooks = np.stack([
+            kmeans(vectors[:, j * self.dsub:(j + 1) * self.dsub], self.ksub, iterations, seed + j)
+            for j in range(self.m)
+        ])
+        return self
+
+    def encode(self, vectors):
+        """Codes (n, m) uint8 des vecteurs"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = assign(vectors[:, j * self.dsub:(j + 1) * self.dsub], self.codebooks[j])
+        return codes
+
+    def decode(self, codes):
+        """Reconstruction approchée (n, dim) des vecteurs codés"""
+        return np.concatenate([self.codebooks[j][codes[:, j]] for j in range(self.m)], axis=1)
+
+    def lookup_table(self, query):
+        """Produits scalaires (m, ksub) entre chaque sous-vecteur de la question et chaque centroïde"""
+        query = np.asarray(query, dtype=np.float32).reshape(self.m, self.dsub)
+        return np.einsum('mkd,md->mk', self.codebooks, query)
+
+    def adc(self, codes, table):
+        """Scores approchés par somme des entrées de la table désignées par les codes"""
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for j in range(self.m):
+            scores += table[j, codes[:, j]]
+        return scores
+
+
+class IVFPQIndex:
+    """Listes inversées (IVF) de codes PQ des résidus, scoring par produit scalaire"""
+
+    def __init__(self, dim, nlist, m=None, nbits=8):
+        self.dim = dim
+        self.nlist = nlist
+        self.pq = ProductQuantizer(dim, m, nbits)
+        self.centroids = None
+        self.codes = np.zeros((0, self.pq.m), dtype=np.uint8)
+        self.rows = np.zeros(0, dtype=np.uint32)
+        self.offsets = np.zeros(nlist + 1, dtype=np.int64)
+
+    @staticmethod
+    def default_nlist(count):
+        """Environ 4 * sqrt(n) listes, avec au moins 39 vecteurs par liste pour l'apprentissage"""
+        return int(max(1, min(4 * np.sqrt(count), count // 39)))
+
+    @property
+    def count(self):
+        return len(self.rows)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.rows.nbytes + self.centroids.nbytes + self.pq.codebooks.nbytes
+
+    def train(self, vectors, sample_size=100000, iterations=20, seed=0):
+        """Apprend les centroïdes grossiers puis le codec PQ des résidus sur un échantillon"""
+        rng = np.random.default_rng(seed)
+        if len(vectors) > sample_size:
+            sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+        else:
+            sample = np.asarray(vectors)
+        sample = sample.astype(np.float32)
+
+        self.centroids = kmeans(sample, self.nlist, iterations, seed)
+        self.nlist = len(self.centroids)
+        residuals = sample - self.centroids[assign(sample, self.centroids)]
+        self.pq.train(residuals, iterations, seed)
+        return self
+
+    def build(self, vectors, block_rows=65536):
+        """
+        Code tous les vecteurs (lecture par blocs, compatible avec un fichier projeté)
+        puis les regroupe par liste
+        """
+        lists, codes = [], []
+        for start in range(0, len(vectors), block_rows):
+            block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+            block_lists = assign(block, self.centroids)
+            lists.append(block_lists)
+            codes.append(self.pq.encode(block - self.centroids[block_lists]))
+
+        lists = np.concatenate(lists) if lists else np.zeros(0, dtype=np.int64)
+        order = np.argsort(lists, kind='stable')
+        self.rows = order.astype(np.uint32)
+        self.codes = np.concatenate(codes)[order] if codes else self.codes
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(lists, minlength=self.nlist)))).astype(np.int64)
+        return self
+
+    def search(self, query, top_k=20, nprobe=16):
+        """
+        Meilleures lignes dans les nprobe listes les plus proches de la question
+
+        Returns:
+            tuple: (lignes, scores approchés) triés par score décroissant
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        coarse_scores = self.centroids @ query
+        nprobe = min(nprobe, self.nlist)
+        probes = np.argpartition(-coarse_scores, nprobe - 1)[:nprobe]
+
+        # q.(c + r) = q.c + q.r : la table des résidus est commune à toutes les listes
+        slices = [slice(self.offsets[l], self.offsets[l + 1]) for l in probes]
+        sizes = [s.stop - s.start for s in slices]
+        if not sum(sizes):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        codes = np.concatenate([self.codes[s] for s in slices])
+        rows = np.concatenate([self.rows[s] for s in slices])
+        scores = self.pq.adc(codes, self.pq.lookup_table(query)) + np.repeat(coarse_scores[probes], sizes)
+
+        top_k = min(top_k, len(rows))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return rows[best], scores[best]
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                codebooks=self.pq.codebooks,
+                codes=self.codes,
+                rows=self.rows,
+                offsets=self.offsets
+            )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        codebooks = data['codebooks']
+        m, ksub, dsub = codebooks.shape
+        index = cls(m * dsub, len(data['centroids']), m, int(np.log2(ksub)))
+        index.centroids = data['centroids']
+        index.pq.codebooks = codebooks
+        index.codes = data['codes']
+        index.rows = data['rows']
+        index.offsets = data['offsets']
+        return index
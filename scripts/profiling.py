@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Profilage à la demande des recherches lentes
+Deux modes, enregistrés dans PROFILE_PATH avec la question et les durées par étape :
+  - cProfile pour une requête demandée explicitement (en-tête X-Profile: 1), seulement
+    avec PROFILE_ALLOW_REQUEST=true : profil déterministe (.prof lisible par
+    pstats/snakeviz) et résumé texte ;
+  - échantillonnage de pile pour toutes les requêtes quand PROFILE_SLOW_SECONDS > 0 :
+    un thread relève la pile des requêtes en cours toutes les PROFILE_SAMPLE_INTERVAL_MS,
+    seules les requêtes plus lentes que le seuil sont écrites (piles repliées, format
+    flamegraph.pl / speedscope).
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import itertools
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class Capture:
+    """Profil d'une requête : cProfile ou piles échantillonnées"""
+
+    def __init__(self, mode, forced):
+        self.mode = mode
+        self.forced = forced
+        self.profile = cProfile.Profile() if mode == 'cprofile' else None
+        self.stacks = Counter()
+        self.samples = 0
+
+
+def _collapse(frame):
+    """Pile repliée racine;...;feuille d'une frame Python"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class RequestProfiler:
+    """Profils des requêtes demandées ou lentes, un thread d'échantillonnage par processus"""
+
+    def __init__(self, path=None, slow_seconds=None, interval_ms=None, keep=None, allow_request=None):
+        self.path = path or os.getenv('PROFILE_PATH', '/opt/filemaker-ai-poc/IaGpt/data/profiles')
+        # Profil demandé par le client (cProfile + écriture disque) : opt-in, désactivé par défaut
+        self.allow_request = (os.getenv('PROFILE_ALLOW_REQUEST', 'false').lower() == 'true'
+                              if allow_request is None else allow_request)
+        self.slow_seconds = float(os.getenv('PROFILE_SLOW_SECONDS', '0') if slow_seconds is None else slow_seconds)
+        self.interval = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '10') if interval_ms is None else interval_ms) / 1000
+        self.keep = int(os.getenv('PROFILE_KEEP', '200') if keep is None else keep)
+        self._active = {}
+        self._pid = None
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    @property
+    def sampling(self):
+        return self.slow_seconds > 0
+
+    def _ensure_sampler(self):
+        """Le thread ne survit pas au fork des workers gunicorn : un par processus"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._active = {}
+                threading.Thread(target=self._sample, name='profile-sampler', daemon=True).start()
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, capture in list(self._active.items()):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    capture.stacks[_collapse(frame)] += 1
+                    capture.samples += 1
+
+    @contextmanager
+    def capture(self, force=False):
+        """
+        Profile le bloc si la requête le demande ou si le mode seuil est actif
+
+        Yields:
+            Capture: Profil en cours, None si la requête n'est pas profilée
+        """
+        if force:
+            capture = Capture('cprofile', forced=True)
+            try:
+                capture.profile.enable()
+            except ValueError:
+                # Un autre profileur déterministe est actif (requête concurrente) : échantillonnage
+                capture = Capture('sampling', forced=True)
+        elif self.sampling:
+            capture = Capture('sampling', forced=False)
+        else:
+            yield None
+            return
+
+        thread_id = threading.get_ident()
+        if capture.mode == 'sampling':
+            self._ensure_sampler()
+            self._active[thread_id] = capture
+        try:
+            yield capture
+        finally:
+            if capture.mode == 'cprofile':
+                capture.profile.disable()
+            else:
+                self._active.pop(thread_id, None)
+
+    def should_save(self, capture, elapsed):
+        return capture is not None and (capture.forced or elapsed >= self.slow_seconds)
+
+    def save(self, capture, elapsed, info):
+        """
+        Écrit le profil et ses métadonnées (question, durées)
+
+        Returns:
+            str: Nom de base des fichiers écrits, None en cas d'échec
+        """
+        # Horodatage en tête : l'ordre alphabétique est l'ordre chronologique (purge)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._sequence):05d}-" \
+               f"{'request' if capture.forced else 'slow'}"
+        base = os.path.join(self.path, name)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            if capture.mode == 'cprofile':
+                capture.profile.dump_stats(f"{base}.prof")
+                summary = io.StringIO()
+                pstats.Stats(capture.profile, stream=summary).sort_stats('cumulative').print_stats(40)
+                with open(f"{base}.txt", 'w', encoding='utf-8') as f:
+                    f.write(summary.getvalue())
+            else:
+                with open(f"{base}.folded", 'w', encoding='utf-8') as f:
+                    for stack, count in capture.stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+
+            with open(f"{base}.json", 'w', encoding='utf-8') as f:
+                json.dump(dict(info, mode=capture.mode, reason='request' if capture.forced else 'slow',
+                               elapsed_s=round(elapsed, 3), samples=capture.samples,
+                               sample_interval_ms=self.interval * 1000), f, ensure_ascii=False, indent=2)
+            self._prune()
+        except OSError as e:
+            logger.warning(f"⚠️ Profil non enregistré ({self.path}): {e}")
+            return None
+
+        logger.info(f"🔬 Profil {capture.mode} enregistré: {base} ({elapsed:.2f}s)")
+        return name
+
+    def _prune(self):
+        """Ne garde que les PROFILE_KEEP profils les plus récents"""
+        names = sorted({entry.rsplit('.', 1)[0] for entry in os.listdir(self.path)})
+        for name in names[:max(0, len(names) - self.keep)]:
+            for extension in ('prof', 'txt', 'folded', 'json'):
+                try:
+                    os.remove(os.path.join(self.path, f"{name}.{extension}"))
+                except FileNotFoundError:
+                    pass
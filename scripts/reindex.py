@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Ré-indexation du corpus avec un nouveau modèle d'embedding
+Construit une nouvelle version de l'index local à partir du texte des chunks déjà
+stockés dans FileMaker (sans repasser par les PDF), puis la rend active d'un coup :
+le service de recherche continue sur l'ancienne version jusqu'à la bascule.
+
+Usage: python reindex.py [modèle] [taille_lot] [--storage=float32|float16|int8] [--codec=ivfpq] [--no-activate]
+"""
+
+import os
+import sys
+import time
+import logging
+
+from filemaker_extractor import FileMakerExtractor
+from vector_index import IndexStore
+from encoders import load_encoder
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def reindex(extractor, store, model_name, batch_size=64, flush_size=2048, storage='float32', codec=None):
+    """
+    Ré-encode tous les chunks FileMaker dans une nouvelle version d'index
+
+    Args:
+        extractor (FileMakerExtractor): Session FileMaker ouverte
+        store (IndexStore): Dépôt des versions d'index
+        model_name (str): Modèle SentenceTransformer à utiliser (backend EMBEDDING_BACKEND)
+        batch_size (int): Taille des lots passés au modèle
+        flush_size (int): Nombre de chunks accumulés avant encodage
+        storage (str): Stockage des vecteurs de la version ('float32', 'float16', 'int8')
+        codec (str): 'ivfpq' pour construire l'index compressé (IVF_NLIST, PQ_SUBVECTORS)
+
+    Returns:
+        str: Version construite
+    """
+    logger.info(f"🤖 Chargement du modèle {model_name}...")
+    model = load_encoder(model_name)
+    builder = store.create_builder(model_name, model.get_sentence_embedding_dimension())
+
+    start = time.time()
+    texts, records = [], []
+
+    def flush():
+        vectors = model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+        builder.add(vectors, records)
+        elapsed = time.time() - start
+        logger.info(f"🧮 {builder.count} chunks encodés ({builder.count / elapsed:.1f} chunks/s)")
+        texts.clear()
+        records.clear()
+
+    try:
+        for chunk_record in extractor.iter_chunk_records():
+            field_data = chunk_record.get('fieldData', {})
+            text = field_data.get('Text', '').strip()
+            if not text:
+                continue
+
+            texts.append(text)
+            records.append({
+                'recordId': chunk_record.get('recordId'),
+                'idDocument': field_data.get('idDocument', ''),
+                'ChunkIndex': field_data.get('ChunkIndex'),
+                'Text': text
+            })
+            if len(texts) >= flush_size:
+                flush()
+
+        if texts:
+            flush()
+
+        codec_options = {
+            'nlist': int(os.getenv('IVF_NLIST', '0')) or None,
+            'm': int(os.getenv('PQ_SUBVECTORS', '0')) or None
+        }
+        builder.finalize(storage=storage, codec=codec, codec_options=codec_options,
+                         source='filemaker', elapsed=time.time() - start)
+    except BaseException:
+        builder.abort()
+        raise
+
+    logger.info(f"✅ Version {builder.version}: {builder.count} chunks en {time.time() - start:.1f}s")
+    return builder.version
+
+
+def main(model_name=None, batch_size=64, activate=True, storage=None, codec=None):
+    extractor = FileMakerExtractor()
+    model_name = model_name or os.getenv('EMBEDDING_MODEL', 'dangvantuan/sentence-camembert-large')
+    store = IndexStore(os.getenv('VECTOR_INDEX_PATH', '/opt/filemaker-ai-poc/IaGpt/data/index'))
+    storage = storage or os.getenv('VECTOR_INDEX_STORAGE', 'float32')
+    codec = codec or os.getenv('VECTOR_INDEX_CODEC') or None
+
+    if not extractor.login():
+        logger.error("❌ Connexion FileMaker échouée")
+        return None
+
+    try:
+        version = reindex(extractor, store, model_name, batch_size, storage=storage, codec=codec)
+    except Exception as e:
+        logger.error(f"❌ Ré-indexation échouée, index actif inchangé: {str(e)}")
+        return None
+    finally:
+        extractor.logout()
+
+    if activate:
+        store.activate(version)
+        store.prune(keep=2)
+    else:
+        logger.info(f"⏸️ Version {version} prête, non activée")
+
+    return version
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    options = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+    main(
+        args[0] if args else None,
+        int(args[1]) if len(args) > 1 else 64,
+        activate='--no-activate' not in sys.argv,
+        storage=options.get('storage'),
+        codec=options.get('codec')
+    )
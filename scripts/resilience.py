@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Politique d'appel du Data API FileMaker : délais par type d'appel, nouvelles tentatives
+avec backoff exponentiel et jitter, disjoncteur partagé par le processus
+Sous charge, FileMaker Server renvoie des erreurs transitoires et des timeouts : les
+appels sont retentés dans un budget de temps borné, puis le disjoncteur s'ouvre après
+plusieurs échecs consécutifs et les appels suivants sont refusés sans réseau pendant
+FILEMAKER_BREAKER_COOLDOWN secondes (un seul appel d'essai ensuite).
+"""
+
+import os
+import time
+import random
+import threading
+
+# Délais de lecture par défaut (secondes), surchargés par FILEMAKER_TIMEOUT_<APPEL>
+ENDPOINT_TIMEOUTS = {
+    'login': 10,
+    'logout': 5,
+    'ping': 5,
+    'find': 30,
+    'records': 120,
+    'create': 30,
+    'update': 30,
+    'metadata': 10,
+    'delete': 30,
+    'container': 60
+}
+
+# Surcharge momentanée : la requête n'a pas été traitée, elle peut être renvoyée
+TRANSIENT_STATUS = {429, 502, 503, 504}
+# Codes FileMaker transitoires : enregistrement verrouillé, capacité de l'hôte dépassée
+TRANSIENT_CODES = {'301', '812'}
+
+
+class FileMakerUnavailable(ConnectionError):
+    """Disjoncteur ouvert : FileMaker jugé indisponible, la requête n'est pas envoyée"""
+
+
+def endpoint_timeout(endpoint):
+    """Délai (connexion, lecture) d'un type d'appel"""
+    connect = float(os.getenv('FILEMAKER_CONNECT_TIMEOUT', '3'))
+    read = float(os.getenv(f'FILEMAKER_TIMEOUT_{endpoint.upper()}', ENDPOINT_TIMEOUTS.get(endpoint, 30)))
+    return connect, read
+
+
+def is_transient(status, code=None):
+    """Réponse d'un serveur surchargé, à retenter"""
+    return status in TRANSIENT_STATUS or (status >= 500 and code in TRANSIENT_CODES)
+
+
+class RetryPolicy:
+    """Backoff exponentiel à jitter complet, dans un budget de temps par appel"""
+
+    def __init__(self, retries=None, base=None, cap=None, budget=None):
+        self.retries = int(os.getenv('FILEMAKER_RETRIES', '2') if retries is None else retries)
+        self.base = float(os.getenv('FILEMAKER_BACKOFF_BASE', '0.25') if base is None else base)
+        self.cap = float(os.getenv('FILEMAKER_BACKOFF_MAX', '4') if cap is None else cap)
+        self.budget = float(os.getenv('FILEMAKER_RETRY_BUDGET', '20') if budget is None else budget)
+
+    def delay(self, attempt):
+        """Attente avant la tentative attempt + 1 : uniforme dans [0, min(cap, base * 2^attempt)]"""
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur fermé / ouvert / semi-ouvert
+
+    Fermé : tout passe, les échecs consécutifs sont comptés. Ouvert : tout est refusé
+    jusqu'à la fin du délai de refroidissement. Semi-ouvert : un seul appel d'essai,
+    dont le résultat referme ou rouvre le circuit.
+    """
+
+    def __init__(self, failures=None, cooldown=None):
+        self.failure_threshold = int(os.getenv('FILEMAKER_BREAKER_FAILURES', '5') if failures is None else failures)
+        self.cooldown = float(os.getenv('FILEMAKER_BREAKER_COOLDOWN', '30') if cooldown is None else cooldown)
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return 'open'
+        return 'half_open'
+
+    def retry_after(self):
+        """Secondes avant le prochain appel d'essai (0 si le circuit n'est pas ouvert)"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def allow(self):
+        """Vrai si l'appel peut être envoyé"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        """
+        Returns:
+            bool: True si cet échec ouvre le circuit
+        """
+        with self._lock:
+            self.failures += 1
+            reopen = self._probing or (self.opened_at is None and self.failures >= self.failure_threshold)
+            self._probing = False
+            if reopen:
+                self.opened_at = time.monotonic()
+            return reopen
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(server):
+    """Disjoncteur du serveur, partagé par toutes les sessions du processus"""
+    with _breakers_lock:
+        breaker = _breakers.get(server)
+        if breaker is None:
+            breaker = _breakers[server] = CircuitBreaker()
+        return breaker
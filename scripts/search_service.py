@@ -1,54 +1,204 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import sys
 import os
 import locale
 import json
+import time
+import logging
+import threading
+import contextvars
 import requests
 import numpy as np
+from dotenv import load_dotenv
 
-# Configuration locale
-locale.setlocale(locale.LC_ALL, 'fr_FR.UTF-8')
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# torch / sentence-transformers / onnxruntime ne sont importés qu'au chargement du modèle
 from scripts.filemaker_extractor import FileMakerExtractor
-from sentence_transformers import SentenceTransformer
+from scripts.vector_index import IndexStore
+from scripts.encoders import load_encoder
+from scripts import metrics
+from scripts.profiling import RequestProfiler
+
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'config.env'))
 
 app = Flask(__name__)
+logger = logging.getLogger(__name__)
+
+# Diagnostic détaillé pour la requête courante ({"debug": true} ou en-tête X-Debug: 1)
+_request_debug = contextvars.ContextVar('rag_request_debug', default=False)
+
+WARMUP_QUESTION = "Quel est le prix de souscription de la SCPI ?"
+
+OLLAMA_SERVER = os.getenv('OLLAMA_SERVER', 'http://localhost:11434').rstrip('/')
+OLLAMA_GENERATE_MODEL = os.getenv('OLLAMA_GENERATE_MODEL', 'mistral:7b-instruct')
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par message, avec les champs passés dans extra={'fields': {...}}"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def configure_logging():
+    """Niveau (LOG_LEVEL) et format texte ou JSON (LOG_FORMAT) des logs du service"""
+    handler = logging.StreamHandler()
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+    # Une dizaine de lignes INFO par recherche côté Data API : visibles seulement sur demande
+    logging.getLogger('scripts.filemaker_extractor').setLevel(os.getenv('FILEMAKER_LOG_LEVEL', 'WARNING').upper())
+
+
+def debug_enabled():
+    """Diagnostic actif : drapeau de la requête ou niveau DEBUG global"""
+    return _request_debug.get() or logger.isEnabledFor(logging.DEBUG)
+
+
+def diag(message):
+    """Ligne de diagnostic : INFO pour une requête en debug, DEBUG sinon (ignorée en production)"""
+    if _request_debug.get():
+        logger.info(message)
+    else:
+        logger.debug(message)
+
+
+def configure_locale():
+    """Configuration locale française (absente de certaines images : non bloquant)"""
+    try:
+        locale.setlocale(locale.LC_ALL, 'fr_FR.UTF-8')
+    except locale.Error as e:
+        logger.warning(f"⚠️ Locale fr_FR.UTF-8 indisponible: {e}")
 
 
 class RAGSearcher:
     """Service de recherche RAG avec FileMaker et IA"""
 
     def __init__(self):
-        print("🔧 Initialisation du service RAG...")
-        self.model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        print("✅ Modèle d'embedding chargé")
+        logger.info("🔧 Initialisation du service RAG...")
+        self.index_store = IndexStore(os.getenv('VECTOR_INDEX_PATH', '/opt/filemaker-ai-poc/IaGpt/data/index'))
+        self.index_check_interval = float(os.getenv('INDEX_CHECK_INTERVAL', '30'))
+        self.index_retrieval_k = int(os.getenv('INDEX_RETRIEVAL_TOP_K', '0'))
+        # Chunks cherchés dans l'index local quand FileMaker est indisponible
+        self.fallback_retrieval_k = int(os.getenv('INDEX_FALLBACK_TOP_K', '50'))
+        # Champ du modèle d'embedding des chunks (vide : vecteurs supposés compatibles)
+        self.model_field = os.getenv('CHUNKS_MODEL_FIELD', 'EmbeddingModel')
+        self.profiler = RequestProfiler()
+
+        # (index, modèle, identifiant du modèle) : renseigné par load(), remplacé d'un bloc à chaque bascule
+        self.active = (None, None, None)
+        self._index_checked_at = time.monotonic()
+        self._index_switch = threading.Lock()
+
+    def load_index(self):
+        """Version active de l'index local, None si absente ou illisible"""
+        try:
+            index = self.index_store.load_current()
+        except Exception as e:
+            logger.warning(f"⚠️ Index local illisible, recherche sur EmbeddingJson: {e}")
+            return None
+
+        if index:
+            logger.info(f"✅ Index local: version {index.version} ({index.count} chunks)")
+        return index
+
+    def load_model(self, index):
+        """Le modèle de la question est toujours celui de l'index actif"""
+        model_name = index.model if index else os.getenv('EMBEDDING_MODEL', 'dangvantuan/sentence-camembert-large')
+        model = load_encoder(model_name)
+        logger.info(f"✅ Modèle d'embedding chargé: {model_name}")
+        return model, model_name
+
+    def warmup(self):
+        """Premier encodage (allocations, optimisation du graphe) et pages de l'index chargées"""
+        index, model, _ = self.active
+        question_vec = model.encode([WARMUP_QUESTION])[0]
+        if index is not None and index.count:
+            index.search(question_vec, 1)
+
+    @property
+    def model(self):
+        return self.active[1]
+
+    def refresh_index(self):
+        """Détecte une nouvelle version d'index et la charge en arrière-plan"""
+        now = time.monotonic()
+        if now - self._index_checked_at < self.index_check_interval:
+            return
+        self._index_checked_at = now
+
+        version = self.index_store.current_version()
+        index = self.active[0]
+        if version is None or (index is not None and index.version == version):
+            return
+
+        # Une seule bascule à la fois ; les requêtes continuent sur l'ancienne version
+        if self._index_switch.acquire(blocking=False):
+            threading.Thread(target=self._switch_index, args=(version,), daemon=True).start()
+
+    def _switch_index(self, version):
+        """Charge la nouvelle version (et son modèle) puis remplace l'état actif en une affectation"""
+        try:
+            new_index = self.index_store.load(version)
+            _, model, model_name = self.active
+            if new_index.model != model_name:
+                logger.info(f"🔄 Chargement du modèle {new_index.model} pour l'index {version}...")
+                model = load_encoder(new_index.model)
+                model_name = new_index.model
+
+            self.active = (new_index, model, model_name)
+            logger.info(f"🔀 Bascule vers l'index {version} ({new_index.count} chunks, modèle {model_name})")
+        except Exception as e:
+            logger.error(f"❌ Bascule vers l'index {version} échouée: {e}")
+        finally:
+            self._index_switch.release()
 
 
     def connect_filemaker(self):
         """Établit une connexion fraîche à FileMaker"""
         extractor = FileMakerExtractor()
         if extractor.connect():
-            print("✅ Connexion FileMaker établie")
+            diag("✅ Connexion FileMaker établie")
             return extractor
         else:
-            print("❌ Échec connexion FileMaker")
+            logger.error("❌ Échec connexion FileMaker")
             return None
 
     def enhanced_search(self, extractor, question):
         """Recherche élargie pour questions comparatives"""
-        print(f"🔍 Enhanced search pour: '{question}'")
+        diag(f"🔍 Enhanced search pour: '{question}'")
+
+        # Avec un index local, EmbeddingJson n'est relu que pour les chunks qu'il ne contient pas
+        index = self.active[0]
+        embeddings = index is None
 
         # Recherche normale d'abord
-        chunks_direct = extractor.search_chunks_smart(question, limit=500)
+        chunks_direct = extractor.search_chunks_smart(question, limit=500, embeddings=embeddings)
 
         # Si question comparative, recherche élargie
         comparative_words = ["plus grand", "meilleur", "plus petit", "maximum", "minimum", "compare"]
         if any(word in question.lower() for word in comparative_words):
-            print("🔍 Question comparative détectée - recherche élargie")
+            diag("🔍 Question comparative détectée - recherche élargie")
             # Recherche avec mots-clés génériques
-            chunks_broad = extractor.search_chunks_smart("capital montant valeur prix", limit=500)
+            chunks_broad = extractor.search_chunks_smart("capital montant valeur prix", limit=500,
+                                                         embeddings=embeddings)
 
             # Combinaison et déduplication par recordId
             seen_ids = set()
@@ -60,239 +210,354 @@ class RAGSearcher:
                     seen_ids.add(record_id)
                     combined_chunks.append(chunk)
 
-            print(f"✅ {len(combined_chunks)} chunks uniques après déduplication")
-            return combined_chunks[:1000]
+            diag(f"✅ {len(combined_chunks)} chunks uniques après déduplication")
+            return self.complete_embeddings(extractor, combined_chunks[:1000], index)
+
+        return self.complete_embeddings(extractor, chunks_direct, index)
+
+    def complete_embeddings(self, extractor, chunks, index):
+        """Chunks absents de l'index local relus avec leur EmbeddingJson (réponse réduite de FileMaker)"""
+        if index is None or not extractor.search_layout or not chunks:
+            return chunks
+
+        indexed = index.rows_for_records([chunk.get('recordId') for chunk in chunks])
+        missing = [chunk for chunk in chunks if str(chunk.get('recordId')) not in indexed]
+        if not missing:
+            return chunks
 
-        return chunks_direct
+        with metrics.span('filemaker_embeddings'):
+            full = {str(record.get('recordId')): record for record in extractor.get_chunks_with_embeddings(missing)}
+        diag(f"📥 {len(full)}/{len(missing)} chunks hors index relus avec leur embedding")
+        return [full.get(str(chunk.get('recordId')), chunk) for chunk in chunks]
 
-    def search(self, question):
-        """Recherche principale avec gestion complète et timing"""
-        import time
+    def search(self, question, debug=False, profile=False):
+        """
+        Recherche principale avec gestion complète et timing
 
-        # 🚀 TIMER GLOBAL
-        total_start = time.time()
+        Args:
+            debug (bool): Diagnostic détaillé (scoring de contrôle, extraits) pour cette requête
+            profile (bool): Profil cProfile de cette requête, enregistré dans PROFILE_PATH
+                (ignoré sans PROFILE_ALLOW_REQUEST=true)
+        """
+        token = _request_debug.set(debug)
+        try:
+            if profile and not self.profiler.allow_request:
+                diag("🔒 Profil demandé ignoré (PROFILE_ALLOW_REQUEST désactivé)")
+                profile = False
+            with metrics.trace() as trace, self.profiler.capture(force=profile) as capture:
+                result = self._search(question, trace)
+        finally:
+            _request_debug.reset(token)
+
+        total_time = trace.elapsed()
+        status = result.get('status', 'unknown')
+        metrics.REQUESTS.labels(status).inc()
+        metrics.REQUEST_SECONDS.labels(status).observe(total_time)
+        metrics.flush()
+
+        stages = trace.stages
+        result["timing"] = {
+            "total": f"{total_time:.2f}s",
+            "connexion": f"{stages.get('filemaker_session', 0.0):.2f}s",
+            "recherche_textuelle": f"{stages.get('text_search', 0.0):.2f}s",
+            "calcul_similarites": f"{stages.get('similarity', 0.0):.2f}s",
+            "generation_ia": f"{stages.get('context', 0.0) + stages.get('generation', 0.0):.2f}s"
+        }
+        if 'debug' in stages:
+            result["timing"]["debug"] = f"{stages['debug']:.2f}s"
+        result["stages_ms"] = trace.timings_ms()
+
+        # Requête demandée ou plus lente que PROFILE_SLOW_SECONDS : profil conservé
+        if self.profiler.should_save(capture, total_time):
+            saved = self.profiler.save(capture, total_time, {
+                'question': question,
+                'status': status,
+                'chunks_analyzed': result.get('chunks_analyzed', 0),
+                'timing': result["timing"],
+                'stages_ms': result["stages_ms"]
+            })
+            if saved and profile:
+                result["profile"] = saved
+
+        logger.info(
+            f"🔍 Recherche {status} en {total_time:.2f}s ({result.get('chunks_analyzed', 0)} chunks)",
+            extra={'fields': {
+                'event': 'search',
+                'status': status,
+                'question': question,
+                'total_ms': round(total_time * 1000, 1),
+                'chunks_analyzed': result.get('chunks_analyzed', 0),
+                'stages_ms': result["stages_ms"]
+            }}
+        )
+        return result
+
+    def _search(self, question, trace):
+        """Étapes de la recherche, chacune chronométrée dans la trace de la requête"""
         extractor = None
 
         try:
-            print(f"⏰ DÉBUT recherche: '{question}'")
+            diag(f"⏰ DÉBUT recherche: '{question}'")
+            self.refresh_index()
 
             # 1️⃣ CONNEXION FILEMAKER
-            conn_start = time.time()
-            extractor = self.connect_filemaker()
-            conn_time = time.time() - conn_start
-            print(f"📡 Connexion FileMaker: {conn_time:.2f}s")
+            with metrics.span('filemaker_session'):
+                extractor = self.connect_filemaker()
+            diag(f"📡 Connexion FileMaker: {trace.stages['filemaker_session']:.2f}s")
 
-            if not extractor:
+            # FileMaker indisponible (disjoncteur ouvert, connexion refusée) : index local seul
+            degraded = extractor is None
+            if degraded and self.active[0] is None:
                 return self.error_response(question, "Impossible de se connecter à la base de données")
 
             # 2️⃣ RECHERCHE TEXTUELLE PRÉALABLE
-            search_start = time.time()
-            print(f"🔍 Phase 1: Recherche textuelle...")
-            raw_chunks = self.enhanced_search(extractor, question)
-            search_time = time.time() - search_start
-            print(f"🔍 Recherche textuelle: {search_time:.2f}s")
-
-            if not raw_chunks:
-                print("❌ Aucun chunk trouvé")
+            raw_chunks = []
+            if not degraded:
+                diag(f"🔍 Phase 1: Recherche textuelle...")
+                with metrics.span('text_search'):
+                    raw_chunks = self.enhanced_search(extractor, question)
+                diag(f"🔍 Recherche textuelle: {trace.stages['text_search']:.2f}s")
+                degraded = not raw_chunks and extractor.breaker.state != 'closed' and self.active[0] is not None
+
+            if degraded:
+                logger.warning("⛔ FileMaker indisponible: recherche sur l'index local seul")
+            elif not raw_chunks and not (self.index_retrieval_k and self.active[0] is not None):
+                diag("❌ Aucun chunk trouvé")
                 return self.empty_response(question, "Aucune information trouvée dans la base de données")
 
-            print(f"📊 {len(raw_chunks)} chunks trouvés par recherche textuelle")
+            diag(f"📊 {len(raw_chunks)} chunks trouvés par recherche textuelle")
 
             # 3️⃣ CALCUL SIMILARITÉS SÉMANTIQUES
-            similarity_start = time.time()
-            print(f"🧮 Phase 2: Calcul des similarités...")
-            top_chunks = self.calculate_similarities(question, raw_chunks)
-            similarity_time = time.time() - similarity_start
-            print(f"🧮 Calcul similarités: {similarity_time:.2f}s")
-
-            # DEBUG - TOP 3 CHUNKS TROUVÉS
-            print("🔍 DEBUG - TOP 3 CHUNKS TROUVÉS :")
-            for i, chunk in enumerate(top_chunks[:3]):
-                chunk_data = chunk['fieldData'] if 'fieldData' in chunk else chunk
-                print(f"  Chunk {i + 1}: Doc {chunk_data.get('idDocument', 'N/A')}")
-                print(f"    Similarité: {chunk.get('similarity', 'N/A'):.4f}")
-                print(f"    Texte (50 chars): '{chunk_data.get('Text', '')[:50]}...'")
-                print(f"    A des embeddings: {'OUI' if chunk_data.get('EmbeddingJson') else 'NON'}")
-                print()
+            diag(f"🧮 Phase 2: Calcul des similarités...")
+            with metrics.span('similarity'):
+                top_chunks = self.calculate_similarities(
+                    question, raw_chunks, retrieval_k=self.fallback_retrieval_k if degraded else None)
+            diag(f"🧮 Calcul similarités: {trace.stages['similarity']:.2f}s")
 
             if not top_chunks:
                 return self.empty_response(question, "Aucun chunk avec embedding valide trouvé")
 
-            # 4️⃣ DEBUG DES CHUNKS SÉLECTIONNÉS
-            debug_start = time.time()
-            self.debug_chunks(top_chunks[:5], question)
-            debug_time = time.time() - debug_start
-            print(f"🔍 Debug chunks: {debug_time:.2f}s")
+            # 4️⃣ DEBUG DES CHUNKS SÉLECTIONNÉS (uniquement sur demande)
+            if debug_enabled():
+                with metrics.span('debug'):
+                    diag("🔍 DEBUG - TOP 3 CHUNKS TROUVÉS :")
+                    for i, chunk in enumerate(top_chunks[:3]):
+                        diag(f"  Chunk {i + 1}: Doc {chunk['document_id']} - similarité {chunk['similarity']:.4f} - "
+                             f"'{chunk['text'][:50]}...'")
+                    self.debug_chunks(top_chunks[:5], question)
+                diag(f"🔍 Debug chunks: {trace.stages['debug']:.2f}s")
 
             # 5️⃣ GÉNÉRATION DE LA RÉPONSE
-            ai_start = time.time()
-            context = self.prepare_context(top_chunks[:5])
-            response = self.generate_answer(question, context)
-            ai_time = time.time() - ai_start
-            print(f"🤖 Génération IA: {ai_time:.2f}s")
-
-            # 6️⃣ TEMPS TOTAL
-            total_time = time.time() - total_start
-            print(f"⏱️ TEMPS TOTAL: {total_time:.2f}s")
+            with metrics.span('context'):
+                context = self.prepare_context(top_chunks[:5])
+            with metrics.span('generation'):
+                response = self.generate_answer(question, context)
+            diag(f"🤖 Génération IA: {trace.stages['generation']:.2f}s")
 
-            # 7️⃣ RÉSULTAT FINAL AVEC TIMING
+            # 6️⃣ RÉSULTAT FINAL (durées ajoutées par search())
             result = {
                 "question": question,
                 "response": response,
                 "sources": [chunk['document_name'] for chunk in top_chunks[:5]],
                 "chunks_analyzed": len(top_chunks),
-                "status": "success",
-                "timing": {
-                    "total": f"{total_time:.2f}s",
-                    "connexion": f"{conn_time:.2f}s",
-                    "recherche_textuelle": f"{search_time:.2f}s",
-                    "calcul_similarites": f"{similarity_time:.2f}s",
-                    "debug": f"{debug_time:.2f}s",
-                    "generation_ia": f"{ai_time:.2f}s"
-                }
+                "status": "success"
             }
-
+            if degraded:
+                result["degraded"] = True
             return result
 
         except Exception as e:
-            total_time = time.time() - total_start
-            print(f"❌ ERREUR après {total_time:.2f}s: {e}")
+            logger.error(f"❌ ERREUR après {trace.elapsed():.2f}s: {e}")
             return self.error_response(question, f"Erreur interne: {str(e)}")
 
         finally:
-            # 8️⃣ NETTOYAGE
+            # 7️⃣ NETTOYAGE
             if extractor:
-                logout_start = time.time()
-                extractor.logout()
-                logout_time = time.time() - logout_start
-                print(f"🔌 Déconnexion: {logout_time:.2f}s")
+                with metrics.span('filemaker_logout'):
+                    extractor.logout()
+                diag(f"🔌 Déconnexion: {trace.stages['filemaker_logout']:.2f}s")
+
+    def calculate_similarities(self, question, raw_chunks, top_k=20, retrieval_k=None):
+        """
+        Calcule les similarités sémantiques avec debug détaillé
 
-    def calculate_similarities(self, question, raw_chunks, top_k=20):
-        """Calcule les similarités sémantiques avec debug détaillé"""
-        print(f"\n🔍 DEBUG CALCULATE_SIMILARITIES")
-        print(f"📊 Nombre de chunks reçus: {len(raw_chunks)}")
+        Args:
+            retrieval_k (int, optional): Chunks cherchés directement dans l'index local
+                (défaut: INDEX_RETRIEVAL_TOP_K)
+        """
+        if retrieval_k is None:
+            retrieval_k = self.index_retrieval_k
+        diag(f"📊 Nombre de chunks reçus: {len(raw_chunks)}")
+
+        # Index, modèle et identifiant lus une seule fois : cohérents même pendant une bascule
+        index, model, model_name = self.active
 
         # Embedding de la question
-        question_embedding = self.model.encode([question])
+        with metrics.span('encode'):
+            question_embedding = model.encode([question])
         question_vec = question_embedding[0]
-        print(f"🧮 Question embedding shape: {len(question_vec)}")
+        diag(f"🧮 Question embedding shape: {len(question_vec)}")
 
         similarities = []
-        processed = 0
-        errors = 0
+        if debug_enabled():
+            self.debug_embeddings(raw_chunks[:5], question_vec)
+
+        # Vecteurs de l'index local (même modèle que la question) pour les chunks qu'il contient
+        index_scores = {}
+        if index is not None:
+            with metrics.span('scoring'):
+                rows_by_record = index.rows_for_records([chunk.get('recordId') for chunk in raw_chunks])
+                if rows_by_record:
+                    record_ids = list(rows_by_record)
+                    scores = index.score(question_vec, [rows_by_record[record_id] for record_id in record_ids])
+                    index_scores = dict(zip(record_ids, scores.tolist()))
+            diag(f"📚 {len(index_scores)}/{len(raw_chunks)} chunks scorés depuis l'index {index.version}")
+
+        skipped_model = 0
+        skipped_dimension = 0
+
+        # Candidats [données, texte, document, similarité] ; les chunks hors index sont
+        # décodés ici puis scorés ensemble en une multiplication matricielle
+        candidates = []
+        pending = []
+        embeddings = []
+
+        with metrics.span('json_decode'):
+            for chunk_record in raw_chunks:
+                try:
+                    chunk_data = chunk_record['fieldData'] if 'fieldData' in chunk_record else chunk_record
+                    text = chunk_data.get('Text', '').strip()
+                    doc_id = chunk_data.get('idDocument', 'N/A')
+
+                    if not text:
+                        continue
 
-        for i, chunk_record in enumerate(raw_chunks[:5]):  # Debug sur les 5 premiers
-            try:
-                print(f"\n--- CHUNK {i + 1} DEBUG ---")
+                    similarity = index_scores.get(str(chunk_record.get('recordId')))
+                    if similarity is None:
+                        embedding_json = chunk_data.get('EmbeddingJson', '').strip()
+                        if not embedding_json:
+                            continue
 
-                # Extraction des données du chunk
-                chunk_data = chunk_record['fieldData'] if 'fieldData' in chunk_record else chunk_record
-                print(f"📄 Record ID: {chunk_record.get('recordId')}")
-                print(f"📄 Chunk data keys: {list(chunk_data.keys())}")
+                        # Vecteur produit par un autre modèle : non comparable
+                        embedding_model = chunk_data.get(self.model_field) if self.model_field else None
+                        if embedding_model and embedding_model != model_name:
+                            skipped_model += 1
+                            continue
 
-                text = chunk_data.get('Text', '').strip()
-                embedding_json = chunk_data.get('EmbeddingJson', '')
-                doc_id = chunk_data.get('idDocument', 'N/A')
+                        # Parsing de l'embedding
+                        chunk_embedding = np.array(json.loads(embedding_json)) if isinstance(embedding_json, str) else np.array(
+                            embedding_json)
+
+                        if chunk_embedding.ndim != 1 or len(chunk_embedding) != len(question_vec):
+                            skipped_dimension += 1
+                            continue
 
-                print(f"📝 Text présent: {'OUI' if text else 'NON'} ({len(text)} chars)")
-                print(f"🧮 EmbeddingJson type: {type(embedding_json)}")
-                print(f"🧮 EmbeddingJson présent: {'OUI' if embedding_json else 'NON'}")
+                        pending.append(len(candidates))
+                        embeddings.append(chunk_embedding)
 
-                if embedding_json:
-                    print(f"🧮 EmbeddingJson length: {len(str(embedding_json))} caractères")
-                    print(f"🧮 EmbeddingJson preview: {str(embedding_json)[:100]}...")
+                    candidates.append([chunk_data, text, doc_id, similarity])
 
-                    # Test de parsing
-                    if isinstance(embedding_json, str):
-                        print("🔧 Tentative de parsing JSON string...")
-                        chunk_embedding = np.array(json.loads(embedding_json))
-                    else:
-                        print("🔧 Déjà un objet, conversion directe...")
-                        chunk_embedding = np.array(embedding_json)
+                except (json.JSONDecodeError, ValueError, KeyError, TypeError):
+                    continue
 
-                    print(f"✅ Embedding parsé OK, shape: {chunk_embedding.shape}")
+        with metrics.span('scoring'):
+            if embeddings:
+                # Similarité cosinus de tous les chunks hors index en une passe
+                matrix = np.vstack(embeddings)
+                scores = (matrix @ question_vec) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(question_vec))
+                for position, score in zip(pending, scores.tolist()):
+                    candidates[position][3] = score
 
-                    # Validation des dimensions
-                    if len(chunk_embedding) != len(question_vec):
-                        print(f"❌ ERREUR DIMENSION: chunk={len(chunk_embedding)} vs question={len(question_vec)}")
-                        continue
+            for chunk_data, text, doc_id, similarity in candidates:
+                similarities.append({
+                    'similarity': float(similarity),
+                    'text': text,
+                    'document_id': doc_id,
+                    'document_name': f"Doc_{doc_id}",
+                    'raw_data': chunk_data
+                })
 
-                    # Calcul de similarité cosinus
-                    similarity = np.dot(question_vec, chunk_embedding) / (
-                            np.linalg.norm(question_vec) * np.linalg.norm(chunk_embedding)
-                    )
-                    print(f"🎯 Similarité calculée: {similarity:.6f}")
-
-                    similarities.append({
-                        'similarity': float(similarity),
-                        'text': text,
-                        'document_id': doc_id,
-                        'document_name': f"Doc_{doc_id}",
-                        'raw_data': chunk_data
-                    })
-                    processed += 1
-
-                else:
-                    print(f"❌ Pas d'embedding - SKIPPÉ")
-
-            except json.JSONDecodeError as e:
-                print(f"❌ Erreur JSON parsing: {e}")
-                errors += 1
-            except Exception as e:
-                print(f"❌ Erreur générale: {e}")
-                errors += 1
+        # Recherche sémantique directe dans l'index (IVF-PQ sur les gros corpus) : chunks
+        # pertinents que la recherche textuelle FileMaker n'a pas remontés
+        if index is not None and retrieval_k:
+            seen = {str(chunk.get('recordId')) for chunk in raw_chunks}
+            with metrics.span('index_search'):
+                hits = index.search(question_vec, retrieval_k)
+                records = index.records([row for row, _ in hits])
+            added = 0
+            for (row, similarity), record in zip(hits, records):
+                if record is None or record['recordId'] in seen:
+                    continue
+                similarities.append({
+                    'similarity': similarity,
+                    'text': record['Text'],
+                    'document_id': record['idDocument'],
+                    'document_name': f"Doc_{record['idDocument']}",
+                    'raw_data': record
+                })
+                added += 1
+            diag(f"📚 {added} chunks ajoutés par recherche sémantique dans l'index {index.version}")
 
-        print(f"\n📊 RÉSUMÉ DEBUG:")
-        print(f"   ✅ Traités avec succès: {processed}")
-        print(f"   ❌ Erreurs: {errors}")
+        if skipped_model or skipped_dimension:
+            logger.warning(f"⚠️ Chunks ignorés (modèle ≠ {model_name}): {skipped_model} par étiquette, "
+                  f"{skipped_dimension} par dimension")
 
-        # Continuez le traitement pour TOUS les chunks (pas juste les 5 premiers)
-        print(f"\n🔄 TRAITEMENT COMPLET DE TOUS LES CHUNKS...")
+        if not similarities:
+            diag("❌ AUCUNE SIMILARITÉ CALCULÉE")
+            return []
+
+        # Tri par similarité décroissante
+        with metrics.span('rerank'):
+            similarities.sort(key=lambda x: x['similarity'], reverse=True)
+            top_chunks = similarities[:top_k]
 
-        for chunk_record in raw_chunks:
+        diag(f"🎯 Top {len(top_chunks)} chunks sélectionnés sur {len(similarities)} total")
+        return top_chunks
+
+    def debug_embeddings(self, chunks, question_vec):
+        """Contrôle détaillé du décodage et du scoring des premiers chunks (diagnostic seulement)"""
+        processed = 0
+        errors = 0
+
+        for i, chunk_record in enumerate(chunks, 1):
             try:
                 chunk_data = chunk_record['fieldData'] if 'fieldData' in chunk_record else chunk_record
                 text = chunk_data.get('Text', '').strip()
-                embedding_json = chunk_data.get('EmbeddingJson', '').strip()
-                doc_id = chunk_data.get('idDocument', 'N/A')
+                embedding_json = chunk_data.get('EmbeddingJson', '')
 
-                if not text or not embedding_json:
+                diag(f"--- CHUNK {i} DEBUG ---")
+                diag(f"📄 Record ID: {chunk_record.get('recordId')} - champs: {list(chunk_data.keys())}")
+                diag(f"📝 Text présent: {'OUI' if text else 'NON'} ({len(text)} chars)")
+
+                if not embedding_json:
+                    diag("❌ Pas d'embedding - SKIPPÉ")
                     continue
 
-                # Parsing de l'embedding
+                diag(f"🧮 EmbeddingJson {type(embedding_json).__name__}, {len(str(embedding_json))} caractères: "
+                     f"{str(embedding_json)[:100]}...")
                 chunk_embedding = np.array(json.loads(embedding_json)) if isinstance(embedding_json, str) else np.array(
                     embedding_json)
+                diag(f"✅ Embedding parsé OK, shape: {chunk_embedding.shape}")
+
+                if len(chunk_embedding) != len(question_vec):
+                    diag(f"❌ ERREUR DIMENSION: chunk={len(chunk_embedding)} vs question={len(question_vec)}")
+                    continue
 
-                # Calcul de similarité
                 similarity = np.dot(question_vec, chunk_embedding) / (
                         np.linalg.norm(question_vec) * np.linalg.norm(chunk_embedding)
                 )
+                diag(f"🎯 Similarité calculée: {similarity:.6f}")
+                processed += 1
 
-                similarities.append({
-                    'similarity': float(similarity),
-                    'text': text,
-                    'document_id': doc_id,
-                    'document_name': f"Doc_{doc_id}",
-                    'raw_data': chunk_data
-                })
-
-            except (json.JSONDecodeError, ValueError, KeyError):
-                continue
-
-        if not similarities:
-            print("❌ AUCUNE SIMILARITÉ CALCULÉE")
-            return []
-
-        # Tri par similarité décroissante
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
-        top_chunks = similarities[:top_k]
+            except Exception as e:
+                diag(f"❌ Erreur: {e}")
+                errors += 1
 
-        print(f"🎯 Top {len(top_chunks)} chunks sélectionnés sur {len(similarities)} total")
-        return top_chunks
+        diag(f"📊 RÉSUMÉ DEBUG: {processed} traités, {errors} erreurs")
 
     def debug_chunks(self, chunks, question):
         """Affiche le debug des chunks sélectionnés"""
-        print(f"\n🔍 DEBUG - TOP {len(chunks)} CHUNKS:")
+        diag(f"🔍 DEBUG - TOP {len(chunks)} CHUNKS:")
 
         # Mots-clés de recherche pour le debug
         question_words = question.lower().split()
@@ -302,21 +567,20 @@ class RAGSearcher:
             similarity = chunk['similarity']
             doc_name = chunk['document_name']
 
-            print(f"--- CHUNK {i} ---")
-            print(f"📄 Document: {doc_name}")
-            print(f"🎯 Similarité: {similarity:.4f}")
-            print(f"📝 Extrait: {text_preview}...")
+            diag(f"--- CHUNK {i} ---")
+            diag(f"📄 Document: {doc_name}")
+            diag(f"🎯 Similarité: {similarity:.4f}")
+            diag(f"📝 Extrait: {text_preview}...")
 
             # Recherche de mots-clés dans le texte
             text_lower = chunk['text'].lower()
             keywords_found = [word for word in question_words if word in text_lower and len(word) > 2]
 
             if keywords_found:
-                print(f"🔍 Mots-clés trouvés: {keywords_found}")
+                diag(f"🔍 Mots-clés trouvés: {keywords_found}")
             else:
-                print(f"⚠️  Aucun mot-clé direct trouvé")
+                diag(f"⚠️ Aucun mot-clé direct trouvé")
 
-            print()
 
     def prepare_context(self, chunks):
         """Prépare le contexte pour l'IA à partir des chunks"""
@@ -337,7 +601,7 @@ class RAGSearcher:
 
     def generate_answer(self, question, context):
         """Génère la réponse avec Ollama"""
-        print("🤖 Génération de la réponse avec Ollama...")
+        diag("🤖 Génération de la réponse avec Ollama...")
 
         prompt = f"""Contexte: {context}
 
@@ -349,9 +613,9 @@ class RAGSearcher:
 
         try:
             response = requests.post(
-                'http://localhost:11434/api/generate',
+                f"{OLLAMA_SERVER}/api/generate",
                 json={
-                    'model': 'mistral:7b-instruct',
+                    'model': OLLAMA_GENERATE_MODEL,
                     'prompt': prompt,
                     'stream': False,
                     'options': {
@@ -363,20 +627,34 @@ class RAGSearcher:
             )
 
             if response.status_code == 200:
-                result = response.json().get('response', '').strip()
-                print("✅ Réponse générée avec succès")
+                payload = response.json()
+                self.record_ollama_timings(payload)
+                result = payload.get('response', '').strip()
+                diag("✅ Réponse générée avec succès")
                 return result if result else "Erreur: Réponse vide générée"
             else:
-                print(f"❌ Erreur Ollama: {response.status_code}")
+                logger.error(f"❌ Erreur Ollama: {response.status_code}")
                 return "Erreur: Service IA indisponible"
 
         except requests.exceptions.Timeout:
-            print("❌ Timeout Ollama")
+            logger.error("❌ Timeout Ollama")
             return "Erreur: Le service IA a pris trop de temps à répondre"
         except Exception as e:
-            print(f"❌ Exception Ollama: {e}")
+            logger.error(f"❌ Exception Ollama: {e}")
             return f"Erreur service IA: {str(e)}"
 
+    @staticmethod
+    def record_ollama_timings(payload):
+        """Durées rapportées par Ollama (nanosecondes) : chargement, évaluation du prompt, génération"""
+        for field, stage in (('load_duration', 'ollama_load'),
+                             ('prompt_eval_duration', 'ollama_prompt_eval'),
+                             ('eval_duration', 'ollama_eval')):
+            if payload.get(field) is not None:
+                metrics.record(stage, payload[field] / 1e9)
+        for field, kind in (('prompt_eval_count', 'prompt'), ('eval_count', 'eval')):
+            if payload.get(field):
+                metrics.OLLAMA_TOKENS.labels(kind).inc(payload[field])
+
     def error_response(self, question, message):
         """Génère une réponse d'erreur standardisée"""
         return {
@@ -398,83 +676,204 @@ class RAGSearcher:
         }
 
 
-# Instance globale du service
-print("🚀 Création de l'instance RAG...")
-searcher = RAGSearcher()
-print("✅ Service RAG initialisé")
+class ServiceStartup:
+    """Démarrage du service : chargements lourds hors import, phases chronométrées"""
+
+    def __init__(self):
+        self.searcher = None
+        self.phases = {}
+        self.error = None
+        self.ready = threading.Event()
+        self._started = False
+
+    def _phase(self, name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.phases[name] = round(time.perf_counter() - start, 3)
+        logger.info(f"⏱️ Démarrage - {name}: {self.phases[name]:.2f}s")
+        return result
+
+    def run(self):
+        """Locale, index, modèle puis warmup ; le service n'accepte les recherches qu'ensuite"""
+        start = time.perf_counter()
+        try:
+            self._phase('locale', configure_locale)
+            searcher = RAGSearcher()
+            index = self._phase('index', searcher.load_index)
+            model, model_name = self._phase('model', searcher.load_model, index)
+            searcher.active = (index, model, model_name)
+            self._phase('warmup', searcher.warmup)
+
+            self.searcher = searcher
+            self.phases['total'] = round(time.perf_counter() - start, 3)
+            self.ready.set()
+            logger.info(f"✅ Service RAG prêt en {self.phases['total']:.2f}s")
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"❌ Démarrage du service RAG échoué: {e}")
+
+    def start(self, background=True):
+        """Lance le démarrage (une seule fois), en arrière-plan par défaut"""
+        if self._started:
+            return
+        self._started = True
+        configure_logging()
+        if background:
+            threading.Thread(target=self.run, name='rag-startup', daemon=True).start()
+        else:
+            self.run()
+
+
+class HealthProber:
+    """Sondes des composants en arrière-plan : /health ne sert que le dernier résultat"""
+
+    def __init__(self, interval=None):
+        self.interval = interval or float(os.getenv('HEALTH_PROBE_INTERVAL', '15'))
+        self.components = {}
+        self._extractor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def probe_filemaker(self):
+        # productInfo : aucune session Data API créée
+        if self._extractor is None:
+            self._extractor = FileMakerExtractor()
+        breaker = self._extractor.breaker
+        if not self._extractor.ping(timeout=5):
+            return False, None
+        if breaker.state == 'open':
+            # Serveur joignable mais appels Data API en échec : recherches sur l'index local
+            return False, f"Disjoncteur ouvert ({breaker.retry_after():.0f}s restantes)"
+        return True, None
+
+    def probe_ollama(self):
+        response = requests.get(f"{OLLAMA_SERVER}/api/tags", timeout=5)
+        if response.status_code != 200:
+            return False, f"HTTP {response.status_code}"
+        models = [model.get('name') for model in response.json().get('models', [])]
+        if OLLAMA_GENERATE_MODEL not in models:
+            return False, f"Modèle {OLLAMA_GENERATE_MODEL} absent"
+        return True, None
+
+    def probe_embeddings(self):
+        return startup.ready.is_set(), startup.error or (None if startup.ready.is_set() else "Chargement en cours")
+
+    def probe_all(self):
+        for name, probe in (('filemaker', self.probe_filemaker),
+                            ('ollama', self.probe_ollama),
+                            ('embeddings', self.probe_embeddings)):
+            start = time.perf_counter()
+            try:
+                ok, error = probe()
+            except Exception as e:
+                ok, error = False, str(e)
+            # Remplacement du dict d'un composant en une affectation : lecture sans verrou
+            self.components[name] = {
+                'status': 'OK' if ok else 'ERROR',
+                'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+                'checked_at': time.time(),
+                'error': error
+            }
+
+    def _run(self):
+        while True:
+            self.probe_all()
+            time.sleep(self.interval)
+
+    def ensure_started(self):
+        """Un thread de sonde par processus (les threads ne survivent pas au fork des workers)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._extractor = None
+                threading.Thread(target=self._run, name='health-prober', daemon=True).start()
+
+    def report(self):
+        now = time.time()
+        components = {
+            name: dict(component, age_s=round(now - component['checked_at'], 1))
+            for name, component in list(self.components.items())
+        }
+        if not components:
+            status = "UNKNOWN"
+        elif all(component['status'] == 'OK' for component in components.values()):
+            status = "OK"
+        else:
+            status = "PARTIAL"
+        return status, components
+
+
+startup = ServiceStartup()
+prober = HealthProber()
 
 
 @app.route('/search', methods=['POST'])
 def search_endpoint():
     """Endpoint principal de recherche"""
     try:
-        print("\n" + "=" * 60)
-        print("🔍 NOUVELLE REQUÊTE REÇUE")
-        print("=" * 60)
-
         # Récupération de la question
         data = request.get_json()
         if not data:
             return jsonify({"error": "Pas de données JSON reçues"}), 400
 
         question = data.get('question', '').strip()
+        debug = bool(data.get('debug')) or request.headers.get('X-Debug') == '1'
+        profile = bool(data.get('profile')) or request.headers.get('X-Profile') == '1'
 
         if not question:
             return jsonify({"error": "Question manquante ou vide"}), 400
 
-        print(f"📝 Question: '{question}'")
+        diag(f"📝 Question: '{question}'")
 
-        # Lancement de la recherche
-        result = searcher.search(question)
+        if not startup.ready.is_set():
+            return jsonify({"error": "Service en cours de démarrage", "status": "starting"}), 503
 
-        print(f"✅ Recherche terminée - Status: {result.get('status', 'unknown')}")
-        print("=" * 60)
+        # Lancement de la recherche
+        result = startup.searcher.search(question, debug=debug, profile=profile)
 
         return jsonify(result)
 
     except Exception as e:
-        print(f"❌ ERREUR ENDPOINT: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"❌ ERREUR ENDPOINT: {e}")
         return jsonify({
             "error": f"Erreur serveur: {str(e)}",
             "status": "error"
         }), 500
 
 
-@app.route('/health', methods=['GET'])
-def health():
-    """Endpoint de santé du service"""
-    try:
-        # Test de connexion FileMaker
-        extractor = FileMakerExtractor()
-        fm_ok = extractor.connect()
-        if fm_ok:
-            extractor.logout()
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Histogrammes par étape au format Prometheus (p50/p95/p99 via histogram_quantile)
 
-        # Test Ollama
-        try:
-            ollama_response = requests.get('http://localhost:11434/api/tags', timeout=5)
-            ollama_ok = ollama_response.status_code == 200
-        except:
-            ollama_ok = False
+    Sous gunicorn, somme des workers (METRICS_MULTIPROC_DIR) et non du seul worker qui répond.
+    """
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
 
-        return jsonify({
-            "status": "OK" if (fm_ok and ollama_ok) else "PARTIAL",
-            "service": "RAG API",
-            "components": {
-                "filemaker": "OK" if fm_ok else "ERROR",
-                "ollama": "OK" if ollama_ok else "ERROR",
-                "embeddings": "OK"
-            },
-            "version": "2.0"
-        })
 
-    except Exception as e:
-        return jsonify({
-            "status": "ERROR",
-            "error": str(e)
-        }), 500
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Disponibilité : modèle et index chargés, warmup effectué"""
+    if startup.ready.is_set():
+        return jsonify({"status": "ready", "startup": startup.phases})
+    status = "failed" if startup.error else "starting"
+    return jsonify({"status": status, "error": startup.error, "startup": startup.phases}), 503
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Endpoint de santé du service : état mis en cache par le HealthProber, sans appel réseau"""
+    prober.ensure_started()
+    status, components = prober.report()
+    return jsonify({
+        "status": status,
+        "service": "RAG API",
+        "components": components,
+        "probe_interval_s": prober.interval,
+        "version": "2.0"
+    })
 
 
 if __name__ == '__main__':
@@ -483,6 +882,12 @@ if __name__ == '__main__':
     print("📡 URL: http://localhost:9000")
     print("🔍 Recherche: POST /search")
     print("💚 Santé: GET /health")
+    print("🟢 Disponibilité: GET /ready")
     print("=" * 40)
 
-    app.run(host='0.0.0.0', port=9000, debug=True)
+    # Chargement en arrière-plan : le serveur répond à /health et /ready immédiatement
+    startup.start(background=True)
+    prober.ensure_started()
+
+    # Pas de reloader : il réimporterait le module et chargerait le modèle une seconde fois
+    app.run(host='0.0.0.0', port=9000, debug=False, use_reloader=False, threaded=True)
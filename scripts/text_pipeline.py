@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Pipeline de normalisation et d'analyse du texte financier
+Expressions précompilées au chargement du module et analyse d'un chunk en un seul appel
+(minuscules, entités, catégories et score d'importance calculés une seule fois).
+Termes de recherche : même normalisation (minuscules sans accents, mots vides retirés,
+racinisation légère) pour le champ de mots-clés des chunks et pour les questions.
+"""
+
+import re
+import unicodedata
+
+# Normalisation des nombres et devises
+_NUMBER_SEPARATOR = re.compile(r'(\d+)\s*[,\.]\s*(\d+)')
+_UNIT_SUFFIX = re.compile(r'(\d)\s+(M€|€|%)')
+
+# Réparation des mots coupés par les sauts de ligne
+_HYPHENATED_WORD = re.compile(r'(\w+)-\s*\n\s*(\w+)')
+_SOFT_LINE_BREAK = re.compile(r'([^.!?])\n([a-zà-ÿ])')
+
+# Nettoyage des espaces
+_HORIZONTAL_SPACE = re.compile(r'[ \t]+')
+_BLANK_LINES = re.compile(r'\n{3,}')
+
+# Caractères indésirables (la ponctuation financière est préservée)
+_UNWANTED_CHARS = re.compile(r'[^\w\s\.\,\;\:\!\?\€\%\(\)\-\n°/]')
+
+ENTITY_PATTERNS = {
+    'prices': re.compile(r'(\d+(?:[,\.]\d+)*)\s*€'),
+    'percentages': re.compile(r'(\d+(?:[,\.]\d+)*)\s*%'),
+    'dates': re.compile(r'(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{4})'),
+    'years': re.compile(r'\b(20\d{2})\b'),
+    'quarters': re.compile(r'(\d+[er]*\s*trimestre\s*\d{4})', re.IGNORECASE),
+    'amounts_millions': re.compile(r'(\d+(?:[,\.]\d+)*)\s*[Mm]€'),
+    'surfaces': re.compile(r'(\d+(?:[,\.]\d+)*)\s*m[²2]')
+}
+
+# Mots-clés par catégorie
+CATEGORY_KEYWORDS = {
+    'pricing': ['prix', 'souscription', 'commission', 'frais', 'tarif', 'modalités'],
+    'performance': ['rendement', 'distribution', 'tri', 'rgi', 'performance', 'dividende'],
+    'assets': ['acquisition', 'patrimoine', 'actif', 'immobilier', 'surface', 'locataire'],
+    'financial_data': ['capitalisation', 'collecte', 'parts', 'euros', 'bilan', 'résultat'],
+    'editorial': ['éditorial', 'message', 'président', 'directeur'],
+    'legal': ['conditions', 'cession', 'retrait', 'fiscalité', 'règlement']
+}
+
+# Mots-clés importants pour le score financier
+IMPORTANT_KEYWORDS = [
+    'prix de souscription', 'rendement', 'distribution', 'capitalisation',
+    'tri', 'rgi', 'performance', 'acquisition', 'collecte'
+]
+
+# Mots vides ignorés par la recherche (comparés sans accents)
+_STOP_WORDS = {
+    # Français
+    'le', 'la', 'les', 'un', 'une', 'des', 'du', 'de', 'et', 'ou', 'où', 'est', 'sont', 'au', 'aux',
+    'dans', 'sur', 'avec', 'pour', 'par', 'ce', 'cet', 'cette', 'ces', 'qui', 'que', 'quoi', 'dont',
+    'comment', 'combien', 'quand', 'quel', 'quelle', 'quels', 'quelles', 'lequel', 'laquelle',
+    'avoir', 'être', 'faire', 'dire', 'aller', 'voir', 'savoir', 'pouvoir', 'été', 'était', 'ont',
+    'son', 'sa', 'ses', 'leur', 'leurs', 'notre', 'nos', 'votre', 'vos', 'il', 'elle', 'ils', 'elles',
+    'nous', 'vous', 'on', 'ne', 'pas', 'plus', 'mais', 'donc', 'car', 'sans', 'sous', 'entre', 'vers',
+    'chez', 'lors', 'selon', 'tout', 'tous', 'toute', 'toutes', 'très', 'aussi', 'ainsi',
+    # Anglais
+    'the', 'a', 'an', 'and', 'or', 'is', 'are', 'in', 'on', 'at', 'for', 'by', 'with', 'of', 'to',
+    'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'was', 'were',
+    'this', 'that', 'what', 'which', 'from', 'its'
+}
+
+# Suffixes retirés par la racinisation (le plus long d'abord, un seul par mot)
+_STEM_SUFFIXES = tuple(sorted({
+    'issement', 'issements', 'atrice', 'ateur', 'ation', 'ement', 'ence', 'ance', 'ique', 'isme',
+    'iste', 'able', 'euse', 'ion', 'ite', 'ive', 'if', 'eux', 'iere', 'ier', 'ee', 'er', 'ez', 'e'
+}, key=len, reverse=True))
+_TERM = re.compile(r'[a-z0-9]+')
+
+# Union des deux listes : chaque mot-clé n'est cherché qu'une fois par chunk
+_ALL_KEYWORDS = tuple(dict.fromkeys(
+    [keyword for keywords in CATEGORY_KEYWORDS.values() for keyword in keywords] + IMPORTANT_KEYWORDS
+))
+
+
+def clean_text(text):
+    """Nettoyage intelligent préservant les informations financières"""
+    text = _NUMBER_SEPARATOR.sub(r'\1,\2', text)  # Normalise les nombres
+    text = _UNIT_SUFFIX.sub(r'\1\2', text)  # Colle €, M€ et % aux nombres
+
+    text = _HYPHENATED_WORD.sub(r'\1\2', text)
+    text = _SOFT_LINE_BREAK.sub(r'\1 \2', text)
+
+    text = _HORIZONTAL_SPACE.sub(' ', text)
+    text = _BLANK_LINES.sub('\n\n', text)
+
+    text = _UNWANTED_CHARS.sub('', text)
+
+    return text.strip()
+
+
+def find_keywords(text_lower):
+    """Ensemble des mots-clés (catégories et importance) présents dans le texte"""
+    return {keyword for keyword in _ALL_KEYWORDS if keyword in text_lower}
+
+
+def extract_financial_entities(text):
+    """Extrait les entités financières du texte"""
+    return {name: pattern.findall(text) for name, pattern in ENTITY_PATTERNS.items()}
+
+
+def classify_content_type(text, keywords_found=None):
+    """Classifie le type de contenu du chunk"""
+    if keywords_found is None:
+        keywords_found = find_keywords(text.lower())
+
+    scores = {}
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        score = sum(1 for keyword in keywords if keyword in keywords_found)
+        if score > 0:
+            scores[category] = score / len(keywords)
+
+    if not scores:
+        return 'general'
+
+    return max(scores, key=scores.get)
+
+
+def calculate_financial_importance(text, entities=None, keywords_found=None):
+    """Calcule un score d'importance financière"""
+    if entities is None:
+        entities = extract_financial_entities(text)
+    if keywords_found is None:
+        keywords_found = find_keywords(text.lower())
+
+    # Présence d'entités financières
+    score = len(entities['prices']) * 2
+    score += len(entities['percentages']) * 2
+    score += len(entities['amounts_millions']) * 3
+
+    # Mots-clés importants
+    score += 3 * sum(1 for keyword in IMPORTANT_KEYWORDS if keyword in keywords_found)
+
+    return min(10, score)  # Score max de 10
+
+
+def analyze_chunk(text):
+    """
+    Analyse complète d'un chunk : une seule mise en minuscules, une seule extraction d'entités
+
+    Returns:
+        dict: content_type, financial_entities, financial_score et word_count
+    """
+    keywords_found = find_keywords(text.lower())
+    entities = extract_financial_entities(text)
+
+    return {
+        'content_type': classify_content_type(text, keywords_found),
+        'financial_entities': entities,
+        'financial_score': calculate_financial_importance(text, entities, keywords_found),
+        'word_count': len(text.split())
+    }
+
+
+def fold_accents(text):
+    """Minuscules sans accents ni ligatures (é → e, œ → oe)"""
+    text = unicodedata.normalize('NFKD', text.lower().replace('œ', 'oe').replace('æ', 'ae'))
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+STOP_WORDS = frozenset(fold_accents(word) for word in _STOP_WORDS)
+
+
+def stem(word):
+    """
+    Racinisation légère d'un mot sans accents : pluriel puis un suffixe, racine de 3 lettres au moins
+
+    Appliquée aux chunks comme aux questions : « souscriptions » et « souscription »
+    donnent la même racine, seule la cohérence compte.
+    """
+    if word.isdigit():
+        return word
+    if len(word) > 5 and word.endswith('aux'):
+        word = word[:-3] + 'al'
+    elif len(word) > 3 and word[-1] in 'sx':
+        word = word[:-1]
+    for suffix in _STEM_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def search_terms(text, min_length=3):
+    """
+    Termes de recherche d'un texte, sans doublon, dans l'ordre d'apparition
+
+    Returns:
+        list: Racines des mots d'au moins min_length caractères hors mots vides
+    """
+    terms = (stem(word) for word in _TERM.findall(fold_accents(text))
+             if len(word) >= min_length and word not in STOP_WORDS)
+    return list(dict.fromkeys(terms))
+
+
+def keyword_field(text):
+    """Contenu du champ de mots-clés d'un chunk (termes séparés par des espaces, indexés par FileMaker)"""
+    return ' '.join(search_terms(text))
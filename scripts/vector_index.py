@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Index vectoriel local versionné
+Une version = un modèle d'embedding : vecteurs float32 normalisés (fichier binaire brut
+projeté en mémoire) + table SQLite des métadonnées des chunks. La version active est
+désignée par le fichier CURRENT, remplacé atomiquement lors d'une bascule.
+
+Les vecteurs peuvent être stockés quantifiés (float16, ou int8 avec une échelle par
+vecteur) pour diviser par 2 à 4 la mémoire des workers ; le fichier float32 reste alors
+sur disque et ne sert qu'à re-scorer exactement les meilleurs candidats.
+
+Au-delà de ce qu'une matrice dense permet, une version peut porter un index compressé
+IVF-PQ (pq_index) : la recherche ne parcourt plus que quelques listes de codes.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import sqlite3
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+VECTORS_FILE = 'vectors.f32'
+RECORDS_FILE = 'records.sqlite'
+CURRENT_FILE = 'CURRENT'
+
+# Stockages quantifiés : fichier des codes et type NumPy
+QUANTIZED_FILES = {
+    'float16': ('vectors.f16', np.float16),
+    'int8': ('vectors.i8', np.int8)
+}
+SCALES_FILE = 'scales.f32'
+IVFPQ_FILE = 'ivfpq.npz'
+STORAGES = ('float32',) + tuple(QUANTIZED_FILES)
+
+# Lignes déquantifiées à la fois lors du scoring : bloc temporaire qui tient en cache
+SCORE_BLOCK_ROWS = 1024
+
+
+def normalize(vectors):
+    """Normalise des vecteurs (lignes) en float32 pour un score cosinus par produit scalaire"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize(vectors, storage):
+    """
+    Quantifie des vecteurs normalisés
+
+    Returns:
+        tuple: (codes, échelles par vecteur ou None)
+    """
+    if storage == 'float16':
+        return vectors.astype(np.float16), None
+    if storage == 'int8':
+        # Quantification symétrique : le plus grand coefficient de chaque vecteur vaut ±127
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Stockage inconnu: {storage}")
+
+
+def write_quantized(path, count, dim, storage):
+    """Écrit les codes quantifiés d'une version à partir de son fichier float32, bloc par bloc"""
+    code_file, _ = QUANTIZED_FILES[storage]
+    vectors = np.memmap(os.path.join(path, VECTORS_FILE), dtype=np.float32, mode='r', shape=(count, dim))
+
+    with open(os.path.join(path, code_file), 'wb') as codes_out, \
+            open(os.path.join(path, SCALES_FILE), 'wb') as scales_out:
+        for start in range(0, count, SCORE_BLOCK_ROWS):
+            codes, scales = quantize(np.asarray(vectors[start:start + SCORE_BLOCK_ROWS]), storage)
+            codes.tofile(codes_out)
+            if scales is not None:
+                scales.tofile(scales_out)
+
+    if storage != 'int8':
+        os.remove(os.path.join(path, SCALES_FILE))
+
+
+def _pq_module():
+    """pq_index est un module frère : importé via le paquet scripts ou directement en script"""
+    if __package__:
+        from . import pq_index
+    else:
+        import pq_index
+    return pq_index
+
+
+def build_ivfpq(path, count, dim, nlist=None, m=None, sample_size=100000):
+    """Apprend et écrit l'index IVF-PQ d'une version à partir de son fichier float32"""
+    pq_index = _pq_module()
+    vectors = np.memmap(os.path.join(path, VECTORS_FILE), dtype=np.float32, mode='r', shape=(count, dim))
+    nlist = nlist or pq_index.IVFPQIndex.default_nlist(count)
+
+    start = time.time()
+    index = pq_index.IVFPQIndex(dim, nlist, m).train(vectors, sample_size)
+    index.build(vectors)
+    index.save(os.path.join(path, IVFPQ_FILE))
+    logger.info(f"🗜️ IVF-PQ: {index.nlist} listes, {index.pq.m} octets/vecteur, "
+                f"{index.nbytes / 1e6:.1f} Mo en {time.time() - start:.1f}s")
+    return {'nlist': index.nlist, 'pq_subvectors': index.pq.m}
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class VectorIndex:
+    """Version d'index en lecture seule : scoring NumPy et métadonnées des chunks"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+        self.version = self.manifest['version']
+        self.model = self.manifest['model']
+        self.dim = self.manifest['dim']
+        self.count = self.manifest['count']
+
+        self.storage = self.manifest.get('storage', 'float32')
+        self.rescore_factor = int(os.getenv('VECTOR_INDEX_RESCORE', '4'))
+        self.nprobe = int(os.getenv('IVF_NPROBE', '16'))
+
+        # Projection mémoire : pages partagées entre processus, chargées à la demande
+        self.vectors = None
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        if self.count and os.path.exists(vectors_path):
+            self.vectors = np.memmap(vectors_path, dtype=np.float32, mode='r', shape=(self.count, self.dim))
+        elif not self.count:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+
+        self.codes = self.vectors
+        self.scales = None
+        if self.storage != 'float32' and self.count:
+            code_file, dtype = QUANTIZED_FILES[self.storage]
+            self.codes = np.memmap(os.path.join(path, code_file), dtype=dtype, mode='r', shape=(self.count, self.dim))
+            if self.storage == 'int8':
+                self.scales = np.memmap(os.path.join(path, SCALES_FILE), dtype=np.float32, mode='r', shape=(self.count,))
+
+        self.codec = None
+        if self.manifest.get('codec') == 'ivfpq' and self.count:
+            self.codec = _pq_module().IVFPQIndex.load(os.path.join(path, IVFPQ_FILE))
+
+        self._local = threading.local()
+
+    def _db(self):
+        """Connexion SQLite en lecture seule, une par thread et par processus"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(f"file:{os.path.join(self.path, RECORDS_FILE)}?mode=ro", uri=True)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def rows_for_records(self, record_ids):
+        """
+        Lignes de l'index correspondant à des recordId FileMaker
+
+        Returns:
+            dict: recordId -> ligne, pour les chunks présents dans l'index
+        """
+        record_ids = [str(record_id) for record_id in record_ids if record_id is not None]
+        rows = {}
+        for start in range(0, len(record_ids), 500):
+            batch = record_ids[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            for record_id, row in self._db().execute(
+                    f"SELECT record_id, row FROM records WHERE record_id IN ({placeholders})", batch):
+                rows[record_id] = row
+        return rows
+
+    def records(self, rows):
+        """Métadonnées (format proche des fieldData FileMaker) pour une liste de lignes"""
+        rows = [int(row) for row in rows]
+        found = {}
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            for row, record_id, id_document, chunk_index, text in self._db().execute(
+                    f"SELECT row, record_id, id_document, chunk_index, text FROM records WHERE row IN ({placeholders})",
+                    batch):
+                found[row] = {
+                    'recordId': record_id,
+                    'idDocument': id_document,
+                    'ChunkIndex': chunk_index,
+                    'Text': text
+                }
+        return [found.get(row) for row in rows]
+
+    @property
+    def exact(self):
+        """Vrai si les vecteurs float32 d'origine sont disponibles"""
+        return self.vectors is not None
+
+    def memory_bytes(self):
+        """Taille des données parcourues par une recherche (codes IVF-PQ ou matrice complète)"""
+        if self.codec is not None:
+            return self.codec.nbytes
+        size = self.codes.nbytes if self.codes is not None else 0
+        return size + (self.scales.nbytes if self.scales is not None else 0)
+
+    def _approximate_scores(self, query, rows=None):
+        """Scores sur les vecteurs stockés (quantifiés ou non), déquantifiés par blocs"""
+        codes = self.codes if rows is None else self.codes[rows]
+        if self.storage == 'float32':
+            return codes @ query
+
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+    def score(self, query_vec, rows=None, exact=True):
+        """
+        Similarités cosinus entre la question et les lignes demandées (toutes par défaut)
+
+        Args:
+            exact (bool): Utilise les vecteurs float32 quand ils sont disponibles
+        """
+        query = normalize(query_vec).reshape(-1)
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+
+        if exact and self.vectors is not None and (rows is not None or self.storage == 'float32'):
+            vectors = self.vectors if rows is None else self.vectors[rows]
+            return vectors @ query
+        return self._approximate_scores(query, rows)
+
+    def search(self, query_vec, top_k=20, rescore=None, nprobe=None):
+        """
+        Recherche des top_k lignes les plus proches
+
+        Exhaustive sur la matrice stockée, ou limitée aux nprobe listes les plus proches
+        si la version porte un index IVF-PQ. Sur un stockage approché, les top_k * rescore
+        meilleurs candidats sont re-scorés avec les vecteurs float32 (rescore=0 pour s'en passer).
+
+        Returns:
+            list: Tuples (ligne, similarité) triés par similarité décroissante
+        """
+        if not self.count:
+            return []
+
+        query = normalize(query_vec).reshape(-1)
+        approximate = self.codec is not None or self.storage != 'float32'
+
+        if rescore is None:
+            rescore = self.rescore_factor
+        rescoring = bool(rescore) and approximate and self.vectors is not None
+        candidates_k = min(self.count, top_k * rescore if rescoring else top_k)
+
+        if self.codec is not None:
+            candidates, candidate_scores = self.codec.search(query, candidates_k, nprobe or self.nprobe)
+        else:
+            scores = self._approximate_scores(query)
+            candidates = np.argpartition(-scores, candidates_k - 1)[:candidates_k]
+            candidate_scores = scores[candidates]
+
+        if rescoring:
+            # Lignes triées : lecture séquentielle des pages float32 projetées
+            candidates = np.sort(candidates)
+            candidate_scores = self.vectors[candidates] @ query
+
+        order = np.argsort(-candidate_scores)[:top_k]
+        return [(int(candidates[i]), float(candidate_scores[i])) for i in order]
+
+
+class IndexBuilder:
+    """Construction incrémentale d'une nouvelle version d'index"""
+
+    def __init__(self, root, model, dim, version=None):
+        slug = re.sub(r'[^a-zA-Z0-9]+', '-', model).strip('-').lower()
+        self.version = version or f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}"
+        self.path = os.path.join(root, self.version)
+        self.model = model
+        self.dim = dim
+        self.count = 0
+
+        os.makedirs(self.path, exist_ok=False)
+        self._vectors_file = open(os.path.join(self.path, VECTORS_FILE), 'wb')
+        self._db = sqlite3.connect(os.path.join(self.path, RECORDS_FILE))
+        self._db.execute("""
+            CREATE TABLE records (
+                row INTEGER PRIMARY KEY,
+                record_id TEXT,
+                id_document TEXT,
+                chunk_index INTEGER,
+                text TEXT
+            )
+        """)
+
+    def add(self, vectors, records):
+        """
+        Ajoute un lot de vecteurs et leurs métadonnées
+
+        Args:
+            vectors (array): Matrice (n, dim)
+            records (list): n dicts avec recordId, idDocument, ChunkIndex et Text
+        """
+        vectors = normalize(vectors)
+        if vectors.shape != (len(records), self.dim):
+            raise ValueError(f"Dimensions incohérentes: {vectors.shape} pour {len(records)} chunks de dim {self.dim}")
+
+        vectors.tofile(self._vectors_file)
+        self._db.executemany(
+            "INSERT INTO records (row, record_id, id_document, chunk_index, text) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    self.count + i,
+                    str(record.get('recordId')),
+                    str(record.get('idDocument', '')),
+                    record.get('ChunkIndex'),
+                    record.get('Text', '')
+                )
+                for i, record in enumerate(records)
+            ]
+        )
+        self.count += len(records)
+
+    def finalize(self, storage='float32', keep_float32=True, codec=None, codec_options=None, **extra):
+        """
+        Termine la version : le manifeste est écrit en dernier et la rend chargeable
+
+        Args:
+            storage (str): 'float32', 'float16' ou 'int8' (échelle par vecteur)
+            keep_float32 (bool): Conserve les vecteurs exacts pour le re-scoring
+            codec (str): 'ivfpq' pour construire en plus un index compressé
+            codec_options (dict): nlist, m, sample_size passés à build_ivfpq
+        """
+        if codec not in (None, 'ivfpq'):
+            raise ValueError(f"Codec inconnu: {codec}")
+        if storage not in STORAGES:
+            raise ValueError(f"Stockage inconnu: {storage} (attendu: {', '.join(STORAGES)})")
+
+        self._vectors_file.close()
+        self._db.execute("CREATE INDEX idx_records_record_id ON records (record_id)")
+        self._db.commit()
+        self._db.close()
+
+        codec_info = {}
+        if codec == 'ivfpq' and self.count:
+            codec_info = build_ivfpq(self.path, self.count, self.dim, **(codec_options or {}))
+        if storage != 'float32':
+            write_quantized(self.path, self.count, self.dim, storage)
+            if not keep_float32:
+                os.remove(os.path.join(self.path, VECTORS_FILE))
+
+        manifest = {
+            'version': self.version,
+            'model': self.model,
+            'dim': self.dim,
+            'count': self.count,
+            'storage': storage,
+            'created_at': time.time()
+        }
+        if codec_info:
+            manifest.update(codec=codec, **codec_info)
+        manifest.update(extra)
+        _write_json(os.path.join(self.path, MANIFEST_FILE), manifest)
+        return self.path
+
+    def abort(self):
+        """Abandonne une construction incomplète"""
+        if not self._vectors_file.closed:
+            self._vectors_file.close()
+        try:
+            self._db.close()
+        except sqlite3.Error:
+            pass
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+class IndexStore:
+    """Ensemble des versions d'index et pointeur vers la version active"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def current_version(self):
+        """Version active (contenu du fichier CURRENT), None si aucune"""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def versions(self):
+        """Versions complètes (avec manifeste), de la plus ancienne à la plus récente"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, name, MANIFEST_FILE))
+        )
+
+    def load(self, version):
+        return VectorIndex(os.path.join(self.root, version))
+
+    def load_current(self):
+        """Charge la version active, None si aucun index n'a encore été construit"""
+        version = self.current_version()
+        return self.load(version) if version else None
+
+    def create_builder(self, model, dim, version=None):
+        os.makedirs(self.root, exist_ok=True)
+        return IndexBuilder(self.root, model, dim, version)
+
+    def activate(self, version):
+        """Bascule atomique : les services lisent soit l'ancienne, soit la nouvelle version"""
+        if version not in self.versions():
+            raise ValueError(f"Version d'index inconnue ou incomplète: {version}")
+        tmp_path = os.path.join(self.root, f"{CURRENT_FILE}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_FILE))
+        logger.info(f"🔀 Index actif: {version}")
+
+    def prune(self, keep=2):
+        """Supprime les anciennes versions en conservant la version active et la précédente"""
+        current = self.current_version()
+        versions = self.versions()
+        removable = [version for version in versions[:-keep] if version != current]
+        for version in removable:
+            shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
+            logger.info(f"🗑️ Ancienne version d'index supprimée: {version}")
+        return removable
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+Point d'entrée WSGI du service de recherche
+
+Chargement synchrone : avec preload_app (config/gunicorn.conf.py), le modèle et l'index
+sont chargés et préchauffés dans le maître avant le fork des workers.
+"""
+
+from scripts.search_service import app, startup
+
+startup.start(background=False)
+if startup.error:
+    raise RuntimeError(f"Démarrage du service RAG échoué: {startup.error}")
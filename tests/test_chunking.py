@@ -0,0 +1,45 @@
+"""
+Chunking intelligent sur le corpus des benchmarks, comparé au découpage de référence
+
+Référence (chunk_text_intelligent avant le scanner à passage unique) : 48 chunks sur les
+16 documents de benchmarks/fixtures/corpus.json, aucun de moins de 200 caractères.
+
+Usage: python -m pytest tests
+"""
+import os
+import sys
+import json
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'scripts'))
+
+from pdf_processor import PDFProcessor  # noqa: E402
+
+BASELINE_CHUNKS = 48
+MIN_CHUNK_LENGTH = 200
+
+
+def corpus_chunks():
+    """Chunks de chaque document du corpus, texte assemblé comme extract_text_from_pdf"""
+    # Le découpage n'utilise ni FileMaker ni le modèle d'embeddings : pas d'initialisation
+    processor = PDFProcessor.__new__(PDFProcessor)
+    with open(os.path.join(PROJECT_ROOT, 'benchmarks', 'fixtures', 'corpus.json'), encoding='utf-8') as f:
+        documents = json.load(f)['documents']
+
+    chunks = []
+    for document in documents:
+        pages = "\n".join(
+            f"\n--- Page {page_num} ---\n{page_text}"
+            for page_num, page_text in enumerate(document['pages'], 1)
+        )
+        chunks.extend(processor.chunk_text_intelligent(processor.clean_text(pages.strip())))
+    return chunks
+
+
+def test_chunk_count_not_above_baseline():
+    assert len(corpus_chunks()) <= BASELINE_CHUNKS
+
+
+def test_no_truncated_chunks():
+    short = [chunk for chunk in corpus_chunks() if len(chunk.strip()) < MIN_CHUNK_LENGTH]
+    assert not short, short